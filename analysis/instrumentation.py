@@ -0,0 +1,253 @@
+"""
+Per-stage timing and memory instrumentation for the backtesting pipeline.
+
+Pipeline code marks its stages with the ``stage`` context manager or the
+``timed`` decorator and reports cache lookups with ``count``. These hooks
+only record anything while an ``Instrumentation`` is active in the current
+context (thread or task); otherwise they cost one context-variable lookup:
+
+    with Instrumentation() as instrumentation:
+        data = data_manager.load_data(...)       # recorded as 'load_data'
+        with stage('custom', rows=len(data)):
+            ...
+    instrumentation.stats()
+
+Each stage records wall time, CPU time of the calling thread, rows
+processed, counters such as cache hits/misses, and with
+``trace_memory=True`` the peak traced allocation (tracemalloc is
+process-wide, so memory figures are only exact for one request at a time).
+"""
+import functools
+import logging
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional['Instrumentation']] = ContextVar('instrumentation', default=None)
+
+
+def _count_rows(value) -> Optional[int]:
+    """Rows of an array-like value (first dimension), None for anything else."""
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+class _NullStage:
+    """No-op stand-in for a stage while instrumentation is off."""
+
+    def __enter__(self) -> Dict:
+        return {}
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Context manager recording one stage into an Instrumentation."""
+
+    def __init__(self, instrumentation: 'Instrumentation', name: str, rows: Optional[int]):
+        self.instrumentation = instrumentation
+        self.record = {'name': name, 'rows': rows, 'counters': {}}
+
+    def __enter__(self) -> Dict:
+        self.instrumentation._enter(self.record)
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.instrumentation._exit(self.record, failed=exc_type is not None)
+        return False
+
+
+class StageMetrics:
+    """Thread-safe aggregate of stage records across many runs, e.g. for a /metrics endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self.runs = 0
+
+    def add(self, stats: Dict) -> None:
+        """Fold the stats of one finished run into the aggregate."""
+        with self._lock:
+            self.runs += 1
+            for record in stats['stages']:
+                entry = self._stages.setdefault(record['path'], {
+                    'count': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                    'max_wall_seconds': 0.0, 'rows': 0, 'max_peak_bytes': None
+                })
+                entry['count'] += 1
+                entry['errors'] += int(record['error'])
+                entry['wall_seconds'] += record['wall_seconds']
+                entry['cpu_seconds'] += record['cpu_seconds']
+                entry['max_wall_seconds'] = max(entry['max_wall_seconds'], record['wall_seconds'])
+                entry['rows'] += record['rows'] or 0
+                if record.get('peak_bytes') is not None:
+                    entry['max_peak_bytes'] = max(entry['max_peak_bytes'] or 0, record['peak_bytes'])
+            for name, value in stats['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def summary(self) -> Dict:
+        """Totals and averages per stage path, plus summed counters."""
+        with self._lock:
+            stages = {}
+            for path, entry in self._stages.items():
+                stages[path] = dict(entry, mean_wall_seconds=entry['wall_seconds'] / entry['count'])
+            return {'runs': self.runs, 'stages': stages, 'counters': dict(self._counters)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.runs = 0
+
+
+class Instrumentation:
+    def __init__(self, trace_memory: bool = False, log: bool = True, metrics: Optional[StageMetrics] = None):
+        """
+        Collect stage records while active.
+
+        Args:
+            trace_memory: Record peak traced allocations per stage (slows allocation-heavy code)
+            log: Emit one structured log record per finished stage
+            metrics: Optional aggregate that receives the stats when the run ends
+        """
+        self.trace_memory = trace_memory
+        self.log = log
+        self.metrics = metrics
+        self.stages = []
+        self.counters = {}
+        self._stack = []
+        self._token = None
+        self._started_tracing = False
+        self._start = None
+        self._end = None
+
+    def __enter__(self) -> 'Instrumentation':
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._end = time.perf_counter()
+        _current.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self.metrics is not None:
+            self.metrics.add(self.stats())
+        return False
+
+    def stage(self, name: str, rows: Optional[int] = None) -> _Stage:
+        """Record a stage; the yielded dict accepts 'rows' and other fields set inside the block."""
+        return _Stage(self, name, rows)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add to a counter, both run-wide and on the innermost open stage."""
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self._stack:
+            counters = self._stack[-1]['record']['counters']
+            counters[name] = counters.get(name, 0) + n
+
+    def _enter(self, record: Dict) -> None:
+        parent = self._stack[-1] if self._stack else None
+        record['path'] = f"{parent['record']['path']}/{record['name']}" if parent else record['name']
+        record['depth'] = len(self._stack)
+        frame = {'record': record}
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent['max_traced'] = max(parent['max_traced'], peak)
+            tracemalloc.reset_peak()
+            frame['base_traced'] = frame['max_traced'] = current
+        self._stack.append(frame)
+        frame['wall'] = time.perf_counter()
+        frame['cpu'] = time.thread_time()
+
+    def _exit(self, record: Dict, failed: bool) -> None:
+        cpu = time.thread_time()
+        wall = time.perf_counter()
+        frame = self._stack.pop()
+        record['wall_seconds'] = wall - frame['wall']
+        record['cpu_seconds'] = cpu - frame['cpu']
+        record['error'] = failed
+        record['peak_bytes'] = None
+        if 'base_traced' in frame and tracemalloc.is_tracing():
+            frame['max_traced'] = max(frame['max_traced'], tracemalloc.get_traced_memory()[1])
+            record['peak_bytes'] = frame['max_traced'] - frame['base_traced']
+            if self._stack:
+                parent = self._stack[-1]
+                parent['max_traced'] = max(parent['max_traced'], frame['max_traced'])
+            tracemalloc.reset_peak()
+        self.stages.append(record)
+
+        if self.log:
+            peak = f", peak {record['peak_bytes'] / 1e6:.1f} MB" if record['peak_bytes'] is not None else ""
+            logger.info(f"Stage {record['path']}: {record['wall_seconds']:.4f}s wall, "
+                        f"{record['cpu_seconds']:.4f}s cpu, rows={record['rows']}{peak}",
+                        extra={'instrumentation': record})
+
+    def stats(self) -> Dict:
+        """Stage records in completion order (children before parents) and run-wide counters."""
+        end = self._end if self._end is not None else time.perf_counter()
+        return {
+            'total_seconds': end - self._start if self._start is not None else 0.0,
+            'stages': [dict(record) for record in self.stages],
+            'counters': dict(self.counters)
+        }
+
+
+def current() -> Optional[Instrumentation]:
+    """The Instrumentation active in this context, if any."""
+    return _current.get()
+
+
+def stage(name: str, rows: Optional[int] = None):
+    """Record a stage on the active Instrumentation; a no-op when none is active."""
+    instrumentation = _current.get()
+    if instrumentation is None:
+        return _NULL_STAGE
+    return instrumentation.stage(name, rows)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add to a counter on the active Instrumentation, e.g. count('memory_cache.hit')."""
+    instrumentation = _current.get()
+    if instrumentation is not None:
+        instrumentation.count(name, n)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """
+    Decorate a function as a stage.
+
+    Rows are taken from the result when it is array-like, otherwise from
+    the first array-like argument.
+    """
+    def decorator(func: Callable) -> Callable:
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            instrumentation = _current.get()
+            if instrumentation is None:
+                return func(*args, **kwargs)
+            with instrumentation.stage(stage_name) as record:
+                result = func(*args, **kwargs)
+                record['rows'] = _count_rows(result)
+                if record['rows'] is None:
+                    record['rows'] = next((rows for rows in map(_count_rows, list(args) + list(kwargs.values()))
+                                           if rows is not None), None)
+            return result
+        return wrapper
+    return decorator
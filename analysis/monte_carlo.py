@@ -0,0 +1,190 @@
+import logging
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.performance_analyzer import PerformanceAnalyzer
+
+# Resampling methods
+BOOTSTRAP = 'bootstrap'
+SHUFFLE = 'shuffle'
+
+# Arrays of one chunk's size alive at once while resampling and computing metrics
+_ARRAYS_PER_CHUNK = 6
+
+# Series resampled by worker processes, set once per process
+_worker_values = None
+
+
+def block_bootstrap_indices(n: int, n_samples: int, block_size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Circular block bootstrap: (n_samples, n) indices made of runs of
+    block_size consecutive bars starting at random bars, wrapping at the end.
+    """
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n, size=(n_samples, n_blocks, 1))
+    indices = (starts + np.arange(block_size)).reshape(n_samples, -1)[:, :n]
+    indices %= n
+    return indices
+
+
+def _init_worker(values: np.ndarray) -> None:
+    global _worker_values
+    _worker_values = values
+
+
+def _resample_metrics(values: np.ndarray, method: str, n_samples: int, seed: np.random.SeedSequence,
+                      block_size: int, risk_free_rate: float, n_periods: int,
+                      periods_per_year: float) -> Dict[str, np.ndarray]:
+    """Draw one chunk of resampled paths and compute their metrics."""
+    rng = np.random.default_rng(seed)
+    if method == BOOTSTRAP:
+        paths = values[block_bootstrap_indices(len(values), n_samples, block_size, rng)]
+    else:
+        paths = np.tile(values, (n_samples, 1))
+        rng.permuted(paths, axis=1, out=paths)
+    return PerformanceAnalyzer().calculate_batch_metrics(paths, risk_free_rate, n_periods, periods_per_year)
+
+
+def _resample_metrics_in_worker(*args) -> Dict[str, np.ndarray]:
+    return _resample_metrics(_worker_values, *args)
+
+
+class MonteCarloAnalyzer:
+    """
+    Robustness of backtest metrics under resampling.
+
+    Returns are block-bootstrapped, or trade returns shuffled, thousands of
+    times; every resampled path goes through the same metrics as
+    PerformanceAnalyzer.calculate_metrics, evaluated over whole chunks of
+    paths at once. Chunks are sized to a memory budget and can be spread
+    over worker processes. Each chunk has its own seed derived from the
+    analyzer's seed, so for a given seed and chunk budget the results do not
+    depend on the number of workers.
+    """
+
+    def __init__(self, n_samples: int = 1000, seed: Optional[int] = None, confidence: float = 0.95,
+                 risk_free_rate: float = 0.02, max_chunk_bytes: int = 64 * 2**20, max_workers: int = 1):
+        """
+        Args:
+            n_samples: Resampled paths per analysis
+            seed: Random seed (None: fresh entropy)
+            confidence: Width of the reported confidence intervals
+            risk_free_rate: Annual risk-free rate for the Sharpe ratio
+            max_chunk_bytes: Approximate memory for one chunk of paths and its intermediates
+            max_workers: Worker processes (1 runs in-process)
+        """
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be in (0, 1)")
+        self.logger = logging.getLogger(__name__)
+        self.n_samples = n_samples
+        self.seed = seed
+        self.confidence = confidence
+        self.risk_free_rate = risk_free_rate
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.analyzer = PerformanceAnalyzer()
+
+    def bootstrap(self, returns: pd.Series, block_size: int = 20, periods_per_year: float = 252) -> Dict:
+        """
+        Block-bootstrap bar returns.
+
+        Blocks of consecutive bars keep short-range autocorrelation (e.g.
+        volatility clustering) that resampling single bars would destroy.
+
+        Args:
+            returns: Bar returns, e.g. backtest()['returns']; NaNs are dropped
+            block_size: Bars per resampled block
+            periods_per_year: Bars per year (252 for daily bars)
+
+        Returns:
+            Dict with 'observed' metrics, per-path 'samples' and a 'summary'
+            table (observed, mean, median and confidence bounds per metric)
+        """
+        values = np.asarray(returns, dtype=np.float64)
+        n_periods = len(values)
+        values = values[~np.isnan(values)]
+        if len(values) < 2:
+            raise ValueError("At least two returns are needed to bootstrap")
+        observed = self._observed(values, n_periods, periods_per_year)
+        samples = self._run(values, BOOTSTRAP, min(block_size, len(values)), n_periods, periods_per_year)
+        return self._result(observed, samples)
+
+    def shuffle_trades(self, trades: pd.DataFrame, periods_per_year: Optional[float] = None) -> Dict:
+        """
+        Randomize the order of closed trades.
+
+        Each path is the sequence of trade returns in a random order, so
+        compounded total return is unchanged while drawdowns and the path
+        dependent metrics vary. Metrics treat one trade as one period.
+
+        Args:
+            trades: Trades table with 'return' (and 'entry_date'/'exit_date'
+                to infer periods_per_year)
+            periods_per_year: Trades per year for annualizing; inferred from
+                the trade dates when omitted
+
+        Returns:
+            Same layout as bootstrap
+        """
+        values = trades['return'].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) < 2:
+            raise ValueError("At least two trades are needed to shuffle")
+        if periods_per_year is None:
+            years = (trades['exit_date'].max() - trades['entry_date'].min()).days / 365.25
+            periods_per_year = len(values) / years if years > 0 else len(values)
+        observed = self._observed(values, len(values), periods_per_year)
+        samples = self._run(values, SHUFFLE, 0, len(values), periods_per_year)
+        return self._result(observed, samples)
+
+    def _observed(self, values: np.ndarray, n_periods: int, periods_per_year: float) -> Dict:
+        metrics = self.analyzer.calculate_batch_metrics(values[None, :], self.risk_free_rate, n_periods, periods_per_year)
+        return {name: float(value[0]) for name, value in metrics.items()}
+
+    def _chunks(self, n_bars: int) -> List[Tuple[int, np.random.SeedSequence]]:
+        """(paths, seed) per chunk, sized to max_chunk_bytes."""
+        chunk_size = max(1, self.max_chunk_bytes // (_ARRAYS_PER_CHUNK * 8 * max(n_bars, 1)))
+        sizes = [min(chunk_size, self.n_samples - start) for start in range(0, self.n_samples, chunk_size)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        return list(zip(sizes, seeds))
+
+    def _run(self, values: np.ndarray, method: str, block_size: int, n_periods: int,
+             periods_per_year: float) -> pd.DataFrame:
+        """Metrics of n_samples resampled paths, one row per path."""
+        chunks = self._chunks(len(values))
+        self.logger.info(f"Resampling {self.n_samples} paths ({method}) in {len(chunks)} chunk(s) "
+                         f"on {self.max_workers} worker(s)")
+        params = (block_size, self.risk_free_rate, n_periods, periods_per_year)
+
+        if self.max_workers == 1 or len(chunks) == 1:
+            results = [_resample_metrics(values, method, size, seed, *params) for size, seed in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(values,)) as executor:
+                futures = [executor.submit(_resample_metrics_in_worker, method, size, seed, *params)
+                           for size, seed in chunks]
+                results = [future.result() for future in futures]
+
+        return pd.DataFrame({name: np.concatenate([result[name] for result in results])
+                             for name in results[0]})
+
+    def _result(self, observed: Dict, samples: pd.DataFrame) -> Dict:
+        tail = (1 - self.confidence) / 2 * 100
+        values = samples.to_numpy()
+        finite = np.where(np.isfinite(values), values, np.nan)
+        with warnings.catch_warnings():
+            # Metrics that are never finite (e.g. profit factor without losses) summarize to NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            summary = pd.DataFrame({
+                'observed': [observed[name] for name in samples.columns],
+                'mean': np.nanmean(finite, axis=0),
+                'median': np.nanmedian(finite, axis=0),
+                'lower': np.nanpercentile(finite, tail, axis=0),
+                'upper': np.nanpercentile(finite, 100 - tail, axis=0)
+            }, index=samples.columns)
+        return {'observed': observed, 'samples': samples, 'summary': summary}
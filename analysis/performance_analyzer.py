@@ -1,103 +1,312 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, Optional
 import logging
+from analysis.instrumentation import timed
+from data.result_store import ResultStore, fingerprint, result_key
+
+TRADE_COLUMNS = ['entry_date', 'exit_date', 'entry_price', 'exit_price', 'position', 'pnl', 'return']
 
 class PerformanceAnalyzer:
-    def __init__(self):
+    def __init__(self, result_store: Optional[ResultStore] = None):
+        """
+        Args:
+            result_store: Persistent store generate_report checks for an
+                identical earlier report before analyzing, and saves new ones to
+        """
         self.logger = logging.getLogger(__name__)
+        self.result_store = result_store
+
+    def calculate_metrics(self, returns: pd.Series, risk_free_rate: float = 0.02,
+                          drawdowns: Optional[np.ndarray] = None) -> Dict:
+        """
+        Calculate various performance metrics.
 
-    def calculate_metrics(self, returns: pd.Series, risk_free_rate: float = 0.02) -> Dict:
-        """Calculate various performance metrics."""
+        All metrics share one array of valid returns and one cumulative
+        growth curve. Pass precomputed drawdowns to reuse them for the
+        maximum drawdown.
+        """
+        values = np.asarray(returns, dtype=np.float64)
+        n = len(values)
+        values = values[~np.isnan(values)]
+        growth = 1 + values
         metrics = {}
-        
+
         # Total Return
-        metrics['total_return'] = (1 + returns).prod() - 1
-        
+        cumulative = np.cumprod(growth)
+        metrics['total_return'] = cumulative[-1] - 1 if len(cumulative) else 0.0
+
         # Annualized Return
-        metrics['annualized_return'] = (1 + metrics['total_return']) ** (252 / len(returns)) - 1
-        
+        metrics['annualized_return'] = (1 + metrics['total_return']) ** (252 / n) - 1
+
         # Volatility
-        metrics['volatility'] = returns.std() * np.sqrt(252)
-        
+        metrics['volatility'] = (values.std(ddof=1) if len(values) > 1 else np.nan) * np.sqrt(252)
+
         # Sharpe Ratio
         metrics['sharpe_ratio'] = (metrics['annualized_return'] - risk_free_rate) / metrics['volatility']
-        
+
         # Maximum Drawdown
-        cumulative_returns = (1 + returns).cumprod()
-        rolling_max = cumulative_returns.expanding().max()
-        drawdowns = cumulative_returns / rolling_max - 1
-        metrics['max_drawdown'] = drawdowns.min()
-        
+        if drawdowns is None:
+            drawdowns = cumulative / np.maximum.accumulate(cumulative) - 1
+        metrics['max_drawdown'] = np.nanmin(drawdowns) if np.any(~np.isnan(drawdowns)) else np.nan
+
         # Win Rate
-        metrics['win_rate'] = (returns > 0).mean()
-        
+        is_win = values > 0
+        is_loss = values < 0
+        metrics['win_rate'] = is_win.sum() / n
+
         # Average Win/Loss
-        wins = returns[returns > 0]
-        losses = returns[returns < 0]
+        wins = values[is_win]
+        losses = values[is_loss]
         metrics['avg_win'] = wins.mean() if len(wins) > 0 else 0
         metrics['avg_loss'] = losses.mean() if len(losses) > 0 else 0
-        
+
         # Profit Factor
-        total_wins = (1 + wins).prod() - 1
-        total_losses = abs((1 + losses).prod() - 1)
+        total_wins = growth[is_win].prod() - 1
+        total_losses = abs(growth[is_loss].prod() - 1)
         metrics['profit_factor'] = total_wins / total_losses if total_losses != 0 else float('inf')
-        
+
         return metrics
 
-    def analyze_trades(self, portfolio: pd.DataFrame, signals: pd.DataFrame) -> Dict:
-        """Analyze individual trades."""
-        trades = []
-        position = 0
-        entry_price = 0
-        entry_date = None
-        
-        for i in range(1, len(portfolio)):
-            current_date = portfolio.index[i]
-            current_price = portfolio['holdings'].iloc[i] / position if position != 0 else 0
-            
-            if signals['signal'].iloc[i] == 1 and position <= 0:  # Buy
-                position = portfolio['holdings'].iloc[i] / current_price if current_price != 0 else 0
-                entry_price = current_price
-                entry_date = current_date
-            elif signals['signal'].iloc[i] == -1 and position > 0:  # Sell
-                exit_price = current_price
-                exit_date = current_date
-                pnl = (exit_price - entry_price) * position
-                trades.append({
-                    'entry_date': entry_date,
-                    'exit_date': exit_date,
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'position': position,
-                    'pnl': pnl,
-                    'return': pnl / (entry_price * position) if entry_price * position != 0 else 0
-                })
-                position = 0
-        
+    def calculate_batch_metrics(self, paths: np.ndarray, risk_free_rate: float = 0.02,
+                                n_periods: Optional[int] = None, periods_per_year: float = 252) -> Dict[str, np.ndarray]:
+        """
+        calculate_metrics for many return paths at once.
+
+        Args:
+            paths: (n_paths, n_bars) returns without NaNs, one path per row
+            risk_free_rate: Annual risk-free rate for the Sharpe ratio
+            n_periods: Bar count used for annualizing and the win rate (defaults
+                to n_bars; calculate_metrics counts the leading NaN return too)
+            periods_per_year: Bars per year (252 for daily bars)
+
+        Returns:
+            Dict of metric name -> array with one value per path
+        """
+        paths = np.asarray(paths, dtype=np.float64)
+        n_paths, n_bars = paths.shape
+        n = n_periods or n_bars
+        metrics = {}
+
+        # Cumulative growth per path
+        growth = 1 + paths
+        cumulative = np.cumprod(growth, axis=1)
+        metrics['total_return'] = cumulative[:, -1] - 1 if n_bars else np.zeros(n_paths)
+        metrics['annualized_return'] = (1 + metrics['total_return']) ** (periods_per_year / n) - 1
+        volatility = paths.std(axis=1, ddof=1) if n_bars > 1 else np.full(n_paths, np.nan)
+        metrics['volatility'] = volatility * np.sqrt(periods_per_year)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics['sharpe_ratio'] = (metrics['annualized_return'] - risk_free_rate) / metrics['volatility']
+
+        # Drawdowns from the running peak, computed in the peak's buffer
+        peak = np.maximum.accumulate(cumulative, axis=1)
+        np.divide(cumulative, peak, out=peak)
+        metrics['max_drawdown'] = peak.min(axis=1) - 1 if n_bars else np.full(n_paths, np.nan)
+        del peak
+
+        # The remaining metrics clip returns or growth into the cumulative buffer:
+        # max(r, 0) sums the wins, and max(1 + r, 1) multiplies the winning growth
+        work = cumulative
+        win_count = np.count_nonzero(paths > 0, axis=1)
+        loss_count = np.count_nonzero(paths < 0, axis=1)
+        metrics['win_rate'] = win_count / n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.maximum(paths, 0, out=work)
+            metrics['avg_win'] = np.where(win_count > 0, work.sum(axis=1) / win_count, 0.0)
+            np.minimum(paths, 0, out=work)
+            metrics['avg_loss'] = np.where(loss_count > 0, work.sum(axis=1) / loss_count, 0.0)
+
+            np.maximum(growth, 1, out=work)
+            total_wins = work.prod(axis=1) - 1
+            np.minimum(growth, 1, out=work)
+            total_losses = np.abs(work.prod(axis=1) - 1)
+            metrics['profit_factor'] = np.where(total_losses != 0, total_wins / total_losses, np.inf)
+        return metrics
+
+    def analyze_trades(self, portfolio: pd.DataFrame, signals: Optional[pd.DataFrame] = None) -> Dict:
+        """
+        Analyze individual trades from position changes.
+
+        Entries and exits are the bars where the position turns on and off.
+        Cost and proceeds come from the cash column, so fills (and any
+        transaction costs) are taken as the engine booked them; both prices
+        are per share net of costs, so pnl is (exit - entry) * position. Uses the
+        portfolio's 'position' column when present, otherwise non-zero
+        holdings mark the position and per-share prices are unknown (NaN).
+        Trades still open on the last bar are not reported.
+        """
+        holdings = portfolio['holdings'].to_numpy(dtype=np.float64)
+        cash = portfolio['cash'].to_numpy(dtype=np.float64)
+        if 'position' in portfolio:
+            position = portfolio['position'].to_numpy(dtype=np.float64)
+            is_long = position > 0
+        else:
+            position = np.full(len(portfolio), np.nan)
+            is_long = holdings != 0
+
+        was_long = np.zeros_like(is_long)
+        was_long[1:] = is_long[:-1]
+        exits = np.flatnonzero(was_long & ~is_long)
+        entries = np.flatnonzero(is_long & ~was_long)[:len(exits)]
+
+        cash_before = np.where(entries > 0, cash[entries - 1], np.nan)
+        cost = cash_before - cash[entries]
+        proceeds = cash[exits] - cash[exits - 1]
+        size = position[entries]
+        pnl = proceeds - cost
+
+        trades = pd.DataFrame({
+            'entry_date': portfolio.index[entries],
+            'exit_date': portfolio.index[exits],
+            'entry_price': cost / size,
+            'exit_price': proceeds / size,
+            'position': size,
+            'pnl': pnl,
+            'return': pnl / cost
+        }, columns=TRADE_COLUMNS)
+        return self.summarize_trades(trades)
+
+    def summarize_trades(self, trades: pd.DataFrame) -> Dict:
+        """Summarize a trades table (one row per closed trade)."""
         return {
             'trades': trades,
             'total_trades': len(trades),
-            'winning_trades': len([t for t in trades if t['pnl'] > 0]),
-            'losing_trades': len([t for t in trades if t['pnl'] <= 0])
+            'winning_trades': int((trades['pnl'] > 0).sum()),
+            'losing_trades': int((trades['pnl'] <= 0).sum())
         }
 
-    def generate_report(self, portfolio: pd.DataFrame, signals: pd.DataFrame) -> Dict:
+    @timed()
+    def generate_report(self, portfolio: pd.DataFrame, signals: pd.DataFrame,
+                        trades: Optional[pd.DataFrame] = None) -> Dict:
         """Generate a comprehensive performance report."""
-        returns = portfolio['total'].pct_change()
-        
-        metrics = self.calculate_metrics(returns)
-        trade_analysis = self.analyze_trades(portfolio, signals)
-        
-        return {
+        key = None
+        if self.result_store is not None:
+            key = result_key({
+                'kind': 'report',
+                'portfolio': fingerprint(portfolio),
+                'signals': fingerprint(signals),
+                'trades': None if trades is None else fingerprint(trades)
+            })
+            stored = self.result_store.get(key)
+            if stored is not None:
+                return stored
+
+        equity_curve = portfolio['total']
+        returns = equity_curve.pct_change()
+        drawdowns = self._calculate_drawdowns(equity_curve)
+
+        metrics = self.calculate_metrics(returns, drawdowns=drawdowns.to_numpy())
+        if trades is not None:
+            trade_analysis = self.summarize_trades(trades)
+        else:
+            trade_analysis = self.analyze_trades(portfolio, signals)
+
+        report = {
             'performance_metrics': metrics,
             'trade_analysis': trade_analysis,
-            'equity_curve': portfolio['total'],
-            'drawdowns': self._calculate_drawdowns(portfolio['total'])
+            'equity_curve': equity_curve,
+            'drawdowns': drawdowns
         }
+        if key is not None:
+            self.result_store.put(key, report, kind='report', description={
+                'start': str(equity_curve.index[0]) if len(equity_curve) else None,
+                'end': str(equity_curve.index[-1]) if len(equity_curve) else None,
+                'rows': len(equity_curve),
+                'total_return': float(metrics['total_return']),
+                'sharpe_ratio': float(metrics['sharpe_ratio']),
+                'total_trades': trade_analysis['total_trades']
+            })
+        return report
 
     def _calculate_drawdowns(self, equity_curve: pd.Series) -> pd.Series:
         """Calculate drawdown series."""
-        rolling_max = equity_curve.expanding().max()
-        drawdowns = equity_curve / rolling_max - 1
-        return drawdowns 
\ No newline at end of file
+        equity = equity_curve.to_numpy(dtype=np.float64)
+        drawdowns = equity / np.fmax.accumulate(equity) - 1
+        return pd.Series(drawdowns, index=equity_curve.index)
+
+
+class RunningMetrics:
+    """
+    The metrics of PerformanceAnalyzer.generate_report for an equity curve
+    that arrives in consecutive chunks.
+
+    Only running totals are kept (bar and return counts, a parallel
+    mean/variance, growth products, win/loss sums and the running peak),
+    so memory does not grow with the length of the history.
+    """
+
+    def __init__(self):
+        self.bars = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.growth = 1.0
+        self.wins = 0
+        self.losses = 0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+        self.win_growth = 1.0
+        self.loss_growth = 1.0
+        self.peak = np.nan
+        self.max_drawdown = np.nan
+        self.last = np.nan
+
+    def update(self, equity: np.ndarray) -> np.ndarray:
+        """Add the next chunk of the equity curve; returns its drawdowns."""
+        equity = np.asarray(equity, dtype=np.float64)
+        if len(equity) == 0:
+            return equity.copy()
+        previous = np.empty_like(equity)
+        previous[0] = self.last
+        previous[1:] = equity[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = equity / previous - 1
+        values = returns[~np.isnan(returns)]
+        self.bars += len(equity)
+        self.last = equity[-1]
+
+        # Chan et al.'s pairwise update of the mean and sum of squared deviations
+        if len(values):
+            chunk_mean = values.mean()
+            chunk_m2 = np.sum((values - chunk_mean) ** 2)
+            total = self.count + len(values)
+            delta = chunk_mean - self.mean
+            self.mean += delta * len(values) / total
+            self.m2 += chunk_m2 + delta ** 2 * self.count * len(values) / total
+            self.count = total
+
+        growth = 1 + values
+        is_win = values > 0
+        is_loss = values < 0
+        self.wins += int(is_win.sum())
+        self.losses += int(is_loss.sum())
+        self.win_sum += values[is_win].sum()
+        self.loss_sum += values[is_loss].sum()
+        # Long histories can take the winning growth product to inf, as in one pass
+        with np.errstate(over='ignore'):
+            self.growth *= growth.prod()
+            self.win_growth *= growth[is_win].prod()
+            self.loss_growth *= growth[is_loss].prod()
+
+        peak = np.fmax.accumulate(np.concatenate([[self.peak], equity]))[1:]
+        self.peak = peak[-1]
+        drawdowns = equity / peak - 1
+        if np.any(~np.isnan(drawdowns)):
+            self.max_drawdown = np.fmin(self.max_drawdown, np.nanmin(drawdowns))
+        return drawdowns
+
+    def metrics(self, risk_free_rate: float = 0.02) -> Dict:
+        """Metrics of everything added so far, as calculate_metrics returns them."""
+        metrics = {}
+        metrics['total_return'] = self.growth - 1 if self.count else 0.0
+        metrics['annualized_return'] = (1 + metrics['total_return']) ** (252 / self.bars) - 1
+        metrics['volatility'] = (np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan) * np.sqrt(252)
+        metrics['sharpe_ratio'] = (metrics['annualized_return'] - risk_free_rate) / metrics['volatility']
+        metrics['max_drawdown'] = self.max_drawdown
+        metrics['win_rate'] = self.wins / self.bars
+        metrics['avg_win'] = self.win_sum / self.wins if self.wins > 0 else 0
+        metrics['avg_loss'] = self.loss_sum / self.losses if self.losses > 0 else 0
+        total_wins = self.win_growth - 1
+        total_losses = abs(self.loss_growth - 1)
+        metrics['profit_factor'] = total_wins / total_losses if total_losses != 0 else float('inf')
+        return metrics
@@ -1,9 +1,16 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import pandas as pd
 import numpy as np
 from data.data_manager import DataManager
 from strategy.strategy_engine import StrategyEngine
 from analysis.performance_analyzer import PerformanceAnalyzer
+from data.memory_cache import LRUCache
+from data.result_store import ResultStore
+from analysis.instrumentation import Instrumentation, StageMetrics, stage
+from jobs.job_queue import JobQueue
+from contextlib import nullcontext
+from visualization.downsample import downsample_indices
+import base64
 import json
 import logging
 from datetime import datetime
@@ -11,22 +18,49 @@ import os
 
 app = Flask(__name__)
 
-# Configure logging
-log_dir = 'logs'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-log_file = os.path.join(log_dir, f'backtesting_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+def configure_logging(log_dir: str = 'logs') -> None:
+    """Log to the console and to a timestamped file under log_dir (called when the app is served)."""
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    log_file = os.path.join(log_dir, f'backtesting_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+
 logger = logging.getLogger(__name__)
 
+# Indicators configured for every web backtest: (name, type, window)
+INDICATORS = (
+    ('sma_short', 'sma', 20),
+    ('sma_long', 'sma', 50),
+    ('rsi', 'rsi', 14),
+)
+
+# Float dtype of cached market data and indicators; BACKTEST_DTYPE=float32 halves their memory
+DATA_DTYPE = os.environ.get('BACKTEST_DTYPE', 'float64')
+
+# /run_backtest response formats: full per-series JSON lists, or compact (see build_compact_response)
+RESPONSE_FORMATS = ('json', 'columnar', 'binary')
+
+# Cleaned market data and indicator columns shared across requests
+cache = LRUCache(max_bytes=int(os.environ.get('BACKTEST_CACHE_MB', 256)) * 1024 * 1024)
+
+# Backtests and reports persisted across runs and processes; BACKTEST_RESULT_STORE_MB=0 turns it off
+RESULT_STORE_MB = int(os.environ.get('BACKTEST_RESULT_STORE_MB', 1024))
+result_store = (ResultStore(os.environ.get('BACKTEST_RESULT_DIR', 'results'), max_bytes=RESULT_STORE_MB * 1024 * 1024)
+                if RESULT_STORE_MB else None)
+
+# Per-stage instrumentation of /run_backtest; BACKTEST_INSTRUMENTATION=0 turns it off
+INSTRUMENTATION = os.environ.get('BACKTEST_INSTRUMENTATION', '1') != '0'
+TRACE_MEMORY = os.environ.get('BACKTEST_TRACE_MEMORY', '0') == '1'
+stage_metrics = StageMetrics()
+
 def replace_nan_with_none(obj):
     if isinstance(obj, (float, np.float64)) and np.isnan(obj):
         return None
@@ -36,96 +70,288 @@ def replace_nan_with_none(obj):
         return [replace_nan_with_none(item) for item in obj]
     return obj
 
+def build_response(market_data: pd.DataFrame, backtest_results: dict, performance_report: dict) -> dict:
+    """Build the JSON-ready /run_backtest response from the backtest outputs."""
+    # Prepare data for visualization
+    portfolio_data = {
+        'dates': backtest_results['portfolio'].index.astype(str).tolist(),
+        'total': backtest_results['portfolio']['total'].fillna(0).tolist(),
+        'holdings': backtest_results['portfolio']['holdings'].fillna(0).tolist(),
+        'cash': backtest_results['portfolio']['cash'].fillna(0).tolist()
+    }
+
+    price_data = {
+        'dates': market_data.index.astype(str).tolist(),
+        'close': market_data['Close'].fillna(0).tolist()
+    }
+
+    signals_data = {
+        'dates': backtest_results['signals'].index.astype(str).tolist(),
+        'signals': backtest_results['signals']['signal'].fillna(0).tolist()
+    }
+
+    indicators = backtest_results['indicators']
+    indicators_data = {
+        'sma_short': indicators['sma_short_sma'].fillna(0).tolist(),
+        'sma_long': indicators['sma_long_sma'].fillna(0).tolist(),
+        'rsi': indicators['rsi_rsi'].fillna(0).tolist()
+    }
+
+    # Prepare performance metrics
+    metrics = performance_report['performance_metrics']
+    trade_analysis = dict(performance_report['trade_analysis'])
+    trades = trade_analysis['trades']
+    trade_analysis['trades'] = trades.assign(
+        entry_date=trades['entry_date'].astype(str),
+        exit_date=trades['exit_date'].astype(str)
+    ).to_dict('records')
+
+    response = {
+        'success': True,
+        'portfolio_data': portfolio_data,
+        'price_data': price_data,
+        'signals_data': signals_data,
+        'indicators_data': indicators_data,
+        'metrics': replace_nan_with_none(metrics),
+        'trade_analysis': replace_nan_with_none(trade_analysis)
+    }
+
+    return response
+
+def _json_array(values: np.ndarray) -> list:
+    """Float array as a JSON list, with null for NaN and infinities."""
+    return np.where(np.isfinite(values), values, None).tolist()
+
+def _binary_array(values: np.ndarray, dtype: str) -> dict:
+    """Float array as base64-encoded little-endian bytes, decodable with a JS typed array."""
+    data = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()
+    return {'dtype': dtype, 'data': base64.b64encode(data).decode('ascii')}
+
+def build_compact_response(market_data: pd.DataFrame, backtest_results: dict, performance_report: dict,
+                           encoding: str = 'columnar', max_points: int = None) -> dict:
+    """
+    Build a compact /run_backtest response.
+
+    All series share one date axis. With max_points, every series is
+    downsampled to the bars LTTB picks on the equity curve plus every bar
+    where the position changes (when those fit in half the budget), so the
+    series stay flat in size as backtests grow. 'columnar' sends JSON arrays (null for NaN); 'binary' sends
+    base64 float32 arrays and float64 epoch-millisecond dates.
+    """
+    portfolio = backtest_results['portfolio']
+    indicators = backtest_results['indicators']
+    columns = {
+        'total': portfolio['total'],
+        'holdings': portfolio['holdings'],
+        'cash': portfolio['cash'],
+        'close': market_data['Close'],
+        'signal': backtest_results['signals']['signal'],
+        'sma_short': indicators['sma_short_sma'],
+        'sma_long': indicators['sma_long_sma'],
+        'rsi': indicators['rsi_rsi']
+    }
+    series = {name: column.to_numpy(dtype=np.float64) for name, column in columns.items()}
+    dates = portfolio.index
+
+    if max_points and max_points < len(dates):
+        position = portfolio['position'].to_numpy()
+        changes = np.flatnonzero(position[1:] != position[:-1]) + 1
+        if len(changes) > min(max_points // 2, max_points - 3):
+            changes = None  # Too many trades to mark them all within the budget
+        # LTTB needs at least the two end points and one bucket
+        budget = max(max_points - (len(changes) if changes is not None else 0), 3)
+        indices = downsample_indices(series['total'], budget, keep=changes)
+        series = {name: values[indices] for name, values in series.items()}
+        dates = dates[indices]
+
+    if encoding == 'binary':
+        epoch_ms = (pd.to_datetime(dates, utc=True) - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(milliseconds=1)
+        date_axis = _binary_array(np.asarray(epoch_ms, dtype=np.float64), 'float64')
+        series = {name: _binary_array(values, 'float32') for name, values in series.items()}
+    else:
+        date_axis = dates.astype(str).tolist()
+        series = {name: _json_array(values) for name, values in series.items()}
+
+    trade_analysis = dict(performance_report['trade_analysis'])
+    trades = trade_analysis['trades']
+    trade_analysis['trades'] = {
+        column: (trades[column].astype(str).tolist() if column.endswith('_date')
+                 else _json_array(trades[column].to_numpy(dtype=np.float64)))
+        for column in trades.columns
+    }
+    metrics = performance_report['performance_metrics']
+
+    return {
+        'success': True,
+        'format': encoding,
+        'bars': len(portfolio),
+        'points': len(dates),
+        'dates': date_axis,
+        'series': series,
+        'metrics': {name: float(value) if np.isfinite(value) else None for name, value in metrics.items()},
+        'trade_analysis': trade_analysis
+    }
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/run_backtest', methods=['POST'])
-def run_backtest():
-    try:
-        # Get parameters from request
-        data = request.json
-        symbol = data.get('symbol', 'AAPL')
-        start_date = data.get('start_date', '2020-01-01')
-        end_date = data.get('end_date', '2023-01-01')
-        initial_capital = float(data.get('initial_capital', 10000))
-        
+def backtest_params(data: dict) -> dict:
+    """Normalize /run_backtest request fields into job parameters."""
+    if data.get('format', 'json') not in RESPONSE_FORMATS:
+        raise ValueError(f"Unsupported response format: {data['format']}")
+    max_points = int(data['max_points']) if data.get('max_points') else None
+    if max_points is not None and max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    return {
+        'symbol': data.get('symbol', 'AAPL'),
+        'start_date': data.get('start_date', '2020-01-01'),
+        'end_date': data.get('end_date', '2023-01-01'),
+        'initial_capital': float(data.get('initial_capital', 10000)),
+        'format': data.get('format', 'json'),
+        'max_points': max_points
+    }
+
+def execute_backtest(params: dict, progress=None) -> dict:
+    """
+    Run the full pipeline for one set of backtest parameters.
+
+    Args:
+        params: Output of backtest_params
+        progress: Optional callable (fraction, message) called as stages start
+
+    Returns:
+        The JSON-ready /run_backtest response
+    """
+    progress = progress or (lambda fraction, message: None)
+    symbol = params['symbol']
+    start_date = params['start_date']
+    end_date = params['end_date']
+    initial_capital = params['initial_capital']
+
+    instrumentation = Instrumentation(trace_memory=TRACE_MEMORY, metrics=stage_metrics) if INSTRUMENTATION else None
+    with instrumentation or nullcontext():
         # Initialize components
-        data_manager = DataManager()
-        strategy_engine = StrategyEngine()
-        performance_analyzer = PerformanceAnalyzer()
+        strategy_engine = StrategyEngine(result_store=result_store)
+        performance_analyzer = PerformanceAnalyzer(result_store=result_store)
+        data_key = (symbol, start_date, end_date, '1d', DATA_DTYPE)
 
         # Load data
-        logger.info("Loading data...")
-        market_data = data_manager.load_data(
-            source='yfinance',
-            symbol=symbol,
-            start_date=start_date,
-            end_date=end_date,
-            interval='1d'
-        )
-        market_data = data_manager.clean_data(market_data)
+        def load_market_data():
+            logger.info("Loading data...")
+            data_manager = DataManager(dtype=DATA_DTYPE)
+            market_data = data_manager.load_data(
+                source='yfinance',
+                symbol=symbol,
+                start_date=start_date,
+                end_date=end_date,
+                interval='1d'
+            )
+            return data_manager.clean_data(market_data)
+
+        # The backtest leaves its input untouched, so the cached frame is shared as is
+        progress(0.1, 'Loading data')
+        with stage('market_data'):
+            market_data = cache.get_or_compute(('market_data',) + data_key, load_market_data)
 
         # Configure strategy
         logger.info("Configuring strategy...")
-        strategy_engine.add_indicator('sma_short', 'sma', close=market_data['Close'], window=20)
-        strategy_engine.add_indicator('sma_long', 'sma', close=market_data['Close'], window=50)
-        strategy_engine.add_indicator('rsi', 'rsi', close=market_data['Close'], window=14)
+        for name, indicator_type, window in INDICATORS:
+            strategy_engine.add_indicator(name, indicator_type, window=window)
+
+        def compute_indicators():
+            logger.info("Calculating indicators...")
+            return strategy_engine.compute_indicators(market_data)
+
+        progress(0.4, 'Calculating indicators')
+        with stage('indicators'):
+            indicators = cache.get_or_compute(('indicators',) + data_key + (INDICATORS,), compute_indicators)
 
         # Run backtest
         logger.info("Running backtest...")
-        backtest_results = strategy_engine.backtest(market_data, initial_capital=initial_capital)
+        progress(0.6, 'Running backtest')
+        backtest_results = strategy_engine.backtest(market_data, initial_capital=initial_capital, indicators=indicators)
 
         # Analyze performance
         logger.info("Analyzing performance...")
+        progress(0.8, 'Analyzing performance')
         performance_report = performance_analyzer.generate_report(
             backtest_results['portfolio'],
             backtest_results['signals']
         )
 
-        # Prepare data for visualization
-        portfolio_data = {
-            'dates': backtest_results['portfolio'].index.astype(str).tolist(),
-            'total': backtest_results['portfolio']['total'].fillna(0).tolist(),
-            'holdings': backtest_results['portfolio']['holdings'].fillna(0).tolist(),
-            'cash': backtest_results['portfolio']['cash'].fillna(0).tolist()
-        }
-
-        price_data = {
-            'dates': market_data.index.astype(str).tolist(),
-            'close': market_data['Close'].fillna(0).tolist()
-        }
-
-        signals_data = {
-            'dates': backtest_results['signals'].index.astype(str).tolist(),
-            'signals': backtest_results['signals']['signal'].fillna(0).tolist()
-        }
-
-        indicators_data = {
-            'sma_short': market_data['sma_short_sma'].fillna(0).tolist(),
-            'sma_long': market_data['sma_long_sma'].fillna(0).tolist(),
-            'rsi': market_data['rsi_rsi'].fillna(0).tolist()
-        }
-
-        # Prepare performance metrics
-        metrics = performance_report['performance_metrics']
-        trade_analysis = performance_report['trade_analysis']
-
-        response = {
-            'success': True,
-            'portfolio_data': portfolio_data,
-            'price_data': price_data,
-            'signals_data': signals_data,
-            'indicators_data': indicators_data,
-            'metrics': replace_nan_with_none(metrics),
-            'trade_analysis': replace_nan_with_none(trade_analysis)
-        }
-
-        return jsonify(response)
+        progress(0.9, 'Preparing results')
+        with stage('serialize', rows=len(market_data)):
+            if params['format'] != 'json':
+                response = build_compact_response(market_data, backtest_results, performance_report,
+                                                  params['format'], params['max_points'])
+            else:
+                response = build_response(market_data, backtest_results, performance_report)
+
+    if instrumentation is not None:
+        response['stats'] = instrumentation.stats()
+    return response
+
+# Background backtests, memoized by request parameters
+jobs = JobQueue(execute_backtest, max_workers=int(os.environ.get('BACKTEST_JOB_WORKERS', 2)))
+
+@app.route('/run_backtest', methods=['POST'])
+def run_backtest():
+    try:
+        data = request.json
+        params = backtest_params(data)
+        if data.get('async'):
+            # Job submission mode: poll /jobs/<job_id> or stream /jobs/<job_id>/events
+            job = jobs.submit(params)
+            return jsonify({'success': True, **job.to_dict()}), 202
+        return jsonify(execute_backtest(params))
 
     except Exception as e:
         logger.error(f"Error in backtest: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f"Unknown job: {job_id}"}), 404
+    return jsonify({'success': True, **job.to_dict(include_result=True)})
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f"Unknown job: {job_id}"}), 404
+
+    def events():
+        for state in job.watch():
+            yield f"data: {json.dumps(state)}\n\n"
+
+    return Response(events(), mimetype='text/event-stream')
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(cache.stats())
+
+@app.route('/results')
+def stored_results():
+    """List stored results, optionally of one kind (?kind=backtest)."""
+    if result_store is None:
+        return jsonify([])
+    entries = result_store.query(kind=request.args.get('kind'))
+    entries[['created', 'last_used']] = entries[['created', 'last_used']].astype(str)
+    return jsonify(replace_nan_with_none(entries.to_dict(orient='records')))
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        'instrumentation': INSTRUMENTATION,
+        'stages': stage_metrics.summary(),
+        'cache': cache.stats(),
+        'results': result_store.stats() if result_store is not None else None,
+        'jobs': jobs.stats()
+    })
+
 if __name__ == '__main__':
+    configure_logging()
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Cold import time of the entry points, checked against a budget.
+
+Each module is imported in a fresh interpreter several times; the best
+time is reported together with the optional heavy dependencies the
+import pulled in. The check fails when a module exceeds its budget or
+loads a dependency that should only be imported on demand:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget main=0.5 --repeat 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Module -> import-time budget in seconds
+BUDGETS = {
+    'main': 0.6,
+    'app': 0.7,
+    'data.data_manager': 0.5,
+    'strategy.strategy_engine': 0.5,
+    'visualization.plotter': 0.5
+}
+
+# Dependencies that must only be imported when used (network fetch, plotting)
+LAZY_MODULES = ('yfinance', 'matplotlib')
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int = 5) -> Dict:
+    """Best cold import time of module over fresh interpreters, and the lazy modules it loaded."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, lazy=LAZY_MODULES)],
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {'seconds': min(run['seconds'] for run in runs), 'loaded': runs[0]['loaded']}
+
+
+def parse_budget(text: str) -> tuple:
+    module, _, seconds = text.partition('=')
+    return module, float(seconds)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check cold import times against a budget")
+    parser.add_argument('--budget', action='append', type=parse_budget, default=[],
+                        help="MODULE=SECONDS, overriding or adding a budget (repeatable)")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per module (best time kept)")
+    args = parser.parse_args(argv)
+
+    budgets = {**BUDGETS, **dict(args.budget)}
+    failed = False
+    print(f"{'module':28} {'seconds':>8} {'budget':>8}  lazy modules loaded")
+    for module, budget in budgets.items():
+        result = measure(module, args.repeat)
+        over = result['seconds'] > budget
+        failed = failed or over or bool(result['loaded'])
+        flag = '  OVER BUDGET' if over else ''
+        print(f"{module:28} {result['seconds']:8.3f} {budget:8.3f}  {', '.join(result['loaded']) or '-'}{flag}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Pipeline benchmarks on synthetic OHLCV data.
+
+Every case runs the same stages the app runs, on generated data, and
+records the best and median wall time over several repeats plus the peak
+traced allocation of each stage:
+
+    load       DataManager.load_data / load_panel through the columnar cache (cold)
+    reload     the same load again, served from the cache
+    clean      DataManager.clean_data (single symbol)
+    indicators StrategyEngine.calculate_indicators / calculate_panel_indicators
+    backtest   StrategyEngine.backtest / backtest_portfolio
+    analysis   PerformanceAnalyzer.generate_report
+    serialize  app.build_response + JSON encoding (single symbol)
+
+Results are written as JSON and can be compared against a stored
+baseline from an earlier run:
+
+    python -m benchmarks.run_benchmarks --suite quick --output results.json
+    python -m benchmarks.run_benchmarks --suite quick --baseline results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data.data_manager import DataManager
+from data.sources import generate_ohlcv
+from strategy.strategy_engine import StrategyEngine
+from analysis.performance_analyzer import PerformanceAnalyzer
+
+# Suite name -> (bars, symbols) cases
+SUITES = {
+    'quick': [(1_000, 1), (100_000, 1), (1_000, 100)],
+    'full': [(1_000, 1), (100_000, 1), (10_000_000, 1), (1_000, 100), (100_000, 10), (1_000, 1000)],
+}
+
+INDICATORS = (
+    ('sma_short', 'sma', 20),
+    ('sma_long', 'sma', 50),
+    ('rsi', 'rsi', 14),
+)
+
+# Histories longer than this use minute bars, so 10M bars still fit the datetime64 range
+MAX_DAILY_BARS = 50_000
+
+logger = logging.getLogger(__name__)
+
+
+def make_universe(n_bars: int, n_symbols: int, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """Generate one synthetic OHLCV frame per symbol."""
+    freq = 'B' if n_bars <= MAX_DAILY_BARS else 'min'
+    return {f'SYM{i:04d}': generate_ohlcv(n_bars, seed=seed + i, freq=freq) for i in range(n_symbols)}
+
+
+class StageTimer:
+    """Collects per-stage wall time and, when tracing, peak allocation."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str, rows: int):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self.stages[name] = {'seconds': elapsed, 'peak_bytes': peak, 'rows': rows}
+
+
+def run_pipeline(universe: Dict[str, pd.DataFrame], timer: StageTimer, dtype: str = 'float64') -> None:
+    """Run every stage once on the universe, recording each stage in timer."""
+    symbols = list(universe)
+    first = universe[symbols[0]]
+    n_bars = len(first)
+    start_date = str(first.index[0].date())
+    end_date = str((first.index[-1] + pd.Timedelta(days=1)).date())
+    interval = '1d' if n_bars <= MAX_DAILY_BARS else '1m'
+    rows = n_bars * len(symbols)
+
+    strategy_engine = StrategyEngine()
+    for name, indicator_type, window in INDICATORS:
+        strategy_engine.add_indicator(name, indicator_type, window=window)
+    performance_analyzer = PerformanceAnalyzer()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        data_manager = DataManager(cache_dir=cache_dir, dtype=dtype)
+        data_manager.register_source('synthetic', lambda symbol, start, end, interval: universe[symbol])
+
+        if len(symbols) == 1:
+            symbol = symbols[0]
+            for stage in ('load', 'reload'):
+                with timer.stage(stage, rows):
+                    data = data_manager.load_data('synthetic', symbol, start_date, end_date, interval)
+
+            with timer.stage('clean', rows):
+                data = data_manager.clean_data(data)
+
+            with timer.stage('indicators', rows):
+                indicators = strategy_engine.compute_indicators(data)
+
+            with timer.stage('backtest', rows):
+                results = strategy_engine.backtest(data, initial_capital=10000.0, indicators=indicators)
+
+            with timer.stage('analysis', rows):
+                report = performance_analyzer.generate_report(results['portfolio'], results['signals'])
+
+            # Imported here: the app module configures logging on import
+            from app import build_response
+            with timer.stage('serialize', rows):
+                json.dumps(build_response(data, results, report))
+        else:
+            for stage in ('load', 'reload'):
+                with timer.stage(stage, rows):
+                    prices = data_manager.load_panel(symbols, start_date, end_date, interval, source='synthetic')
+
+            with timer.stage('indicators', rows):
+                strategy_engine.calculate_panel_indicators(prices)
+
+            with timer.stage('backtest', rows):
+                results = strategy_engine.backtest_portfolio(prices, initial_capital=10000.0 * len(symbols))
+
+            with timer.stage('analysis', rows):
+                performance_analyzer.generate_report(results['portfolio'], results['signals'], results['trades'])
+
+
+def benchmark_case(n_bars: int, n_symbols: int, repeat: int = 3, memory: bool = True,
+                   dtype: str = 'float64') -> List[Dict]:
+    """Benchmark one (bars, symbols) case; returns one result row per stage."""
+    universe = make_universe(n_bars, n_symbols)
+    timings = []
+    for _ in range(repeat):
+        timer = StageTimer()
+        run_pipeline(universe, timer, dtype)
+        timings.append(timer.stages)
+
+    # A separate traced pass, so tracing overhead does not skew the timings
+    peaks = {}
+    if memory:
+        timer = StageTimer(trace_memory=True)
+        run_pipeline(universe, timer, dtype)
+        peaks = {stage: values['peak_bytes'] for stage, values in timer.stages.items()}
+
+    case = f'{n_bars}x{n_symbols}'
+    rows = []
+    for stage, values in timings[0].items():
+        seconds = [timing[stage]['seconds'] for timing in timings]
+        rows.append({
+            'case': case,
+            'bars': n_bars,
+            'symbols': n_symbols,
+            'dtype': dtype,
+            'stage': stage,
+            'rows': values['rows'],
+            'seconds': min(seconds),
+            'median_seconds': statistics.median(seconds),
+            'rows_per_second': values['rows'] / min(seconds) if min(seconds) > 0 else None,
+            'peak_bytes': peaks.get(stage)
+        })
+    return rows
+
+
+def run_suite(cases: List[Tuple[int, int]], repeat: int = 3, memory: bool = True, dtype: str = 'float64') -> Dict:
+    """Run all cases and return a machine-readable result document."""
+    results = []
+    for n_bars, n_symbols in cases:
+        logger.info(f"Benchmarking {n_bars} bars x {n_symbols} symbols")
+        results.extend(benchmark_case(n_bars, n_symbols, repeat, memory, dtype))
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float = 0.2, min_seconds: float = 0.01) -> List[Dict]:
+    """
+    Compare a run against a baseline run, stage by stage.
+
+    Args:
+        results: Output of run_suite
+        baseline: Output of an earlier run_suite
+        threshold: Relative slowdown (or memory growth) that counts as a regression
+        min_seconds: Stages faster than this in the baseline are too noisy to flag on time
+
+    Returns:
+        One row per stage present in both runs, with time and memory ratios
+        and a 'regression' flag
+    """
+    previous = {(row['case'], row.get('dtype', 'float64'), row['stage']): row for row in baseline['results']}
+    rows = []
+    for row in results['results']:
+        before = previous.get((row['case'], row['dtype'], row['stage']))
+        if before is None:
+            continue
+        time_ratio = row['seconds'] / before['seconds'] if before['seconds'] else None
+        memory_ratio = None
+        if row['peak_bytes'] is not None and before.get('peak_bytes'):
+            memory_ratio = row['peak_bytes'] / before['peak_bytes']
+        slower = time_ratio is not None and time_ratio > 1 + threshold and before['seconds'] >= min_seconds
+        larger = memory_ratio is not None and memory_ratio > 1 + threshold
+        rows.append({
+            'case': row['case'],
+            'stage': row['stage'],
+            'seconds': row['seconds'],
+            'baseline_seconds': before['seconds'],
+            'time_ratio': time_ratio,
+            'memory_ratio': memory_ratio,
+            'regression': slower or larger
+        })
+    return rows
+
+
+def parse_case(text: str) -> Tuple[int, int]:
+    """Parse a 'BARSxSYMBOLS' case, e.g. '100000x1'."""
+    bars, _, symbols = text.lower().partition('x')
+    return int(bars), int(symbols or 1)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the backtesting pipeline on synthetic data")
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick')
+    parser.add_argument('--case', action='append', type=parse_case, dest='cases',
+                        help="Run only these BARSxSYMBOLS cases instead of the suite (repeatable)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case (best and median reported)")
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help="Float dtype of cleaned market data")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced pass for peak allocations")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    parser.add_argument('--baseline', help="Compare against a results JSON from an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    results = run_suite(args.cases or SUITES[args.suite], args.repeat, not args.no_memory, args.dtype)
+
+    table = pd.DataFrame(results['results'])
+    print(table[['case', 'stage', 'seconds', 'median_seconds', 'peak_bytes']].to_string(index=False))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            comparison = compare(results, json.load(f), args.threshold)
+        print(pd.DataFrame(comparison).to_string(index=False))
+        if any(row['regression'] for row in comparison):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# (symbol, start_date, end_date, interval)
+FetchTask = Tuple[str, str, str, str]
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing call starts at least 1 / rate seconds apart."""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self) -> None:
+        """Block until the next call is allowed to start."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class BulkDownloader:
+    def __init__(self,
+                 fetch: Callable[[str, str, str, str], pd.DataFrame],
+                 max_workers: int = 8,
+                 rate_limit: Optional[float] = None,
+                 max_retries: int = 3,
+                 backoff: float = 0.5):
+        """
+        Run many fetch calls concurrently with bounded parallelism.
+
+        Args:
+            fetch: Callable (symbol, start_date, end_date, interval) -> DataFrame
+            max_workers: Maximum number of concurrent fetches
+            rate_limit: Maximum fetch starts per second across all workers (None: unlimited)
+            max_retries: Retries per task after the first failed attempt
+            backoff: Base delay in seconds, doubled after every failed attempt
+        """
+        self.logger = logging.getLogger(__name__)
+        self.fetch = fetch
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def download(self, tasks: List[FetchTask]) -> Tuple[Dict[FetchTask, pd.DataFrame], Dict[FetchTask, str]]:
+        """
+        Fetch all tasks and return (results, errors), both keyed by task.
+
+        A task lands in errors once it has failed max_retries + 1 times.
+        """
+        results = {}
+        errors = {}
+        if not tasks:
+            return results, errors
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            futures = {task: executor.submit(self._fetch_with_retry, task) for task in tasks}
+            for task, future in futures.items():
+                try:
+                    results[task] = future.result()
+                except Exception as e:
+                    errors[task] = str(e)
+                    self.logger.error(f"Failed to fetch {task[0]} {task[1]}..{task[2]} ({task[3]}): {e}")
+        return results, errors
+
+    def _fetch_with_retry(self, task: FetchTask) -> pd.DataFrame:
+        """Fetch one task, retrying with exponential backoff and jitter."""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                return self.fetch(*task)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                self.logger.warning(f"Fetching {task[0]} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
@@ -0,0 +1,327 @@
+import json
+import os
+import logging
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class ColumnarStore:
+    """
+    On-disk market data store with one columnar dataset per symbol/interval.
+
+    Each dataset is a directory holding ``index.<version>.npy`` (int64
+    nanoseconds, UTC for tz-aware data), one ``<i>.<version>.npy`` file per
+    column and ``meta.json`` with the column order, timezone, the contiguous
+    date range ``[start, end)`` that has been fetched so far and the version
+    of the arrays it describes. Every save writes a new version and then
+    swaps meta.json, so readers always see matching metadata and arrays.
+    Arrays are opened memory-mapped, so a read only touches the rows it
+    slices. Writers of one dataset in the same process are serialized.
+    """
+
+    # Dataset directory -> lock serializing its writers across store instances
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, root: str):
+        self.root = root
+        self.logger = logging.getLogger(__name__)
+
+    def lock(self, symbol: str, interval: str) -> threading.Lock:
+        """Lock held while a dataset is being rewritten."""
+        key = os.path.realpath(self.dataset_dir(symbol, interval))
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def dataset_dir(self, symbol: str, interval: str) -> str:
+        """Directory holding the dataset for a symbol/interval."""
+        return os.path.join(self.root, f"{symbol}_{interval}")
+
+    def metadata(self, symbol: str, interval: str) -> Optional[Dict]:
+        """Return the dataset metadata, or None if nothing is stored."""
+        meta_file = os.path.join(self.dataset_dir(symbol, interval), 'meta.json')
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file) as f:
+            return json.load(f)
+
+    def intervals(self, symbol: str) -> List[str]:
+        """Intervals stored for a symbol."""
+        if not os.path.isdir(self.root):
+            return []
+        prefix = f"{symbol}_"
+        return sorted(name[len(prefix):] for name in os.listdir(self.root)
+                      if name.startswith(prefix) and os.path.exists(os.path.join(self.root, name, 'meta.json')))
+
+    def coverage(self, symbol: str, interval: str) -> Optional[Tuple[str, str]]:
+        """Return the stored date range as (start, end), end exclusive."""
+        meta = self.metadata(symbol, interval)
+        if meta is None:
+            return None
+        return meta['start'], meta['end']
+
+    def open_arrays(self, symbol: str, interval: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Open the index and column arrays memory-mapped, read-only."""
+        _, index, columns = self._open(symbol, interval)
+        return index, columns
+
+    def _open(self, symbol: str, interval: str) -> Tuple[Dict, np.ndarray, Dict[str, np.ndarray]]:
+        """The metadata and the arrays of the version it describes."""
+        path = self.dataset_dir(symbol, interval)
+        for attempt in range(3):
+            meta = self.metadata(symbol, interval)
+            if meta is None:
+                raise KeyError(f"No stored data for {symbol} ({interval})")
+            # Arrays written by ColumnarWriter may be preallocated beyond the rows in use
+            rows = meta.get('rows')
+            try:
+                index = np.load(_array_file(path, 'index', meta), mmap_mode='r')[:rows]
+                columns = {col: np.load(_array_file(path, i, meta), mmap_mode='r')[:rows]
+                           for i, col in enumerate(meta['columns'])}
+            except FileNotFoundError:
+                # Superseded by two newer saves between reading meta.json and the arrays
+                if attempt == 2:
+                    raise
+                continue
+            return meta, index, columns
+
+    def read(self, symbol: str, interval: str, start_date: Optional[str] = None,
+             end_date: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read the rows in [start_date, end_date) from a stored dataset, optionally only some columns."""
+        meta, index, arrays = self._open(symbol, interval)
+        if columns is not None:
+            arrays = {col: arrays[col] for col in columns}
+        lo, hi = self._row_range(index, meta['tz'], start_date, end_date)
+
+        data = pd.DataFrame({col: np.array(values[lo:hi]) for col, values in arrays.items()},
+                            index=self._to_index(np.array(index[lo:hi]), meta['tz']))
+        data.index.name = meta.get('index_name')
+        return data
+
+    def iter_chunks(self, symbol: str, interval: str, start_date: Optional[str] = None,
+                    end_date: Optional[str] = None, chunk_rows: int = 1_000_000,
+                    columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Read [start_date, end_date) as consecutive frames of at most chunk_rows rows.
+
+        Only one chunk is copied out of the memory-mapped arrays at a time,
+        so datasets larger than memory can be processed in order.
+        """
+        meta, index, arrays = self._open(symbol, interval)
+        if columns is not None:
+            arrays = {col: arrays[col] for col in columns}
+        lo, hi = self._row_range(index, meta['tz'], start_date, end_date)
+        for chunk_start in range(lo, hi, chunk_rows):
+            chunk_end = min(chunk_start + chunk_rows, hi)
+            data = pd.DataFrame({col: np.array(values[chunk_start:chunk_end]) for col, values in arrays.items()},
+                                index=self._to_index(np.array(index[chunk_start:chunk_end]), meta['tz']))
+            data.index.name = meta.get('index_name')
+            yield data
+
+    def row_count(self, symbol: str, interval: str, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None) -> int:
+        """Number of stored rows in [start_date, end_date), without reading them."""
+        if self.metadata(symbol, interval) is None:
+            return 0
+        meta, index, _ = self._open(symbol, interval)
+        lo, hi = self._row_range(index, meta['tz'], start_date, end_date)
+        return int(hi - lo)
+
+    def write(self, symbol: str, interval: str, data: pd.DataFrame, start_date: str, end_date: str) -> None:
+        """
+        Merge newly fetched rows into a dataset and extend its coverage.
+
+        The fetched range must touch or overlap the stored one so the
+        coverage stays a single contiguous range.
+        """
+        with self.lock(symbol, interval):
+            self._merge(symbol, interval, data, start_date, end_date)
+
+    def _merge(self, symbol: str, interval: str, data: pd.DataFrame, start_date: str, end_date: str) -> None:
+        meta = self.metadata(symbol, interval)
+        if meta is not None:
+            if start_date > meta['end'] or end_date < meta['start']:
+                raise ValueError(f"Range {start_date}..{end_date} is not contiguous with stored "
+                                 f"{meta['start']}..{meta['end']} for {symbol} ({interval})")
+            stored = self.read(symbol, interval)
+            if len(data) == 0:
+                merged = stored
+            elif len(stored) == 0:
+                merged = data
+            else:
+                data = self._align_tz(data, stored.index.tz)
+                merged = pd.concat([stored, data])
+                merged.index.name = stored.index.name if stored.index.name is not None else data.index.name
+            start_date = min(start_date, meta['start'])
+            end_date = max(end_date, meta['end'])
+        else:
+            merged = data
+
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        self._save(symbol, interval, merged, start_date, end_date)
+
+    def _save(self, symbol: str, interval: str, data: pd.DataFrame, start_date: str, end_date: str) -> None:
+        """Write a new version of all arrays, then the metadata that makes them visible."""
+        path = self.dataset_dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        version = _new_version()
+
+        index = pd.DatetimeIndex(data.index)
+        tz = str(index.tz) if index.tz is not None else None
+        meta = {
+            'columns': list(data.columns),
+            'tz': tz,
+            'index_name': data.index.name,
+            'start': start_date,
+            'end': end_date,
+            'rows': len(data),
+            'version': version
+        }
+        np.save(_array_file(path, 'index', meta), index.as_unit('ns').asi8)
+        for i, col in enumerate(meta['columns']):
+            np.save(_array_file(path, i, meta), np.ascontiguousarray(data[col].to_numpy(dtype=np.float64)))
+        self._save_meta(path, meta)
+
+    @staticmethod
+    def _save_meta(path: str, meta: Dict) -> None:
+        """
+        Atomically replace meta.json, which makes the array version it names
+        visible, and delete older versions. The one it replaces is kept for
+        readers that loaded the previous meta.json just before the swap, and
+        newer ones (still being written) are left alone.
+        """
+        meta_file = os.path.join(path, 'meta.json')
+        previous = None
+        if os.path.exists(meta_file):
+            with open(meta_file) as f:
+                previous = json.load(f).get('version')
+        fd, tmp_file = tempfile.mkstemp(dir=path, prefix='meta.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, meta_file)
+
+        oldest_kept = previous or meta.get('version')
+        for name in os.listdir(path):
+            parts = name.split('.')
+            if not name.endswith('.npy'):
+                continue
+            version = parts[1] if len(parts) == 3 else None
+            # Unversioned arrays predate versioning and are older than any version
+            if (version is None and previous is not None) or (version is not None and version < oldest_kept):
+                try:
+                    os.remove(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _align_tz(data: pd.DataFrame, tz) -> pd.DataFrame:
+        """Convert a frame's index to the stored timezone."""
+        index = pd.DatetimeIndex(data.index)
+        if tz is not None and index.tz is not None:
+            index = index.tz_convert(tz)
+        elif tz is not None:
+            index = index.tz_localize(tz)
+        elif index.tz is not None:
+            index = index.tz_localize(None)
+        return data.set_axis(index)
+
+    def _row_range(self, index: np.ndarray, tz: Optional[str], start_date: Optional[str],
+                   end_date: Optional[str]) -> Tuple[int, int]:
+        """Row positions [lo, hi) of a date range in a stored index."""
+        lo = 0 if start_date is None else np.searchsorted(index, self._bound(start_date, tz), side='left')
+        hi = len(index) if end_date is None else np.searchsorted(index, self._bound(end_date, tz), side='left')
+        return lo, hi
+
+    @staticmethod
+    def _bound(date: str, tz: Optional[str]) -> int:
+        """Convert a date string to the stored int64 index representation."""
+        ts = pd.Timestamp(date)
+        if tz is not None:
+            ts = ts.tz_localize(tz) if ts.tzinfo is None else ts.tz_convert(tz)
+        return ts.as_unit('ns').value
+
+    @staticmethod
+    def _to_index(values: np.ndarray, tz: Optional[str]) -> pd.DatetimeIndex:
+        """Rebuild a DatetimeIndex from stored int64 nanoseconds."""
+        if tz is None:
+            return pd.DatetimeIndex(values.astype('datetime64[ns]'))
+        return pd.DatetimeIndex(values.astype('datetime64[ns]')).tz_localize('UTC').tz_convert(tz)
+
+
+def _new_version() -> str:
+    """Array version name; versions sort in the order they were created."""
+    return f"{time.time_ns():016x}{uuid.uuid4().hex[:6]}"
+
+
+def _array_file(path: str, name, meta: Dict) -> str:
+    """File of one array ('index' or a column number) in the version meta describes."""
+    version = meta.get('version')
+    # Datasets saved before arrays were versioned have a single unversioned set
+    return os.path.join(path, f"{name}.{version}.npy" if version else f"{name}.npy")
+
+
+class ColumnarWriter:
+    """
+    Writes a ColumnarStore dataset chunk by chunk.
+
+    The arrays are preallocated as memory-mapped .npy files of a new
+    version for at most ``max_rows`` rows and filled in order, so only the
+    chunk being written needs to be in memory. The dataset becomes visible
+    (replacing any older one, which stays readable until then) when close()
+    writes its metadata with the number of rows used.
+    """
+
+    def __init__(self, store: ColumnarStore, symbol: str, interval: str, columns: List[str],
+                 max_rows: int, tz: Optional[str] = None, index_name: Optional[str] = None):
+        self.store = store
+        self.symbol = symbol
+        self.interval = interval
+        self.columns = list(columns)
+        self.tz = tz
+        self.index_name = index_name
+        self.rows = 0
+
+        self.path = store.dataset_dir(symbol, interval)
+        os.makedirs(self.path, exist_ok=True)
+        self.version = _new_version()
+        version = {'version': self.version}
+        self._index = np.lib.format.open_memmap(_array_file(self.path, 'index', version), mode='w+',
+                                                dtype=np.int64, shape=(max_rows,))
+        self._arrays = [np.lib.format.open_memmap(_array_file(self.path, i, version), mode='w+',
+                                                  dtype=np.float64, shape=(max_rows,))
+                        for i in range(len(self.columns))]
+
+    def write(self, index: pd.DatetimeIndex, values: Dict[str, np.ndarray]) -> None:
+        """Append rows: their timestamps and one array per column."""
+        end = self.rows + len(index)
+        if end > len(self._index):
+            raise ValueError(f"Writing {end} rows exceeds the {len(self._index)} allocated")
+        index = pd.DatetimeIndex(index)
+        if self.tz is not None:
+            index = index.tz_convert(self.tz)
+        self._index[self.rows:end] = index.as_unit('ns').asi8
+        for array, col in zip(self._arrays, self.columns):
+            array[self.rows:end] = values[col]
+        self.rows = end
+
+    def close(self, start_date: str, end_date: str) -> None:
+        """Flush the arrays and publish the dataset's metadata."""
+        for array in [self._index] + self._arrays:
+            array.flush()
+        self._index, self._arrays = None, []
+        with self.store.lock(self.symbol, self.interval):
+            self.store._save_meta(self.path, {
+                'columns': self.columns,
+                'tz': self.tz,
+                'index_name': self.index_name,
+                'start': start_date,
+                'end': end_date,
+                'rows': self.rows,
+                'version': self.version
+            })
@@ -1,54 +1,372 @@
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from typing import Union, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Union, Optional
 import os
+import re
 import logging
+import zoneinfo
+from data.columnar_store import ColumnarStore
+from data.bulk_downloader import BulkDownloader
+from data.resample import can_derive, interval_timedelta, resample_ohlcv
+from analysis.instrumentation import count, stage, timed
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Tried first when recovering the zone of a legacy cache file
+EXCHANGE_ZONES = ['America/New_York', 'America/Chicago', 'Europe/London', 'Europe/Berlin',
+                  'Asia/Tokyo', 'Asia/Hong_Kong', 'Asia/Shanghai', 'Australia/Sydney']
 
 class DataManager:
-    def __init__(self, cache_dir: str = "cache"):
+    def __init__(self, cache_dir: str = "cache", dtype: str = "float64"):
+        """
+        Args:
+            cache_dir: Directory of the columnar cache
+            dtype: Float dtype clean_data stores OHLCV in ('float64' or 'float32')
+        """
         self.cache_dir = cache_dir
+        self.dtype = np.dtype(dtype)
         if not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
+        self.store = ColumnarStore(cache_dir)
+        self.sources = {'yfinance': self._load_yfinance}
         self.logger = logging.getLogger(__name__)
 
+    def register_source(self, name: str, fetch: Callable[[str, str, str, str], pd.DataFrame]) -> None:
+        """Register a data source as a callable (symbol, start_date, end_date, interval) -> DataFrame."""
+        self.sources[name.lower()] = fetch
+
+    @timed()
     def load_data(self, 
                  source: str,
                  symbol: str,
                  start_date: str,
                  end_date: str,
-                 interval: str = "1d") -> pd.DataFrame:
+                 interval: str = "1d",
+                 base_interval: Optional[str] = None) -> pd.DataFrame:
         """
         Load market data from various sources.
+
+        Downloaded data is cached in one columnar dataset per symbol/interval.
+        Requests are sliced from the cached range and only the edges it does
+        not cover are fetched and merged in. CSV files are read directly.
+
+        An interval that is not cached itself but can be built from a finer
+        cached interval covering the range (e.g. 4h or 1d from 1h) is
+        resampled from the finest such base instead of being downloaded;
+        derived bars are cached too (see _load_derived).
         
         Args:
-            source: Data source ('yfinance' or 'csv')
+            source: Data source ('yfinance', 'csv' or a registered source)
             symbol: Asset symbol
             start_date: Start date in YYYY-MM-DD format
             end_date: End date in YYYY-MM-DD format
             interval: Data interval (1d, 1h, etc.)
+            base_interval: Always derive interval from this finer interval,
+                fetching the base bars if they are not cached yet
             
         Returns:
             DataFrame with OHLCV data
         """
-        cache_file = os.path.join(self.cache_dir, f"{symbol}_{start_date}_{end_date}_{interval}.csv")
+        if source.lower() == 'csv':
+            return self._load_csv(symbol)
+        if base_interval is None:
+            base_interval = self._cached_base(symbol, start_date, end_date, interval)
+        if base_interval is not None:
+            return self._load_derived(source, symbol, start_date, end_date, interval, base_interval)
+        fetch = self._get_source(source)
+        self._update_cache(symbol, start_date, end_date, interval, fetch)
+        with stage('store_read') as record:
+            data = self.store.read(symbol, interval, start_date, end_date)
+            record['rows'] = len(data)
+        return data
+
+    def load_timeframes(self,
+                        source: str,
+                        symbol: str,
+                        start_date: str,
+                        end_date: str,
+                        intervals: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Load several intervals of one symbol, fetching only the finest.
+
+        The coarser intervals are resampled from the finest one (and cached),
+        so the base bars are loaded once. Pass the result as ``timeframes``
+        to StrategyEngine.backtest.
+
+        Returns:
+            Dict of interval -> OHLCV DataFrame
+        """
+        lengths = {interval: interval_timedelta(interval) for interval in intervals}
+        unsupported = [interval for interval, length in lengths.items() if length is None]
+        if unsupported:
+            raise ValueError(f"Cannot combine intervals {unsupported}; use minutes, hours or 1d")
+        base_interval = min(lengths, key=lengths.get)
+
+        base = self.load_data(source, symbol, start_date, end_date, base_interval)
+        frames = {base_interval: base}
+        for interval in lengths:
+            if interval != base_interval:
+                frames[interval] = self._load_derived(source, symbol, start_date, end_date, interval,
+                                                      base_interval, base=base)
+        return frames
+
+    def iter_chunks(self,
+                    source: str,
+                    symbol: str,
+                    start_date: str,
+                    end_date: str,
+                    interval: str = "1d",
+                    chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """
+        Like load_data, but yield the range in consecutive chunks of at most chunk_rows rows.
+
+        Missing data is fetched into the cache first; the chunks are then
+        read one at a time from the memory-mapped store, so histories larger
+        than memory can be processed. CSV sources are not chunked.
+        """
+        if source.lower() == 'csv':
+            raise ValueError("CSV sources cannot be read in chunks; load them with load_data")
+        self._update_cache(symbol, start_date, end_date, interval, self._get_source(source))
+        yield from self.store.iter_chunks(symbol, interval, start_date, end_date, chunk_rows)
+
+    def load_many(self,
+                  symbols: List[str],
+                  start_date: str,
+                  end_date: str,
+                  interval: str = "1d",
+                  source: str = "yfinance",
+                  max_workers: int = 8,
+                  rate_limit: Optional[float] = None,
+                  max_retries: int = 3,
+                  backoff: float = 0.5) -> Dict:
+        """
+        Load many symbols, fetching cache misses concurrently.
+
+        Missing ranges for all symbols are fetched by a bounded thread pool
+        with rate limiting and retries, then written to the cache together.
+        A symbol whose fetch keeps failing is reported in ``errors`` and does
+        not stop the others.
         
-        if os.path.exists(cache_file):
-            self.logger.info(f"Loading cached data from {cache_file}")
-            return pd.read_csv(cache_file, index_col=0, parse_dates=True)
+        Args:
+            symbols: Asset symbols
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            interval: Data interval (1d, 1h, etc.)
+            source: Data source ('yfinance' or a registered source)
+            max_workers: Maximum number of concurrent fetches
+            rate_limit: Maximum fetches started per second (None: unlimited)
+            max_retries: Retries per fetch after the first failed attempt
+            backoff: Base retry delay in seconds, doubled after each failure
+            
+        Returns:
+            Dict with 'data' (symbol -> OHLCV DataFrame) and 'errors' (symbol ->
+            messages of its failed ranges, joined by '; ')
+        """
+        fetch = self._get_source(source)
+
+        tasks = []
+        for symbol in symbols:
+            self._import_legacy_cache(symbol, interval)
+            tasks.extend((symbol, range_start, range_end, interval)
+                         for range_start, range_end in self._missing_ranges(symbol, start_date, end_date, interval))
+        self.logger.info(f"Fetching {len(tasks)} missing range(s) for {len(symbols)} symbol(s)")
+
+        downloader = BulkDownloader(fetch, max_workers=max_workers, rate_limit=rate_limit,
+                                    max_retries=max_retries, backoff=backoff)
+        results, failures = downloader.download(tasks)
+
+        errors = {}
+        for (symbol, range_start, range_end, _), message in failures.items():
+            # Both edges of one symbol can fail; report every failed range
+            failure = f"{range_start}..{range_end}: {message}"
+            errors[symbol] = f"{errors[symbol]}; {failure}" if symbol in errors else failure
+
+        # Bulk write: ranges were collected in store order (leading edge first)
+        for (symbol, range_start, range_end, _), data in results.items():
+            if symbol not in errors:
+                self.store.write(symbol, interval, data, range_start, range_end)
+
+        data = {}
+        for symbol in symbols:
+            if symbol not in errors:
+                data[symbol] = self.store.read(symbol, interval, start_date, end_date)
+        return {'data': data, 'errors': errors}
+
+    def load_panel(self,
+                   symbols: List[str],
+                   start_date: str,
+                   end_date: str,
+                   interval: str = "1d",
+                   field: str = "Close",
+                   source: str = "yfinance") -> pd.DataFrame:
+        """
+        Load one field for many symbols as a wide date x symbol panel.
+
+        Only the requested column is read from each cached dataset. Dates are
+        the union over all symbols; gaps after a symbol's first bar are
+        forward-filled, bars before it stay NaN.
         
-        if source.lower() == 'yfinance':
-            data = self._load_yfinance(symbol, start_date, end_date, interval)
-        elif source.lower() == 'csv':
-            data = self._load_csv(symbol)
-        else:
+        Args:
+            symbols: Asset symbols
+            start_date: Start date in YYYY-MM-DD format
+            end_date: End date in YYYY-MM-DD format
+            interval: Data interval (1d, 1h, etc.)
+            field: OHLCV column to load
+            source: Data source ('yfinance' or a registered source)
+            
+        Returns:
+            DataFrame indexed by date with one column per symbol
+        """
+        fetch = self._get_source(source)
+
+        columns = {}
+        for symbol in symbols:
+            self._update_cache(symbol, start_date, end_date, interval, fetch)
+            columns[symbol] = self.store.read(symbol, interval, start_date, end_date, columns=[field])[field]
+
+        panel = pd.concat(columns, axis=1, sort=True)
+        return panel.ffill().astype(float)
+
+    def _get_source(self, source: str) -> Callable[[str, str, str, str], pd.DataFrame]:
+        """Look up the fetch callable for a data source."""
+        if source.lower() not in self.sources:
             raise ValueError(f"Unsupported data source: {source}")
-        
-        # Cache the data
-        data.to_csv(cache_file)
+        return self.sources[source.lower()]
+
+    def _update_cache(self, symbol: str, start_date: str, end_date: str, interval: str,
+                      fetch: Callable[[str, str, str, str], pd.DataFrame]) -> None:
+        """Fetch and store whatever part of [start_date, end_date) is not cached."""
+        self._import_legacy_cache(symbol, interval)
+        for range_start, range_end in self._missing_ranges(symbol, start_date, end_date, interval):
+            with stage('fetch') as record:
+                data = fetch(symbol, range_start, range_end, interval)
+                record['rows'] = len(data)
+            with stage('store_write', rows=len(data)):
+                self.store.write(symbol, interval, data, range_start, range_end)
+
+    def _cached_base(self, symbol: str, start_date: str, end_date: str, interval: str) -> Optional[str]:
+        """
+        Finest cached interval to resample interval from, unless interval itself covers the range.
+
+        A base qualifies if it covers the range, or if interval was derived
+        from it before (its missing edges are then fetched at the base interval).
+        """
+        if self._covers(symbol, interval, start_date, end_date):
+            return None
+        bases = [base for base in self.store.intervals(symbol)
+                 if can_derive(interval, base) and (self._covers(symbol, base, start_date, end_date) or
+                                                    self.store.coverage(symbol, f"{interval}@{base}") is not None)]
+        return min(bases, key=interval_timedelta) if bases else None
+
+    def _covers(self, symbol: str, interval: str, start_date: str, end_date: str) -> bool:
+        coverage = self.store.coverage(symbol, interval)
+        return coverage is not None and coverage[0] <= start_date and end_date <= coverage[1]
+
+    def _load_derived(self, source: str, symbol: str, start_date: str, end_date: str, interval: str,
+                      base_interval: str, base: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Load interval bars resampled from base_interval bars.
+
+        Derived bars are cached as their own dataset ('{interval}@{base}'),
+        separate from bars downloaded at that interval; ranges it does not
+        cover yet are resampled from the base, which is loaded (and fetched
+        if needed) for those ranges only. Pass the base bars of
+        [start_date, end_date) as base if they are loaded already.
+        """
+        if not can_derive(interval, base_interval):
+            raise ValueError(f"Cannot derive {interval} bars from {base_interval} bars")
+        derived_interval = f"{interval}@{base_interval}"
+        for range_start, range_end in self._missing_ranges(symbol, start_date, end_date, derived_interval):
+            if base is None:
+                range_base = self.load_data(source, symbol, range_start, range_end, base_interval)
+            else:
+                range_base = self._slice_range(base, range_start, range_end)
+            with stage('resample', rows=len(range_base)):
+                data = resample_ohlcv(range_base, interval)
+            with stage('store_write', rows=len(data)):
+                self.store.write(symbol, derived_interval, data, range_start, range_end)
+        with stage('store_read') as record:
+            data = self.store.read(symbol, derived_interval, start_date, end_date)
+            record['rows'] = len(data)
         return data
 
+    @staticmethod
+    def _slice_range(data: pd.DataFrame, start_date: str, end_date: str) -> pd.DataFrame:
+        """Rows of data in [start_date, end_date), with dates in the index's timezone as in the store."""
+        bounds = pd.DatetimeIndex([start_date, end_date])
+        if data.index.tz is not None:
+            bounds = bounds.tz_localize(data.index.tz)
+        lo, hi = data.index.searchsorted(bounds, side='left')
+        return data.iloc[lo:hi]
+
+    def _missing_ranges(self, symbol: str, start_date: str, end_date: str, interval: str) -> List[Tuple[str, str]]:
+        """Return the ranges of [start_date, end_date) the store does not cover yet."""
+        coverage = self.store.coverage(symbol, interval)
+        if coverage is None:
+            count('store.miss')
+            return [(start_date, end_date)]
+
+        # Only fetch the edges the stored range does not cover yet
+        cached_start, cached_end = coverage
+        missing = []
+        if start_date < cached_start:
+            missing.append((start_date, cached_start))
+        if end_date > cached_end:
+            missing.append((cached_end, end_date))
+        count('store.partial' if missing else 'store.hit')
+        if not missing:
+            self.logger.info(f"Loading cached data for {symbol} ({interval}) from {self.store.dataset_dir(symbol, interval)}")
+        return missing
+
+    def _import_legacy_cache(self, symbol: str, interval: str) -> None:
+        """Seed the columnar store from per-request CSV cache files."""
+        if self.store.coverage(symbol, interval) is not None:
+            return
+
+        pattern = re.compile(rf"{re.escape(symbol)}_(\d{{4}}-\d{{2}}-\d{{2}})_(\d{{4}}-\d{{2}}-\d{{2}})_{re.escape(interval)}\.csv")
+        legacy_files = []
+        for file_name in os.listdir(self.cache_dir):
+            match = pattern.fullmatch(file_name)
+            if match:
+                legacy_files.append((match.group(1), match.group(2), file_name))
+
+        # Merge files in start order while they keep the range contiguous
+        cached_end = None
+        for start_date, end_date, file_name in sorted(legacy_files):
+            if cached_end is not None and (start_date > cached_end or end_date <= cached_end):
+                continue
+            self.logger.info(f"Importing legacy cache file {file_name}")
+            data = pd.read_csv(os.path.join(self.cache_dir, file_name), index_col=0)
+            data.index = self._legacy_index(data.index)
+            self.store.write(symbol, interval, data, start_date, end_date)
+            cached_end = end_date
+
+    def _legacy_index(self, values: pd.Index) -> pd.DatetimeIndex:
+        """
+        Parse a legacy CSV index without changing its wall-clock times or offsets.
+
+        Naive and single-offset indexes parse as they are. Offsets that change
+        over the file (daylight saving) come from a named zone, which is
+        recovered as the first zone reproducing every row's offset.
+        """
+        try:
+            return pd.DatetimeIndex(pd.to_datetime(values))
+        except ValueError:
+            pass
+
+        index = pd.DatetimeIndex(pd.to_datetime(values, utc=True))
+        local = pd.DatetimeIndex(pd.to_datetime(values.str.replace(r'(Z|[+-]\d{2}:?\d{2})$', '', regex=True)))
+        zones = EXCHANGE_ZONES + sorted(zoneinfo.available_timezones() - set(EXCHANGE_ZONES))
+        for zone in zones:
+            converted = index.tz_convert(zone)
+            if converted.tz_localize(None).equals(local):
+                return converted
+        self.logger.warning("No timezone reproduces the legacy cache offsets; importing it as UTC")
+        return index
+
     def _load_yfinance(self, symbol: str, start_date: str, end_date: str, interval: str) -> pd.DataFrame:
         """Load data from Yahoo Finance."""
+        # Imported on first download: cache hits never pay for yfinance's import
+        import yfinance as yf
         try:
             ticker = yf.Ticker(symbol)
             data = ticker.history(start=start_date, end=end_date, interval=interval)
@@ -57,6 +375,7 @@ class DataManager:
             self.logger.error(f"Error loading data from Yahoo Finance: {e}")
             raise
 
+    @timed('read_csv')
     def _load_csv(self, file_path: str) -> pd.DataFrame:
         """Load data from CSV file."""
         try:
@@ -65,15 +384,31 @@ class DataManager:
             self.logger.error(f"Error loading data from CSV: {e}")
             raise
 
-    def clean_data(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Clean and normalize the data."""
+    @timed()
+    def clean_data(self, data: pd.DataFrame, dtype: Optional[str] = None) -> pd.DataFrame:
+        """
+        Clean and normalize the data.
+
+        Rows with any NaN value are dropped and the OHLCV columns are copied
+        once into a single contiguous block of ``dtype`` (the manager's dtype
+        by default). float32 halves the memory of the block; prices keep
+        about 7 significant digits.
+        """
+        dtype = np.dtype(dtype or self.dtype)
+
         # Remove any rows with NaN values
-        cleaned_data = data.dropna()
-        
-        # Ensure all numeric columns are float type
-        numeric_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-        for col in numeric_columns:
-            if col in cleaned_data.columns:
-                cleaned_data[col] = cleaned_data[col].astype(float)
+        valid = data.notna().all(axis=1).to_numpy()
+        index = data.index[valid]
+
+        # Ensure all numeric columns share one float block
+        numeric_columns = [col for col in OHLCV_COLUMNS if col in data.columns]
+        block = np.empty((len(numeric_columns), len(index)), dtype=dtype)
+        for row, col in zip(block, numeric_columns):
+            row[:] = data[col].to_numpy()[valid]
+        cleaned_data = pd.DataFrame(block.T, index=index, columns=numeric_columns, copy=False)
+
+        for col in data.columns:
+            if col not in numeric_columns:
+                cleaned_data[col] = data[col].to_numpy()[valid]
         
-        return cleaned_data 
\ No newline at end of file
+        return cleaned_data
@@ -0,0 +1,101 @@
+"""
+Deriving coarser bar intervals from finer ones, and aligning them back.
+
+Bars are labeled by their start time, as downloaded bars are: a 4h bar
+labeled 08:00 covers [08:00, 12:00). Only fixed-length intervals that
+divide a day evenly (1m ... 1h, 4h, 1d) are derived, and bins of a
+timezone-aware index are laid out in local wall-clock time, so bins never
+straddle a date boundary (also across daylight saving changes) and a
+derived range can be extended like a downloaded one.
+"""
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Aggregation per OHLCV column; any other column keeps its last value
+OHLCV_AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+_INTERVAL_UNITS = {'m': 'min', 'h': 'h', 'd': 'D'}
+
+
+def interval_timedelta(interval: str) -> Optional[pd.Timedelta]:
+    """Length of a fixed interval that divides a day evenly ('15m', '4h', '1d'), else None."""
+    match = re.fullmatch(r'(\d+)([mhd])', interval)
+    if match is None:
+        return None
+    length = pd.Timedelta(int(match.group(1)), unit=_INTERVAL_UNITS[match.group(2)])
+    if length <= pd.Timedelta(0) or pd.Timedelta(days=1) % length != pd.Timedelta(0):
+        return None
+    return length
+
+
+def can_derive(interval: str, base_interval: str) -> bool:
+    """Whether bars of interval can be built from whole bars of base_interval."""
+    length, base_length = interval_timedelta(interval), interval_timedelta(base_interval)
+    if length is None or base_length is None:
+        return False
+    return length > base_length and length % base_length == pd.Timedelta(0)
+
+
+def resample_ohlcv(data: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregate bars into interval bars (first open, max high, min low, last
+    close, summed volume). Bins without any bar are dropped.
+    """
+    length = interval_timedelta(interval)
+    if length is None:
+        raise ValueError(f"Cannot resample to interval {interval}")
+    aggregations = {col: OHLCV_AGGREGATIONS.get(col, 'last') for col in data.columns}
+    tz = data.index.tz
+    if tz is not None:
+        data = data.tz_localize(None)
+    resampled = data.resample(length, label='left', closed='left').agg(aggregations)
+    if 'Close' in resampled:
+        resampled = resampled[resampled['Close'].notna()]
+    if tz is not None:
+        resampled.index = _localize_wall_times(resampled.index, tz)
+    resampled.index.name = data.index.name
+    return resampled
+
+
+def _localize_wall_times(wall_times: pd.DatetimeIndex, tz) -> pd.DatetimeIndex:
+    """
+    Localize bin boundaries given in wall-clock time. A repeated time (the
+    hour after a fall-back change) means its first occurrence, where the bin
+    begins; a skipped time moves to the first time after the gap.
+    """
+    return wall_times.tz_localize(tz, ambiguous=np.ones(len(wall_times), dtype=bool),
+                                  nonexistent='shift_forward')
+
+
+def available_positions(index: pd.DatetimeIndex, interval: str, base_index: pd.DatetimeIndex,
+                        base_interval: str) -> np.ndarray:
+    """
+    For every base bar, the position of the latest interval bar that has
+    closed by the end of that base bar (-1 where none has).
+
+    An interval bar labeled t closes at t + interval, which is when the base
+    bar labeled t + interval - base_interval closes, so its values are used
+    from that base bar on and never earlier. On a timezone-aware index,
+    t + interval is taken in wall-clock time, as resample_ohlcv bins.
+    """
+    length, base_length = interval_timedelta(interval), interval_timedelta(base_interval)
+    if length is None or base_length is None:
+        raise ValueError(f"Cannot align {interval} bars to {base_interval} bars")
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        closes = _localize_wall_times(index.tz_localize(None) + length, index.tz)
+    else:
+        closes = index + length
+    available = closes - base_length
+    return available.searchsorted(pd.DatetimeIndex(base_index), side='right') - 1
+
+
+def align_to_base(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Take values (one per interval bar) for every base bar; NaN before the first closed bar."""
+    values = np.asarray(values, dtype=np.float64)
+    aligned = values[np.maximum(positions, 0)] if len(values) else np.full(len(positions), np.nan)
+    aligned[positions < 0] = np.nan
+    return aligned
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from analysis.instrumentation import count
+
+# Bump when a change to the pipeline alters results, so older entries stop matching
+RESULT_VERSION = 1
+
+
+def fingerprint(value: Any) -> str:
+    """Content hash of a frame, series, index or array (values, labels and dtypes)."""
+    digest = hashlib.sha256()
+    _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def _update_digest(digest, value: Any) -> None:
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        _update_digest(digest, value.index)
+        for col in value.columns:
+            _update_digest(digest, value[col].to_numpy())
+    elif isinstance(value, pd.Series):
+        digest.update(repr(value.name).encode())
+        _update_digest(digest, value.index)
+        _update_digest(digest, value.to_numpy())
+    elif isinstance(value, pd.DatetimeIndex):
+        digest.update(f"datetime[{value.tz}]".encode())
+        digest.update(np.ascontiguousarray(value.as_unit('ns').asi8).data)
+    elif isinstance(value, pd.Index):
+        _update_digest(digest, value.to_numpy())
+    else:
+        values = np.asarray(value)
+        digest.update(f"{values.dtype.str}{values.shape}".encode())
+        if values.dtype.kind == 'O':
+            digest.update('\x1f'.join(map(str, values.ravel())).encode())
+        elif values.dtype.kind in 'mM':
+            digest.update(np.ascontiguousarray(values.view(np.int64)).data)
+        else:
+            digest.update(np.ascontiguousarray(values).data)
+
+
+def result_key(parts: Dict) -> str:
+    """Stable hash of the JSON-serializable parts that determine a result."""
+    encoded = json.dumps({'version': RESULT_VERSION, **parts}, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResultStore:
+    """
+    Persistent, content-addressed store of backtest results and reports.
+
+    Entries are keyed by a hash of everything that determines them (see
+    result_key), so an identical run anywhere (web app, notebook, nightly
+    job) finds the stored result instead of recomputing it. Each entry is a
+    directory with ``manifest.json`` (structure), a small ``entry.json``
+    (kind, description, size; its mtime is the last use) and one
+    uncompressed ``arrays.npz`` holding every frame column as a typed array.
+    The least recently used entries are evicted once the store grows past
+    ``max_bytes``; a result larger than the whole budget is not stored.
+    The store's size is scanned on the first write and then kept as a
+    running total, so writes do not list the store until it is full.
+    """
+
+    def __init__(self, root: str = 'results', max_bytes: int = 1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._bytes = None  # running size of the store, scanned on first write
+        self.logger = logging.getLogger(__name__)
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Load a stored result and mark it as recently used; None if absent."""
+        path = self.entry_dir(key)
+        try:
+            with open(os.path.join(path, 'manifest.json')) as f:
+                manifest = json.load(f)
+            with np.load(os.path.join(path, 'arrays.npz'), allow_pickle=False) as arrays:
+                result = _decode(manifest['value'], arrays, {})
+            os.utime(os.path.join(path, 'entry.json'))
+        except FileNotFoundError:
+            # Absent, or evicted by another process while being read
+            count('result_store.miss')
+            return None
+        count('result_store.hit')
+        self.logger.info(f"Loaded stored {manifest['kind']} result {key[:12]}")
+        return result
+
+    def put(self, key: str, value: Dict, kind: str, description: Optional[Dict] = None) -> None:
+        """Store a result (a dict of frames, series, dicts and scalars) under key."""
+        path = self.entry_dir(key)
+        if os.path.exists(path):
+            return
+        arrays = {}
+        encoded = _encode(value, arrays, 'v', {})
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)  # creates the store on first use
+        try:
+            np.savez(os.path.join(tmp_dir, 'arrays.npz'), **arrays)
+            size = os.path.getsize(os.path.join(tmp_dir, 'arrays.npz'))
+            if size > self.max_bytes:
+                self.logger.warning(f"Result {key[:12]} ({size} bytes) exceeds the store budget; not stored")
+                return
+            summary = {'key': key, 'kind': kind, 'created': time.time(), 'bytes': size,
+                       'description': description or {}}
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+                json.dump({'kind': kind, 'value': encoded}, f, default=_json_default)
+            with open(os.path.join(tmp_dir, 'entry.json'), 'w') as f:
+                json.dump(summary, f, default=_json_default)
+            try:
+                os.rename(tmp_dir, path)
+            except OSError:
+                # Stored concurrently by another writer; the contents are the same
+                return
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        count('result_store.put')
+        if self._bytes is None:
+            self._bytes = sum(entry['bytes'] for entry in self._entries())
+        else:
+            self._bytes += size
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def query(self, kind: Optional[str] = None, **filters) -> pd.DataFrame:
+        """
+        List stored entries, most recently used first.
+
+        Args:
+            kind: Only entries of this kind ('backtest' or 'report')
+            **filters: Description fields that must be equal, e.g. initial_capital=10000
+
+        Returns:
+            DataFrame with key, kind, created, last_used and bytes columns
+            plus the description fields
+        """
+        rows = []
+        for entry in self._entries():
+            description = entry['description']
+            if kind is not None and entry['kind'] != kind:
+                continue
+            if any(description.get(name) != value for name, value in filters.items()):
+                continue
+            rows.append({'key': entry['key'], 'kind': entry['kind'],
+                         'created': pd.Timestamp(entry['created'], unit='s'),
+                         'last_used': pd.Timestamp(entry['last_used'], unit='s'),
+                         'bytes': entry['bytes'], **description})
+        columns = ['key', 'kind', 'created', 'last_used', 'bytes']
+        if not rows:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame(rows).sort_values('last_used', ascending=False, ignore_index=True)
+
+    def delete(self, key: str) -> bool:
+        """Remove an entry; returns whether it existed."""
+        path = self.entry_dir(key)
+        if not os.path.exists(path):
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        self._bytes = None
+        return True
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Delete least recently used entries until the store fits max_bytes; returns how many."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda entry: entry['last_used'])
+        total = sum(entry['bytes'] for entry in entries)
+        evicted = 0
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            if self.delete(entry['key']):
+                total -= entry['bytes']
+                evicted += 1
+        self._bytes = total
+        if evicted:
+            count('result_store.eviction', evicted)
+            self.logger.info(f"Evicted {evicted} stored result(s)")
+        return evicted
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        for entry in self._entries():
+            self.delete(entry['key'])
+
+    def stats(self) -> Dict:
+        entries = self._entries()
+        return {'entries': len(entries), 'bytes': sum(entry['bytes'] for entry in entries),
+                'max_bytes': self.max_bytes}
+
+    def _entries(self):
+        """Summaries of all complete entries, with their last use."""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for name in os.listdir(self.root):
+            if name.startswith('.'):
+                # Entries still being written
+                continue
+            summary_file = os.path.join(self.root, name, 'entry.json')
+            try:
+                with open(summary_file) as f:
+                    summary = json.load(f)
+                summary['last_used'] = os.path.getmtime(summary_file)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            entries.append(summary)
+        return entries
+
+
+def _json_default(value):
+    """JSON form of NumPy scalars and timestamps in manifests."""
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _encode(value: Any, arrays: Dict[str, np.ndarray], name: str, indexes: Dict) -> Dict:
+    """
+    Describe value as a JSON node, moving its array data into arrays under
+    names starting with name. An index shared by several frames (tracked in
+    indexes) is stored once.
+    """
+    if isinstance(value, pd.DataFrame):
+        columns = []
+        for i, col in enumerate(value.columns):
+            columns.append([col, _encode_array(value[col], arrays, f"{name}.{i}")])
+        return {'type': 'frame', 'columns': columns, 'index': _encode_index(value.index, arrays, name, indexes)}
+    if isinstance(value, pd.Series):
+        return {'type': 'series', 'name': value.name, 'values': _encode_array(value, arrays, f"{name}.values"),
+                'index': _encode_index(value.index, arrays, name, indexes)}
+    if isinstance(value, dict):
+        return {'type': 'dict', 'items': [[key, _encode(item, arrays, f"{name}.{i}", indexes)]
+                                          for i, (key, item) in enumerate(value.items())]}
+    if isinstance(value, np.ndarray):
+        return {'type': 'array', 'array': _encode_array(value, arrays, name)}
+    if isinstance(value, np.generic):
+        return {'type': 'value', 'value': value.item(), 'dtype': value.dtype.str}
+    return {'type': 'value', 'value': value}
+
+
+def _encode_array(values, arrays: Dict[str, np.ndarray], name: str) -> Dict:
+    """Store one column; datetimes as int64 nanoseconds with their timezone."""
+    dtype = values.dtype
+    if isinstance(dtype, pd.DatetimeTZDtype) or (isinstance(dtype, np.dtype) and dtype.kind == 'M'):
+        index = pd.DatetimeIndex(values)
+        arrays[name] = index.asi8
+        return {'name': name, 'datetime': index.unit, 'tz': str(index.tz) if index.tz is not None else None}
+    values = np.asarray(values)
+    if values.dtype.kind == 'O':
+        values = values.astype(str)
+    arrays[name] = values
+    return {'name': name}
+
+
+def _encode_index(index: pd.Index, arrays: Dict[str, np.ndarray], name: str, indexes: Dict) -> Dict:
+    if isinstance(index, pd.RangeIndex):
+        return {'range': [index.start, index.stop, index.step], 'name': index.name}
+    if id(index) not in indexes:
+        indexes[id(index)] = (index, _encode_array(index, arrays, f"{name}.index"))
+    freq = index.freqstr if isinstance(index, pd.DatetimeIndex) else None
+    return {'values': indexes[id(index)][1], 'name': index.name, 'freq': freq}
+
+
+def _decode(node: Dict, arrays, indexes: Dict) -> Any:
+    kind = node['type']
+    if kind == 'frame':
+        index = _decode_index(node['index'], arrays, indexes)
+        return pd.DataFrame({col: _decode_array(spec, arrays) for col, spec in node['columns']},
+                            index=index, columns=[col for col, _ in node['columns']])
+    if kind == 'series':
+        return pd.Series(_decode_array(node['values'], arrays), index=_decode_index(node['index'], arrays, indexes),
+                         name=node['name'])
+    if kind == 'dict':
+        return {key: _decode(item, arrays, indexes) for key, item in node['items']}
+    if kind == 'array':
+        return np.asarray(_decode_array(node['array'], arrays))
+    if 'dtype' in node:
+        return np.dtype(node['dtype']).type(node['value'])
+    return node['value']
+
+
+def _decode_array(spec: Dict, arrays):
+    values = arrays[spec['name']]
+    if not spec.get('datetime'):
+        return values
+    index = pd.DatetimeIndex(values.astype(f"datetime64[{spec['datetime']}]"))
+    return index if spec['tz'] is None else index.tz_localize('UTC').tz_convert(spec['tz'])
+
+
+def _decode_index(spec: Dict, arrays, indexes: Dict) -> pd.Index:
+    """Rebuild an index; frames that shared an index share it again."""
+    if 'range' in spec:
+        return pd.RangeIndex(*spec['range'], name=spec['name'])
+    name = spec['values']['name']
+    if name not in indexes:
+        index = pd.Index(_decode_array(spec['values'], arrays))
+        if spec.get('freq'):
+            index = pd.DatetimeIndex(index, freq=spec['freq'])
+        indexes[name] = index
+    return indexes[name].rename(spec['name'])
@@ -0,0 +1,93 @@
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+INTERVAL_FREQUENCIES = {
+    '1m': 'min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min',
+    '60m': 'h', '90m': '90min', '1h': 'h', '1d': 'B', '5d': '5B', '1wk': 'W-FRI', '1mo': 'MS'
+}
+
+
+def date_index(start: str, freq: str, periods: Optional[int] = None, end: Optional[str] = None) -> pd.DatetimeIndex:
+    """Build a bar index from start, either with a number of periods or up to end (exclusive)."""
+    if freq != 'B':
+        return pd.date_range(start, end, periods=periods, freq=freq, inclusive='left' if end else 'both', name='Date')
+
+    # Business days via NumPy; pandas' 'B' offset is slow for long ranges
+    first = np.datetime64(pd.Timestamp(start).date(), 'D')
+    last = np.datetime64(pd.Timestamp(end).date(), 'D') if end else first + periods * 7 // 5 + 7
+    days = np.arange(first, last, dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    if periods is not None:
+        days = days[:periods]
+    return pd.DatetimeIndex(days.astype('datetime64[ns]'), name='Date')
+
+
+def generate_ohlcv(n_bars: int, seed: int = 0, start: str = '2000-01-03', freq: str = 'B',
+                   start_price: float = 100.0, volatility: float = 0.01) -> pd.DataFrame:
+    """
+    Generate a synthetic random-walk OHLCV frame.
+
+    Each field draws from its own stream, so a shorter history with the
+    same seed is a prefix of a longer one.
+    """
+    close_rng, spread_rng, volume_rng = (np.random.default_rng([seed, k]) for k in range(3))
+    close = start_price * np.exp(np.cumsum(close_rng.normal(0.0, volatility, n_bars)))
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    spread = np.abs(spread_rng.normal(0.0, volatility / 2, n_bars)) * close
+    index = date_index(start, freq, periods=n_bars)
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': volume_rng.integers(100_000, 10_000_000, n_bars).astype(float)
+    }, index=index)
+
+
+class SyntheticSource:
+    """
+    Offline stand-in for a market data source.
+
+    Every symbol gets a deterministic random walk, so repeated or partial
+    fetches of the same symbol agree with each other. Latency and failures
+    can be injected to exercise concurrent downloads and retries.
+    """
+
+    def __init__(self, latency: float = 0.0, failures: Optional[Dict[str, int]] = None,
+                 base_date: str = '1990-01-01'):
+        """
+        Args:
+            latency: Seconds to sleep per fetch
+            failures: Symbol -> number of initial fetches that raise
+            base_date: First date of every generated history
+        """
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.base_date = base_date
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol: str, start_date: str, end_date: str, interval: str) -> pd.DataFrame:
+        with self._lock:
+            self.calls.append((symbol, start_date, end_date, interval))
+            failing = self.failures.get(symbol, 0) > 0
+            if failing:
+                self.failures[symbol] -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise ConnectionError(f"Simulated fetch failure for {symbol}")
+
+        freq = INTERVAL_FREQUENCIES.get(interval, 'B')
+        index = date_index(self.base_date, freq, end=end_date)
+        data = generate_ohlcv(len(index), seed=zlib.crc32(f"{symbol}_{interval}".encode()), freq=freq,
+                              start=self.base_date)
+        data.index = index
+        return data[data.index >= pd.Timestamp(start_date)]
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def params_key(params: Dict) -> str:
+    """Stable hash of JSON-serializable job parameters."""
+    encoded = json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class Job:
+    """One submitted unit of work, its progress and its outcome."""
+
+    def __init__(self, key: str, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None, **state) -> None:
+        """Record progress and notify anyone waiting on this job."""
+        with self._changed:
+            if progress is not None:
+                self.progress = progress
+            if message is not None:
+                self.message = message
+            for name, value in state.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has finished; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self.status not in (DONE, FAILED):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
+
+    def watch(self, timeout: float = 15.0) -> Iterator[Dict]:
+        """
+        Yield the job state on every change until it finishes.
+
+        The state is also yielded when nothing changed for ``timeout``
+        seconds, so a streaming client sees the connection is alive.
+        """
+        seen = -1
+        while True:
+            with self._changed:
+                if self.version == seen:
+                    self._changed.wait(timeout)
+                seen = self.version
+                state = self.to_dict()
+            yield state
+            if state['status'] in (DONE, FAILED):
+                return
+
+    def to_dict(self, include_result: bool = False) -> Dict:
+        state = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+        if include_result and self.status == DONE:
+            state['result'] = self.result
+        return state
+
+
+class JobQueue:
+    """
+    In-process job queue with memoized results.
+
+    Jobs run on a bounded thread pool. Submissions are keyed by a hash of
+    their parameters: a finished job with the same key is returned as is,
+    and a queued or running one is shared instead of starting duplicate
+    work. Failed jobs are not memoized, so resubmitting retries them.
+    """
+
+    def __init__(self, run: Callable[[Dict, Callable[..., None]], Any], max_workers: int = 2,
+                 max_pending: int = 64, max_jobs: int = 256):
+        """
+        Args:
+            run: Callable (params, progress) -> result; progress(fraction, message) reports progress
+            max_workers: Jobs run at the same time
+            max_pending: Queued or running jobs accepted before submit() refuses new work
+            max_jobs: Finished jobs (and memoized results) kept for polling, oldest dropped first
+        """
+        self.logger = logging.getLogger(__name__)
+        self.run = run
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job id -> Job, in submission order
+        self._by_key = {}           # params key -> job id of the live or memoized job
+        self._pending = 0
+
+    def submit(self, params: Dict) -> Job:
+        """
+        Submit a job, reusing an identical finished or in-flight one.
+
+        Raises:
+            RuntimeError: Too many jobs are already queued or running
+        """
+        key = params_key(params)
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing is not None and existing.status != FAILED:
+                self.logger.info(f"Reusing job {existing.id} ({existing.status}) for identical parameters")
+                return existing
+            if self._pending >= self.max_pending:
+                raise RuntimeError(f"Job queue is full ({self.max_pending} jobs pending)")
+
+            job = Job(key, params)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._pending += 1
+            self._evict()
+
+        self._executor.submit(self._execute, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {'jobs': len(self._jobs), 'pending': self._pending, 'statuses': statuses}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _execute(self, job: Job) -> None:
+        job.update(message='running', status=RUNNING, started=time.time())
+        try:
+            result = self.run(job.params, job.update)
+        except Exception as e:
+            self.logger.error(f"Job {job.id} failed: {e}")
+            job.update(message='failed', status=FAILED, error=str(e), finished=time.time())
+        else:
+            job.update(1.0, 'done', result=result, status=DONE, finished=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop the oldest finished jobs beyond max_jobs; the caller holds the lock."""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            job = self._jobs[job_id]
+            if job.status in (DONE, FAILED):
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+                excess -= 1
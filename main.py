@@ -1,46 +1,79 @@
+import argparse
 import logging
+import sys
+from typing import List, Optional
+
 from data.data_manager import DataManager
-from strategy.strategy_engine import StrategyEngine
+from strategy.strategy_engine import DEFAULT_ENTRY, DEFAULT_EXIT, StrategyEngine
 from analysis.performance_analyzer import PerformanceAnalyzer
+from data.result_store import ResultStore
 from visualization.plotter import Plotter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backtest a strategy on one symbol")
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--start', default='2020-01-01', help="Start date (YYYY-MM-DD)")
+    parser.add_argument('--end', default='2023-01-01', help="End date (YYYY-MM-DD)")
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--source', default='yfinance', help="Data source ('yfinance', 'csv' or a registered source)")
+    parser.add_argument('--cache-dir', default='cache')
+    parser.add_argument('--capital', type=float, default=10000.0, help="Initial capital")
+    parser.add_argument('--entry', default=DEFAULT_ENTRY, help="Entry rule (see Strategy Rules in the README)")
+    parser.add_argument('--exit', default=DEFAULT_EXIT, help="Exit rule")
+    parser.add_argument('--result-store', help="Directory of stored results to reuse for identical runs")
+    parser.add_argument('--charts', default='charts', help="Directory charts are written to")
+    parser.add_argument('--show', action='store_true', help="Open chart windows instead of writing files")
+    parser.add_argument('--no-charts', action='store_true', help="Skip charts; matplotlib is never imported")
+    parser.add_argument('--no-report', action='store_true',
+                        help="Skip performance analysis and charts; only log the final portfolio value")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
     # Initialize components
-    data_manager = DataManager()
-    strategy_engine = StrategyEngine()
-    performance_analyzer = PerformanceAnalyzer()
-    plotter = Plotter()
+    data_manager = DataManager(cache_dir=args.cache_dir)
+    result_store = ResultStore(args.result_store) if args.result_store else None
+    strategy_engine = StrategyEngine(result_store=result_store)
 
     # Load data
     logger.info("Loading data...")
     data = data_manager.load_data(
-        source='yfinance',
-        symbol='AAPL',
-        start_date='2020-01-01',
-        end_date='2023-01-01',
-        interval='1d'
+        source=args.source,
+        symbol=args.symbol,
+        start_date=args.start,
+        end_date=args.end,
+        interval=args.interval
     )
     data = data_manager.clean_data(data)
 
     # Configure strategy
     logger.info("Configuring strategy...")
-    strategy_engine.add_indicator('sma_short', 'sma', close=data['Close'], window=20)
-    strategy_engine.add_indicator('sma_long', 'sma', close=data['Close'], window=50)
-    strategy_engine.add_indicator('rsi', 'rsi', close=data['Close'], window=14)
+    strategy_engine.add_indicator('sma_short', 'sma', window=20)
+    strategy_engine.add_indicator('sma_long', 'sma', window=50)
+    strategy_engine.add_indicator('rsi', 'rsi', window=14)
+    strategy_engine.set_rules(args.entry, exit=args.exit)
 
     # Run backtest
     logger.info("Running backtest...")
-    backtest_results = strategy_engine.backtest(data, initial_capital=10000.0)
+    backtest_results = strategy_engine.backtest(data, initial_capital=args.capital)
+
+    if args.no_report:
+        logger.info(f"Final portfolio value: {backtest_results['portfolio']['total'].iloc[-1]:.2f}")
+        return 0
 
     # Analyze performance
     logger.info("Analyzing performance...")
-    performance_report = performance_analyzer.generate_report(
+    performance_report = PerformanceAnalyzer(result_store=result_store).generate_report(
         backtest_results['portfolio'],
-        backtest_results['signals']
+        backtest_results['signals'],
+        backtest_results.get('trades')
     )
 
     # Print performance metrics
@@ -48,13 +81,24 @@ def main():
     for metric, value in performance_report['performance_metrics'].items():
         logger.info(f"{metric}: {value:.4f}")
 
+    if args.no_charts:
+        return 0
+
     # Plot results
     logger.info("Generating plots...")
+    plotter = Plotter() if args.show else Plotter(output_dir=args.charts)
+    indicators = backtest_results['indicators']
     plotter.plot_equity_curve(backtest_results['portfolio'])
     plotter.plot_drawdowns(performance_report['drawdowns'])
     plotter.plot_trades(data, backtest_results['signals'])
-    plotter.plot_indicators(data, ['sma_short_sma', 'sma_long_sma', 'rsi_rsi'])
+    # Rules only calculate the indicators they reference
+    plotter.plot_indicators(data.join(indicators), [column for column in ('sma_short_sma', 'sma_long_sma', 'rsi_rsi')
+                                                    if column in indicators])
     plotter.plot_performance_metrics(performance_report['performance_metrics'])
+    if not args.show:
+        logger.info(f"Charts written to {plotter.output_dir}/")
+    return 0
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
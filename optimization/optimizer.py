@@ -0,0 +1,175 @@
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory, util
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from strategy.strategy_engine import StrategyEngine
+from analysis.performance_analyzer import PerformanceAnalyzer
+
+DEFAULT_INDICATORS = {'sma_short': 'sma', 'sma_long': 'sma'}
+
+# Per-process view of the shared market data, set up by _init_worker
+_worker_data = None
+_worker_shm = None
+
+
+def _init_worker(shm_name: str, shape: tuple, columns: List[str], index: pd.Index) -> None:
+    """Attach a worker process to the shared OHLCV block."""
+    global _worker_data, _worker_shm
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_data = pd.DataFrame(values, index=index, columns=columns, copy=False)
+    # An exit hook that, unlike atexit, also runs in forked pool workers
+    util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker() -> None:
+    """Detach a worker process from the shared OHLCV block."""
+    global _worker_data, _worker_shm
+    _worker_data = None
+    if _worker_shm is not None:
+        try:
+            _worker_shm.close()
+        except BufferError:
+            # Arrays derived from the block are still alive; the OS unmaps it at exit
+            pass
+        _worker_shm = None
+
+
+def _evaluate(data: pd.DataFrame, indicators: Dict[str, str], params: Dict[str, int],
+              initial_capital: float) -> Dict:
+    """Run one backtest for a parameter combination and return its metrics."""
+    strategy_engine = StrategyEngine()
+    for name, window in params.items():
+        strategy_engine.add_indicator(name, indicators[name], window=window)
+
+    backtest_results = strategy_engine.backtest(data, initial_capital=initial_capital)
+    metrics = PerformanceAnalyzer().calculate_metrics(backtest_results['returns'])
+    return {**params, **metrics}
+
+
+def _evaluate_batch(batch: List[Dict[str, int]], indicators: Dict[str, str], initial_capital: float) -> List[Dict]:
+    """Evaluate a batch of parameter combinations inside a worker process."""
+    return [_evaluate(_worker_data, indicators, params, initial_capital) for params in batch]
+
+
+class ParameterOptimizer:
+    def __init__(self, data: pd.DataFrame, initial_capital: float = 10000.0,
+                 indicators: Optional[Dict[str, str]] = None):
+        """
+        Grid-search indicator windows over one loaded dataset.
+
+        Args:
+            data: Cleaned OHLCV data, loaded once via DataManager
+            initial_capital: Starting cash for every backtest
+            indicators: Indicator name -> indicator type for every swept name
+        """
+        self.logger = logging.getLogger(__name__)
+        self.data = data
+        self.initial_capital = initial_capital
+        self.indicators = dict(indicators or DEFAULT_INDICATORS)
+        self._cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        """Request early cancellation of a running optimize() call."""
+        self._cancel_event.set()
+
+    def parameter_combinations(self, param_grid: Dict[str, List[int]],
+                               constraint: Optional[Callable[[Dict[str, int]], bool]] = None) -> List[Dict[str, int]]:
+        """Expand a grid of indicator windows into parameter combinations."""
+        unknown = set(param_grid) - set(self.indicators)
+        if unknown:
+            raise ValueError(f"No indicator type configured for: {', '.join(sorted(unknown))}")
+
+        names = list(param_grid)
+        combinations = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+        if constraint is not None:
+            combinations = [params for params in combinations if constraint(params)]
+        return combinations
+
+    def optimize(self,
+                 param_grid: Dict[str, List[int]],
+                 rank_by: str = 'sharpe_ratio',
+                 ascending: bool = False,
+                 constraint: Optional[Callable[[Dict[str, int]], bool]] = None,
+                 max_workers: Optional[int] = None,
+                 batch_size: Optional[int] = None) -> pd.DataFrame:
+        """
+        Run a backtest for every parameter combination and rank the results.
+
+        Args:
+            param_grid: Indicator name -> list of windows, e.g. {'sma_short': [10, 20], 'sma_long': [50, 100]}
+            rank_by: Metric from PerformanceAnalyzer.calculate_metrics to sort by
+            ascending: Sort order for rank_by
+            constraint: Optional filter, e.g. lambda p: p['sma_short'] < p['sma_long']
+            max_workers: Worker processes (defaults to the CPU count, 1 runs in-process)
+            batch_size: Combinations per task (defaults to an even split over 4 tasks per worker)
+
+        Returns:
+            DataFrame with one row per evaluated combination, best first. If
+            cancel() is called, the combinations finished so far are returned.
+        """
+        self._cancel_event.clear()
+        combinations = self.parameter_combinations(param_grid, constraint)
+        max_workers = max_workers or os.cpu_count() or 1
+        self.logger.info(f"Evaluating {len(combinations)} parameter combinations on {max_workers} worker(s)")
+
+        if max_workers == 1 or len(combinations) <= 1:
+            results = self._run_serial(combinations)
+        else:
+            if batch_size is None:
+                batch_size = max(1, len(combinations) // (max_workers * 4))
+            results = self._run_parallel(combinations, max_workers, batch_size)
+
+        if self._cancel_event.is_set():
+            self.logger.info(f"Optimization cancelled after {len(results)} of {len(combinations)} combinations")
+
+        ranked = pd.DataFrame(results)
+        if ranked.empty:
+            return ranked
+        return ranked.sort_values(rank_by, ascending=ascending, na_position='last').reset_index(drop=True)
+
+    def _run_serial(self, combinations: List[Dict[str, int]]) -> List[Dict]:
+        """Evaluate combinations in the calling process."""
+        results = []
+        for params in combinations:
+            if self._cancel_event.is_set():
+                break
+            results.append(_evaluate(self.data, self.indicators, params, self.initial_capital))
+        return results
+
+    def _run_parallel(self, combinations: List[Dict[str, int]], max_workers: int, batch_size: int) -> List[Dict]:
+        """Evaluate combinations in a process pool sharing one copy of the data."""
+        values = np.ascontiguousarray(self.data.to_numpy(dtype=np.float64))
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+            # Only the index is pickled, once per worker; values are read from shared memory
+            init_args = (shm.name, values.shape, list(self.data.columns), self.data.index)
+
+            batches = [combinations[i:i + batch_size] for i in range(0, len(combinations), batch_size)]
+            results = []
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=init_args)
+            try:
+                pending = {executor.submit(_evaluate_batch, batch, self.indicators, self.initial_capital)
+                           for batch in batches}
+                while pending and not self._cancel_event.is_set():
+                    done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results.extend(future.result())
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+            # Batches that were already running when cancel() was called have finished now
+            for future in pending:
+                if future.done() and not future.cancelled():
+                    results.extend(future.result())
+            return results
+        finally:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,223 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from strategy.strategy_engine import StrategyEngine
+from strategy.simulation import simulate_long_only
+from analysis.performance_analyzer import PerformanceAnalyzer
+from optimization.optimizer import DEFAULT_INDICATORS, ParameterOptimizer
+
+# Per-process view of the shared close/indicator block, set up by _init_worker
+_worker_arrays = None
+_worker_shm = None
+
+
+def _init_worker(shm_name: str, shape: tuple, columns: List[str]) -> None:
+    """Attach a worker process to the shared close/indicator block."""
+    global _worker_arrays, _worker_shm
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_arrays = {column: block[:, i] for i, column in enumerate(columns)}
+
+
+def _simulate(arrays: Dict[str, np.ndarray], indicators: Dict[str, str], params: Dict[str, int],
+              window: slice, initial_capital: float) -> Dict[str, np.ndarray]:
+    """Simulate one parameter combination on a slice of the precomputed arrays."""
+    strategy_engine = StrategyEngine()
+    for name, value in params.items():
+        strategy_engine.add_indicator(name, indicators[name], window=value)
+
+    # Precomputed columns are named '{name}@{window}_{suffix}'; map them back to '{name}_{suffix}' views
+    columns = {}
+    for name, value in params.items():
+        key = f'{name}@{value}'
+        for column, values in arrays.items():
+            if column.startswith(key + '_'):
+                columns[name + column[len(key):]] = values[window]
+
+    close = arrays['Close'][window]
+    signals = strategy_engine.signal_values(columns, len(close))
+    return simulate_long_only(close, signals, initial_capital)
+
+
+def _run_fold(arrays: Dict[str, np.ndarray], fold: Dict, indicators: Dict[str, str],
+              combinations: List[Dict[str, int]], rank_by: str, ascending: bool,
+              initial_capital: float) -> Dict:
+    """Pick the best combination on the train window and evaluate it on the test window."""
+    analyzer = PerformanceAnalyzer()
+    train = slice(fold['train_start'], fold['train_end'])
+    test = slice(fold['test_start'], fold['test_end'])
+
+    best_params, best_score = None, None
+    for params in combinations:
+        total = _simulate(arrays, indicators, params, train, initial_capital)['total']
+        score = analyzer.calculate_metrics(pd.Series(total).pct_change())[rank_by]
+        if np.isnan(score):
+            continue
+        if best_score is None or (score < best_score if ascending else score > best_score):
+            best_params, best_score = params, score
+    if best_params is None:
+        best_params = combinations[0]
+
+    result = _simulate(arrays, indicators, best_params, test, 1.0)
+    return {
+        **fold,
+        **best_params,
+        f'train_{rank_by}': best_score,
+        'test_growth': result['total']
+    }
+
+
+def _run_fold_in_worker(fold: Dict, indicators: Dict[str, str], combinations: List[Dict[str, int]],
+                        rank_by: str, ascending: bool, initial_capital: float) -> Dict:
+    return _run_fold(_worker_arrays, fold, indicators, combinations, rank_by, ascending, initial_capital)
+
+
+class WalkForwardRunner:
+    def __init__(self, data: pd.DataFrame, initial_capital: float = 10000.0,
+                 indicators: Optional[Dict[str, str]] = None):
+        """
+        Walk-forward validation: fit on one window, test on the next, roll forward.
+
+        Args:
+            data: Cleaned OHLCV data covering the full history
+            initial_capital: Starting cash of the stitched out-of-sample run
+            indicators: Indicator name -> indicator type for every swept name
+        """
+        self.logger = logging.getLogger(__name__)
+        self.data = data
+        self.initial_capital = initial_capital
+        self.indicators = dict(indicators or DEFAULT_INDICATORS)
+
+    def make_folds(self, n_bars: int, train_bars: int, test_bars: int, step_bars: Optional[int] = None,
+                   start: int = 0, anchored: bool = False) -> List[Dict]:
+        """Lay out (train, test) bar ranges; anchored folds always train from start."""
+        step_bars = step_bars or test_bars
+        if step_bars < test_bars:
+            raise ValueError("step_bars must be at least test_bars so test windows do not overlap")
+
+        folds = []
+        train_start = start
+        while train_start + train_bars + test_bars <= n_bars:
+            train_end = train_start + train_bars
+            folds.append({
+                'fold': len(folds),
+                'train_start': start if anchored else train_start,
+                'train_end': train_end,
+                'test_start': train_end,
+                'test_end': train_end + test_bars
+            })
+            train_start += step_bars
+        return folds
+
+    def precompute(self, param_grid: Dict[str, List[int]]) -> Dict[str, np.ndarray]:
+        """Compute every indicator window in the grid once over the full history."""
+        strategy_engine = StrategyEngine()
+        for name, windows in param_grid.items():
+            for window in windows:
+                strategy_engine.add_indicator(f'{name}@{window}', self.indicators[name], window=window)
+        arrays = strategy_engine.compute_indicator_arrays(self.data['Close'].to_numpy(dtype=np.float64))
+        arrays['Close'] = self.data['Close'].to_numpy(dtype=np.float64)
+        return arrays
+
+    def run(self,
+            param_grid: Dict[str, List[int]],
+            train_bars: int,
+            test_bars: int,
+            step_bars: Optional[int] = None,
+            anchored: bool = False,
+            rank_by: str = 'sharpe_ratio',
+            ascending: bool = False,
+            constraint: Optional[Callable[[Dict[str, int]], bool]] = None,
+            max_workers: Optional[int] = None) -> Dict:
+        """
+        Run walk-forward validation over the full history.
+
+        Indicators are computed once on the full history, so every window
+        sees correctly warmed-up values; the first fold starts once the
+        longest window has filled. Folds work on slices (views) of the
+        precomputed arrays and run in parallel worker processes.
+
+        Args:
+            param_grid: Indicator name -> list of windows
+            train_bars: Bars in each fitting window
+            test_bars: Bars in each out-of-sample window
+            step_bars: Bars to roll forward per fold (defaults to test_bars)
+            anchored: Grow the train window from the first bar instead of rolling it
+            rank_by: Metric used to pick the best combination on the train window
+            ascending: Sort order for rank_by
+            constraint: Optional filter on parameter combinations
+            max_workers: Worker processes (defaults to the CPU count, 1 runs in-process)
+
+        Returns:
+            Dict with 'folds' (per-fold parameters and out-of-sample metrics),
+            'equity_curve' (stitched out-of-sample equity) and 'metrics'
+            (metrics of the stitched curve)
+        """
+        combinations = ParameterOptimizer(self.data, self.initial_capital, self.indicators) \
+            .parameter_combinations(param_grid, constraint)
+        warmup = max(max(windows) for windows in param_grid.values()) - 1
+        folds = self.make_folds(len(self.data), train_bars, test_bars, step_bars, start=warmup, anchored=anchored)
+        if not folds:
+            raise ValueError("History is too short for a single train/test fold")
+
+        arrays = self.precompute(param_grid)
+        max_workers = min(max_workers or os.cpu_count() or 1, len(folds))
+        self.logger.info(f"Running {len(folds)} walk-forward folds x {len(combinations)} combinations "
+                         f"on {max_workers} worker(s)")
+        args = (self.indicators, combinations, rank_by, ascending, self.initial_capital)
+        if max_workers == 1:
+            results = [_run_fold(arrays, fold, *args) for fold in folds]
+        else:
+            results = self._run_parallel(arrays, folds, args, max_workers)
+
+        return self._stitch(results)
+
+    def _run_parallel(self, arrays: Dict[str, np.ndarray], folds: List[Dict], args: Tuple,
+                      max_workers: int) -> List[Dict]:
+        """Run folds in a process pool sharing one copy of the precomputed arrays."""
+        columns = list(arrays)
+        block = np.column_stack([arrays[column] for column in columns])
+        shm = shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+        try:
+            np.ndarray(block.shape, dtype=np.float64, buffer=shm.buf)[:] = block
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(shm.name, block.shape, columns)) as executor:
+                return list(executor.map(_run_fold_in_worker, folds, *[[arg] * len(folds) for arg in args]))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _stitch(self, results: List[Dict]) -> Dict:
+        """Chain the out-of-sample windows into one equity curve and per-fold metrics."""
+        analyzer = PerformanceAnalyzer()
+        index = self.data.index
+        capital = self.initial_capital
+        pieces = []
+        rows = []
+        for result in results:
+            growth = result.pop('test_growth')
+            equity = pd.Series(capital * growth, index=index[result['test_start']:result['test_end']])
+            capital = equity.iloc[-1]
+            pieces.append(equity)
+
+            metrics = analyzer.calculate_metrics(equity.pct_change())
+            rows.append({
+                **result,
+                'train_start_date': index[result['train_start']],
+                'test_start_date': index[result['test_start']],
+                'test_end_date': index[result['test_end'] - 1],
+                **metrics
+            })
+
+        equity_curve = pd.concat(pieces)
+        return {
+            'folds': pd.DataFrame(rows),
+            'equity_curve': equity_curve,
+            'metrics': analyzer.calculate_metrics(equity_curve.pct_change())
+        }
@@ -0,0 +1,202 @@
+"""
+Out-of-core backtesting over cached histories larger than memory.
+
+The cached range is read from the columnar store in fixed-size chunks.
+Indicator state, the rules' lookback rows and the simulation state carry
+from one chunk to the next, so the results match a single in-memory
+backtest, while the portfolio and metrics are written out chunk by chunk
+and memory stays bounded by the chunk size.
+"""
+import logging
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.columnar_store import ColumnarStore, ColumnarWriter
+from data.data_manager import DataManager
+from strategy.strategy_engine import StrategyEngine
+from strategy.simulation import PORTFOLIO_COLUMNS, simulate_long_only_block, extract_trades
+from analysis.performance_analyzer import TRADE_COLUMNS, RunningMetrics
+from analysis.instrumentation import stage, timed
+
+# Columns of the portfolio dataset written by ChunkedBacktester
+OUTPUT_COLUMNS = list(PORTFOLIO_COLUMNS) + ['signal', 'drawdown']
+
+
+class ChunkedBacktester:
+    """
+    Runs StrategyEngine.backtest (vectorized, frictionless) over a cached
+    history one chunk at a time.
+
+    Each chunk is cleaned, its indicators continue from the state of the
+    previous chunk, rules are evaluated with the rows they look back on, and
+    the simulation continues from the previous chunk's state. The
+    portfolio, signal and drawdown columns go to a columnar dataset under
+    output_dir and closed trades to a CSV file next to it.
+    """
+
+    def __init__(self, strategy_engine: StrategyEngine, data_manager: DataManager, chunk_rows: int = 1_000_000):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be positive")
+        self.logger = logging.getLogger(__name__)
+        self.strategy_engine = strategy_engine
+        self.data_manager = data_manager
+        self.chunk_rows = chunk_rows
+
+    @timed()
+    def run(self, symbol: str, start_date: str, end_date: str, interval: str = '1d', source: str = 'yfinance',
+            initial_capital: float = 10000.0, output_dir: Optional[str] = None,
+            risk_free_rate: float = 0.02) -> Dict:
+        """
+        Backtest [start_date, end_date) chunk by chunk.
+
+        Args:
+            symbol, start_date, end_date, interval, source: As for DataManager.load_data
+            initial_capital: Starting cash
+            output_dir: Root of a ColumnarStore the portfolio is written to
+                (dataset '{symbol}_{interval}') along with
+                '{symbol}_{interval}_trades.csv'; nothing is written if omitted.
+                Must not be the DataManager's cache directory
+            risk_free_rate: Annual risk-free rate for the Sharpe ratio
+
+        Returns:
+            Dict with performance_metrics, trade_analysis (trade counts),
+            final_value, rows, chunks and the output dataset path
+        """
+        engine = self.strategy_engine
+        store = self.data_manager.store
+        lookback = engine.rules.lookback if engine.rules is not None else 0
+        if any(params.get('timeframe') for _, params in engine.active_indicators().values()):
+            raise ValueError("Indicators on other timeframes cannot be computed in chunks")
+        if output_dir is not None and os.path.realpath(output_dir) == os.path.realpath(store.root):
+            # The portfolio dataset would replace the cached bars while they are being read
+            raise ValueError("output_dir must not be the data cache directory")
+
+        metrics = RunningMetrics()
+        indicator_state = {}
+        column_tail = {}
+        simulation_state = {}
+        carry = None       # (last close, position) after the previous chunk
+        open_trade = None  # (entry date, entry price) of a position still open
+        trade_counts = {'total_trades': 0, 'winning_trades': 0, 'losing_trades': 0}
+        writer, trades_file = None, None
+        rows, chunks = 0, 0
+
+        for chunk in self.data_manager.iter_chunks(source, symbol, start_date, end_date, interval, self.chunk_rows):
+            data = self.data_manager.clean_data(chunk)
+            if len(data) == 0:
+                continue
+            if writer is None and output_dir is not None:
+                writer, trades_file = self._open_output(store, output_dir, symbol, interval, start_date,
+                                                        end_date, data.index)
+
+            with stage('chunk', rows=len(data)):
+                close = data['Close'].to_numpy(dtype=np.float64)
+                indicators = engine.compute_indicator_arrays(close, state=indicator_state)
+                signals = self._signals(data, indicators, column_tail, lookback)
+                block = simulate_long_only_block(close, signals, initial_capital, state=simulation_state)
+                drawdowns = metrics.update(block[2])
+
+                trades, open_trade = self._trades(close, block[3], data.index, carry, open_trade)
+                carry = (close[-1], block[3, -1])
+
+            trade_counts['total_trades'] += len(trades)
+            trade_counts['winning_trades'] += int((trades['pnl'] > 0).sum())
+            trade_counts['losing_trades'] += int((trades['pnl'] <= 0).sum())
+            if writer is not None:
+                values = dict(zip(PORTFOLIO_COLUMNS, block))
+                values['signal'] = signals
+                values['drawdown'] = drawdowns
+                writer.write(data.index, values)
+                trades.to_csv(trades_file, mode='a', header=False, index=False)
+
+            rows += len(data)
+            chunks += 1
+            self.logger.info(f"Processed chunk {chunks} ({rows} rows, through {data.index[-1]})")
+
+        if chunks == 0:
+            raise ValueError(f"No data for {symbol} ({interval}) in {start_date}..{end_date}")
+        if writer is not None:
+            writer.close(start_date, end_date)
+
+        return {
+            'performance_metrics': metrics.metrics(risk_free_rate),
+            'trade_analysis': trade_counts,
+            'final_value': float(metrics.last),
+            'rows': rows,
+            'chunks': chunks,
+            'output': writer.path if writer is not None else None
+        }
+
+    def _open_output(self, store: ColumnarStore, output_dir: str, symbol: str, interval: str,
+                     start_date: str, end_date: str, index: pd.DatetimeIndex):
+        """Preallocate the portfolio dataset for every row in range and start the trades file."""
+        max_rows = store.row_count(symbol, interval, start_date, end_date)
+        tz = str(index.tz) if index.tz is not None else None
+        writer = ColumnarWriter(ColumnarStore(output_dir), symbol, interval, OUTPUT_COLUMNS, max_rows,
+                                tz=tz, index_name=index.name)
+        trades_file = os.path.join(output_dir, f"{symbol}_{interval}_trades.csv")
+        pd.DataFrame(columns=TRADE_COLUMNS).to_csv(trades_file, index=False)
+        return writer, trades_file
+
+    def _signals(self, data: pd.DataFrame, indicators: Dict[str, np.ndarray], column_tail: Dict[str, np.ndarray],
+                 lookback: int) -> np.ndarray:
+        """Signals for one chunk, evaluating rules over the last lookback rows of the previous chunks too."""
+        columns = {col: data[col].to_numpy(dtype=np.float64) for col in data.columns}
+        columns.update(indicators)
+        if lookback:
+            extended = {col: np.concatenate([column_tail.get(col, values[:0]), values])
+                        for col, values in columns.items()}
+            skip = len(next(iter(extended.values()))) - len(data)
+            for col, values in extended.items():
+                column_tail[col] = values[max(len(values) - lookback, 0):].copy()
+            columns = extended
+        else:
+            skip = 0
+        signals = self.strategy_engine.signal_values(columns, len(data) + skip)
+        return signals[skip:]
+
+    @staticmethod
+    def _trades(close: np.ndarray, position: np.ndarray, index: pd.DatetimeIndex, carry, open_trade):
+        """
+        Trades closed in one chunk, and the (entry date, entry price) of a position left open.
+
+        The previous chunk's last bar leads the chunk as a virtual bar, so a
+        position carried into it has an entry there; such a trade continues
+        one from an earlier chunk and takes that trade's entry date and price.
+        """
+        if carry is None:
+            prices, offset = close, 0
+        else:
+            prices = np.concatenate([[carry[0]], close])
+            position = np.concatenate([[carry[1]], position])
+            offset = 1
+        trades = extract_trades(prices, position)
+        entry_dates = index[np.maximum(trades['entry_index'] - offset, 0)]
+        entry_price = trades['entry_price']
+        carried = trades['entry_index'] < offset
+        if carried.any():
+            entry_dates = entry_dates.where(~carried, open_trade[0])
+            entry_price = np.where(carried, open_trade[1], entry_price)
+        exit_price = trades['exit_price']
+        pnl = (exit_price - entry_price) * trades['position']
+        table = pd.DataFrame({
+            'entry_date': entry_dates,
+            'exit_date': index[trades['exit_index'] - offset],
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'position': trades['position'],
+            'pnl': pnl,
+            'return': exit_price / entry_price - 1
+        }, columns=TRADE_COLUMNS)
+
+        if position[-1] <= 0:
+            return table, None
+        is_long = position > 0
+        entries = np.flatnonzero(is_long[1:] & ~is_long[:-1]) + 1
+        last_entry = entries[-1] if len(entries) else 0
+        if last_entry < offset:
+            return table, open_trade
+        return table, (index[last_entry - offset], prices[last_entry])
@@ -0,0 +1,169 @@
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+from strategy.simulation import PORTFOLIO_COLUMNS, long_state
+
+FILL_MODES = ('close', 'next_open')
+
+
+class ExecutionModel:
+    """
+    How orders are filled and sized.
+
+    The default model reproduces the frictionless engine: fills at the
+    signal bar's close, no costs, fractional shares, all cash invested.
+    """
+
+    def __init__(self,
+                 commission: float = 0.0,
+                 commission_rate: float = 0.0,
+                 slippage_bps: float = 0.0,
+                 fill: str = 'close',
+                 lot_size: Optional[float] = None,
+                 position_fraction: float = 1.0):
+        """
+        Args:
+            commission: Fixed commission per fill, in cash
+            commission_rate: Commission as a fraction of the filled notional
+            slippage_bps: Price impact in basis points, paid on buys and sells
+            fill: 'close' (the signal bar's close) or 'next_open' (the following bar's open)
+            lot_size: Round share counts down to multiples of this (None: fractional shares)
+            position_fraction: Fraction of current cash committed to each entry
+        """
+        if fill not in FILL_MODES:
+            raise ValueError(f"Unsupported fill mode: {fill}")
+        if not 0 < position_fraction <= 1:
+            raise ValueError("position_fraction must be in (0, 1]")
+        self.commission = commission
+        self.commission_rate = commission_rate
+        self.slippage_bps = slippage_bps
+        self.fill = fill
+        self.lot_size = lot_size
+        self.position_fraction = position_fraction
+
+    def buy_price(self, price):
+        """Fill price of a buy after slippage."""
+        return price * (1 + self.slippage_bps / 10_000)
+
+    def sell_price(self, price):
+        """Fill price of a sell after slippage."""
+        return price * (1 - self.slippage_bps / 10_000)
+
+    def fees(self, notional):
+        """Commission charged on a fill of the given notional."""
+        return self.commission + self.commission_rate * notional
+
+    def shares(self, cash: float, price: float) -> float:
+        """Shares bought with the committed part of cash at a buy fill price, fees included."""
+        budget = cash * self.position_fraction - self.commission
+        shares = max(budget, 0.0) / (price * (1 + self.commission_rate))
+        if self.lot_size:
+            shares = math.floor(shares / self.lot_size) * self.lot_size
+        return shares
+
+
+def simulate_execution_block(close: np.ndarray, open_: Optional[np.ndarray], signals: np.ndarray,
+                             initial_capital: float, model: ExecutionModel) -> Dict[str, np.ndarray]:
+    """
+    Long-only simulation with costs, slippage, delayed fills and sizing.
+
+    Bars are handled in bulk: entry and exit bars come from the signal
+    state as in simulate_long_only. Only the cash chain is sequential, and
+    it is walked once per round trip (not per bar), since fixed fees and lot
+    rounding make each trade's size depend on the previous trade's result.
+    Per-bar cash and positions are then filled in by indexing.
+
+    Args:
+        close: Close prices (valuation, and fills for fill='close')
+        open_: Open prices, required for fill='next_open'
+        signals: Signals aligned with close (1: buy, -1: sell, 0: hold)
+        initial_capital: Starting cash
+        model: Execution model
+
+    Returns:
+        Dict with 'block', a (4, n) array with rows in PORTFOLIO_COLUMNS order,
+        and 'trades', per-trade arrays (entry_index, exit_index, entry_price,
+        exit_price, position, fees, pnl, return) for closed round trips
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    block = np.zeros((len(PORTFOLIO_COLUMNS), n))
+    holdings, cash, total, position = block
+
+    is_long = long_state(signals)
+    fill_prices = close
+    if model.fill == 'next_open':
+        if open_ is None:
+            raise ValueError("Open prices are required for next_open fills")
+        # Orders from bar t are filled at bar t + 1's open
+        is_long = np.r_[False, is_long[:-1]]
+        fill_prices = np.asarray(open_, dtype=float)
+
+    was_long = np.zeros_like(is_long)
+    was_long[1:] = is_long[:-1]
+    entries = np.flatnonzero(is_long & ~was_long)
+    exits = np.flatnonzero(was_long & ~is_long)
+    buy_prices = model.buy_price(fill_prices[entries])
+    sell_prices = model.sell_price(fill_prices[exits])
+
+    # Walk the cash chain once per round trip
+    n_trades = len(entries)
+    shares = np.zeros(n_trades)
+    cash_after_entry = np.empty(n_trades)
+    cash_after_exit = np.empty(len(exits))
+    fees = np.zeros(n_trades)
+    balance = float(initial_capital)
+    for i in range(n_trades):
+        size = model.shares(balance, buy_prices[i])
+        if size > 0:
+            notional = size * buy_prices[i]
+            fees[i] = model.fees(notional)
+            balance -= notional + fees[i]
+        shares[i] = size
+        cash_after_entry[i] = balance
+        if i < len(exits):
+            if size > 0:
+                notional = size * sell_prices[i]
+                exit_fees = model.fees(notional)
+                fees[i] += exit_fees
+                balance += notional - exit_fees
+            cash_after_exit[i] = balance
+
+    # Cash after the last fill at or before each bar (entries and exits interleave)
+    event_bars = np.empty(n_trades + len(exits), dtype=np.int64)
+    event_cash = np.empty(len(event_bars))
+    event_bars[0::2], event_bars[1::2] = entries, exits
+    event_cash[0::2], event_cash[1::2] = cash_after_entry, cash_after_exit
+    cash[:] = initial_capital
+    if n_trades:
+        last_event = np.searchsorted(event_bars, np.arange(n), side='right') - 1
+        np.copyto(cash, event_cash[np.maximum(last_event, 0)], where=last_event >= 0)
+
+        # Shares of the round trip each long bar belongs to
+        trade = np.searchsorted(entries, np.arange(n), side='right') - 1
+        np.copyto(position, shares[np.maximum(trade, 0)], where=is_long)
+    np.multiply(position, close, out=holdings)
+    np.add(holdings, cash, out=total)
+
+    # Closed round trips that actually bought something
+    closed = len(exits)
+    filled = shares[:closed] > 0
+    size = shares[:closed][filled]
+    buy, sell = buy_prices[:closed][filled], sell_prices[filled]
+    trade_fees = fees[:closed][filled]
+    pnl = size * (sell - buy) - trade_fees
+    return {
+        'block': block,
+        'trades': {
+            'entry_index': entries[:closed][filled],
+            'exit_index': exits[filled],
+            'entry_price': buy,
+            'exit_price': sell,
+            'position': size,
+            'fees': trade_fees,
+            'pnl': pnl,
+            'return': pnl / (size * buy)
+        }
+    }
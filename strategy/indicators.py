@@ -0,0 +1,198 @@
+"""
+Vectorized technical indicators on contiguous float64 arrays.
+
+Every function takes values with bars along the first axis, either a 1-D
+array or a 2-D (bars x symbols) panel, and returns arrays of the same
+shape. NaN inputs (e.g. bars before a symbol was listed) are skipped the
+way pandas' rolling/ewm do, and outputs are NaN until ``window`` valid
+values have been seen, matching the ``ta`` library with fillna=False.
+The ``*_many`` variants compute several windows from one shared pass.
+
+The recursive indicators (EMA, RSI, MACD) accept an optional ``state``
+dict to process a long series in consecutive chunks: pass the same dict
+with every chunk and the recursion continues where the previous chunk
+ended, giving the same values as one call over the whole series.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _first_valid(values: np.ndarray):
+    """First non-NaN value (per column for 2-D input), 0 where there is none."""
+    valid = ~np.isnan(values)
+    if values.ndim == 2:
+        return np.nan_to_num(values[np.argmax(valid, axis=0), np.arange(values.shape[1])])
+    return values[valid][0] if valid.any() else 0.0
+
+
+def _prefix_sums(values: np.ndarray, power: int = 1) -> np.ndarray:
+    """
+    Cumulative sums of valid values with a leading row of zeros, so a window
+    sum is the difference of two rows. Values are centered on the first
+    valid value to keep the sums small and the differences accurate.
+    """
+    centered = np.nan_to_num(values - _first_valid(values))
+    if power != 1:
+        centered = centered ** power
+    zeros = np.zeros((1,) + values.shape[1:])
+    return np.concatenate([zeros, np.cumsum(centered, axis=0)])
+
+
+def _valid_counts(values: np.ndarray) -> np.ndarray:
+    """Prefix counts of non-NaN values, laid out like _prefix_sums."""
+    zeros = np.zeros((1,) + values.shape[1:])
+    return np.concatenate([zeros, np.cumsum(~np.isnan(values), axis=0)])
+
+
+def _window_diff(prefix: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the trailing window for every bar; NaN for the first window - 1 bars."""
+    result = np.full((prefix.shape[0] - 1,) + prefix.shape[1:], np.nan)
+    if window <= prefix.shape[0] - 1:
+        result[window - 1:] = prefix[window:] - prefix[:-window]
+    return result
+
+
+def sma_many(values, windows: Iterable[int]) -> Dict[int, np.ndarray]:
+    """Simple moving averages for several windows from a single cumulative sum."""
+    values = _as_float_array(values)
+    sums = _prefix_sums(values)
+    counts = _valid_counts(values) if np.isnan(values).any() else None
+    first = _first_valid(values)
+
+    result = {}
+    for window in set(windows):
+        mean = _window_diff(sums, window) / window + first
+        if counts is not None:
+            mean[_window_diff(counts, window) != window] = np.nan
+        result[window] = mean
+    return result
+
+
+def sma(values, window: int) -> np.ndarray:
+    """Simple moving average."""
+    return sma_many(values, [window])[window]
+
+
+def _ewm_mean(values: np.ndarray, alpha: float, window: int, state: Optional[Dict] = None) -> np.ndarray:
+    """
+    Recursive exponential mean (adjust=False), NaN until window valid values.
+
+    With a state dict, the previous chunk's last mean seeds the recursion
+    and its valid-value count carries into the window check.
+    """
+    if state is None:
+        frame = pd.DataFrame(values) if values.ndim == 2 else pd.Series(values)
+        return frame.ewm(alpha=alpha, min_periods=window, adjust=False).mean().to_numpy()
+
+    seen = state.get('seen', 0)
+    if 'last' in state:
+        # A seed of NaN (nothing seen yet) is skipped like any leading NaN
+        values = np.concatenate([state['last'][None], values])
+    frame = pd.DataFrame(values) if values.ndim == 2 else pd.Series(values)
+    mean = frame.ewm(alpha=alpha, adjust=False).mean().to_numpy(copy=True)
+    if 'last' in state:
+        values, mean = values[1:], mean[1:]
+    if len(values) == 0:
+        return mean
+
+    counts = seen + np.cumsum(~np.isnan(values), axis=0)
+    state['last'] = np.array(mean[-1])
+    state['seen'] = counts[-1]
+    mean[counts < window] = np.nan
+    return mean
+
+
+def ema_many(values, windows: Iterable[int], state: Optional[Dict] = None) -> Dict[int, np.ndarray]:
+    """Exponential moving averages (span=window) for several windows."""
+    values = _as_float_array(values)
+    return {window: _ewm_mean(values, 2.0 / (window + 1), window,
+                              None if state is None else state.setdefault(window, {}))
+            for window in set(windows)}
+
+
+def ema(values, window: int = 14, state: Optional[Dict] = None) -> np.ndarray:
+    """Exponential moving average."""
+    return ema_many(values, [window], state)[window]
+
+
+def rsi_many(values, windows: Iterable[int], state: Optional[Dict] = None) -> Dict[int, np.ndarray]:
+    """Relative Strength Index (Wilder smoothing) for several windows sharing one price diff."""
+    values = _as_float_array(values)
+    diff = np.full_like(values, np.nan)
+    diff[1:] = values[1:] - values[:-1]
+    if state is not None and len(values):
+        if 'close' in state:
+            diff[0] = values[0] - state['close']
+        state['close'] = values[-1]
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    # A missing price gives a missing change, not a zero one
+    missing = np.isnan(values)
+    up[missing] = np.nan
+    down[missing] = np.nan
+
+    result = {}
+    for window in set(windows):
+        ema_up = _ewm_mean(up, 1.0 / window, window, None if state is None else state.setdefault(('up', window), {}))
+        ema_down = _ewm_mean(down, 1.0 / window, window,
+                             None if state is None else state.setdefault(('down', window), {}))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi_values = 100.0 - 100.0 / (1.0 + ema_up / ema_down)
+        result[window] = np.where(ema_down == 0, 100.0, rsi_values)
+    return result
+
+
+def rsi(values, window: int = 14, state: Optional[Dict] = None) -> np.ndarray:
+    """Relative Strength Index."""
+    return rsi_many(values, [window], state)[window]
+
+
+def bollinger_many(values, windows: Iterable[int], window_dev: float = 2) -> Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Bollinger Bands (population std) for several windows from shared cumulative sums."""
+    values = _as_float_array(values)
+    sums = _prefix_sums(values)
+    squares = _prefix_sums(values, power=2)
+    counts = _valid_counts(values) if np.isnan(values).any() else None
+    first = _first_valid(values)
+
+    result = {}
+    for window in set(windows):
+        centered_mean = _window_diff(sums, window) / window
+        std = np.sqrt(np.maximum(_window_diff(squares, window) / window - centered_mean ** 2, 0.0))
+        mid = centered_mean + first
+        if counts is not None:
+            partial = _window_diff(counts, window) != window
+            mid[partial] = np.nan
+            std[partial] = np.nan
+        result[window] = (mid + window_dev * std, mid - window_dev * std, mid)
+    return result
+
+
+def bollinger(values, window: int = 20, window_dev: float = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bollinger Bands as (high, low, mid)."""
+    return bollinger_many(values, [window], window_dev)[window]
+
+
+def macd(values, window_slow: int = 26, window_fast: int = 12, window_sign: int = 9,
+         state: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD as (macd line, signal line, histogram)."""
+    values = _as_float_array(values)
+    emas = ema_many(values, [window_slow, window_fast], None if state is None else state.setdefault('ema', {}))
+    macd_line = emas[window_fast] - emas[window_slow]
+    signal_line = _ewm_mean(macd_line, 2.0 / (window_sign + 1), window_sign,
+                            None if state is None else state.setdefault('signal', {}))
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def roc(values, window: int = 12) -> np.ndarray:
+    """Rate of change in percent over window bars."""
+    values = _as_float_array(values)
+    result = np.full_like(values, np.nan)
+    result[window:] = (values[window:] / values[:-window] - 1.0) * 100.0
+    return result
@@ -0,0 +1,314 @@
+import re
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# Identifiers that refer to price columns
+PRICE_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+# Indicator function -> (indicator type, output suffix, parameter names, defaults)
+INDICATOR_FUNCTIONS = {
+    'sma': ('sma', 'sma', ('window',), ()),
+    'ema': ('ema', 'ema', ('window',), ()),
+    'rsi': ('rsi', 'rsi', ('window',), ()),
+    'roc': ('roc', 'roc', ('window',), ()),
+    'bb_high': ('bollinger', 'bb_high', ('window', 'window_dev'), (2,)),
+    'bb_low': ('bollinger', 'bb_low', ('window', 'window_dev'), (2,)),
+    'bb_mid': ('bollinger', 'bb_mid', ('window', 'window_dev'), (2,)),
+    'macd': ('macd', 'macd', ('window_slow', 'window_fast', 'window_sign'), (26, 12, 9)),
+    'macd_signal': ('macd', 'macd_signal', ('window_slow', 'window_fast', 'window_sign'), (26, 12, 9)),
+    'macd_diff': ('macd', 'macd_diff', ('window_slow', 'window_fast', 'window_sign'), (26, 12, 9))
+}
+
+# Other functions -> number of arguments
+FUNCTIONS = {'cross': 2, 'crossunder': 2, 'shift': 2, 'abs': 1, 'min': 2, 'max': 2}
+
+# Infix operators -> binding power; comparisons bind tighter than & and |
+BINARY_POWER = {
+    '|': 10, '&': 20,
+    '<': 30, '<=': 30, '>': 30, '>=': 30, '==': 30, '!=': 30,
+    '+': 40, '-': 40, '*': 50, '/': 50
+}
+# '~' binds looser than comparisons, so ~rsi(14) > 70 negates the comparison
+PREFIX_POWER = {'~': 25, '-': 60}
+
+# Operators whose operands can be reordered when deduplicating subexpressions
+COMMUTATIVE = {'|', '&', '==', '!=', '+', '*', 'min', 'max'}
+
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(<=|>=|==|!=|[-+*/<>&|~(),]))')
+
+_BINARY_UFUNCS = {
+    '|': np.logical_or, '&': np.logical_and,
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '==': np.equal, '!=': np.not_equal,
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide,
+    'min': np.minimum, 'max': np.maximum
+}
+
+
+def _tokenize(text: str) -> List[Tuple[str, object, int]]:
+    """Split a rule into (kind, value, position) tokens."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise ValueError(f"Unexpected character {text[position:].lstrip()[:1]!r} at position {position} in rule: {text}")
+        number, name, operator = match.groups()
+        if number is not None:
+            tokens.append(('number', float(number), match.start(1)))
+        elif name is not None:
+            tokens.append(('name', name, match.start(2)))
+        else:
+            tokens.append(('op', operator, match.start(3)))
+        position = match.end()
+    tokens.append(('end', None, len(text)))
+    return tokens
+
+
+class _Parser:
+    """Pratt parser from rule text to nested tuple nodes."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.index = 0
+
+    def error(self, message: str, token) -> ValueError:
+        return ValueError(f"{message} at position {token[2]} in rule: {self.text}")
+
+    def next(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def expect(self, value: str) -> None:
+        token = self.next()
+        if token[:2] != ('op', value):
+            raise self.error(f"Expected {value!r}", token)
+
+    def parse(self):
+        node = self.expression(0)
+        token = self.peek()
+        if token[0] != 'end':
+            raise self.error(f"Unexpected {token[1]!r}", token)
+        return node
+
+    def expression(self, min_power: int):
+        node = self.prefix(self.next())
+        while True:
+            token = self.peek()
+            power = BINARY_POWER.get(token[1]) if token[0] == 'op' else None
+            if power is None or power <= min_power:
+                return node
+            self.next()
+            node = ('op', token[1], node, self.expression(power))
+
+    def prefix(self, token):
+        kind, value, _ = token
+        if kind == 'number':
+            return ('num', value)
+        if kind == 'op' and value == '(':
+            node = self.expression(0)
+            self.expect(')')
+            return node
+        if kind == 'op' and value in PREFIX_POWER:
+            operand = self.expression(PREFIX_POWER[value])
+            return ('op', 'neg' if value == '-' else 'not', operand)
+        if kind == 'name':
+            if self.peek()[:2] == ('op', '('):
+                self.next()
+                return self.call(value, token)
+            if value in PRICE_COLUMNS:
+                return ('column', PRICE_COLUMNS[value])
+            return ('ref', value)
+        raise self.error("Expected a value", token)
+
+    def call(self, function: str, token):
+        args = []
+        if self.peek()[:2] != ('op', ')'):
+            args.append(self.expression(0))
+            while self.peek()[:2] == ('op', ','):
+                self.next()
+                args.append(self.expression(0))
+        self.expect(')')
+
+        if function in INDICATOR_FUNCTIONS:
+            indicator_type, suffix, names, defaults = INDICATOR_FUNCTIONS[function]
+            required = len(names) - len(defaults)
+            if not required <= len(args) <= len(names) or any(arg[0] != 'num' for arg in args):
+                count = len(names) if required == len(names) else f"{required} to {len(names)}"
+                raise self.error(f"{function}() takes {count} numeric argument(s)", token)
+            values = [arg[1] for arg in args] + list(defaults[len(args) - required:])
+            values = tuple(int(v) if float(v).is_integer() else v for v in values)
+            return ('indicator', indicator_type, suffix, tuple(zip(names, values)))
+        if function in FUNCTIONS:
+            if len(args) != FUNCTIONS[function]:
+                raise self.error(f"{function}() takes {FUNCTIONS[function]} arguments", token)
+            if function == 'shift' and (args[1][0] != 'num' or args[1][1] < 0 or not float(args[1][1]).is_integer()):
+                raise self.error("shift() takes a non-negative whole number of bars", token)
+            return ('op', function, *args)
+        raise self.error(f"Unknown function {function}()", token)
+
+
+def indicator_name(indicator_type: str, params: Tuple) -> str:
+    """Canonical indicator name for inline indicator calls, e.g. 'sma_20' or 'bollinger_20_2'."""
+    return '_'.join([indicator_type] + [str(value) for _, value in params])
+
+
+def _shift(values, bars: int) -> np.ndarray:
+    """Values from `bars` bars earlier along the first axis; NaN (or False) before the start."""
+    values = np.asarray(values)
+    bars = min(bars, len(values))
+    shifted = np.empty_like(values, dtype=bool if values.dtype == bool else np.float64)
+    shifted[:bars] = False if values.dtype == bool else np.nan
+    shifted[bars:] = values[:len(values) - bars]
+    return shifted
+
+
+class RuleSet:
+    """
+    Entry and exit rules compiled into one vectorized evaluation plan.
+
+    Rules are expressions over price columns (close, open, high, low,
+    volume), inline indicators such as sma(20) or rsi(14), indicators added
+    to the engine by name, numbers, arithmetic, comparisons, & | ~ and the
+    functions cross, crossunder, shift, abs, min and max. For example
+    ``cross(sma(20), sma(50)) & rsi(14) < 70``.
+
+    Both rules are compiled together: identical subexpressions (including
+    reordered operands of commutative operators) become one step of the plan
+    and are evaluated once per run.
+    """
+
+    def __init__(self, entry: str, exit: Optional[str] = None):
+        """
+        Args:
+            entry: Rule that opens a long position
+            exit: Rule that closes it; defaults to ``~(entry)``, i.e. long while entry holds
+        """
+        self.entry = entry
+        self.exit = exit
+        self.indicators = {}   # inline indicator name -> (type, params)
+        self.references = []   # identifiers resolved at evaluation time
+        self.steps = []        # (kind, payload) in evaluation order
+        slots = {}             # node -> step index, for deduplication
+
+        entry_node = _Parser(entry).parse()
+        exit_node = _Parser(exit).parse() if exit is not None else ('op', 'not', entry_node)
+        self.outputs = {'entry': self._compile(entry_node, slots), 'exit': self._compile(exit_node, slots)}
+
+        # Step after which each intermediate result is no longer needed, and
+        # how many earlier bars each step looks back (shift, cross)
+        self._last_use = {}
+        depth = []
+        for index, (kind, payload) in enumerate(self.steps):
+            bars = 0
+            if kind == 'op':
+                op, args, extra = payload
+                for arg in args:
+                    self._last_use[arg] = index
+                bars = max(depth[arg] for arg in args)
+                bars += extra if op == 'shift' else 1 if op in ('cross', 'crossunder') else 0
+            depth.append(bars)
+        # Earlier bars of every column needed to evaluate the rules on a bar
+        self.lookback = max(depth[slot] for slot in self.outputs.values())
+
+    def _compile(self, node: Tuple, slots: Dict) -> int:
+        """Append the steps for node (children first) and return its step index."""
+        kind = node[0]
+        if kind == 'op':
+            op = node[1]
+            # shift's bar count is a literal, not an operand
+            children = node[2:3] if op == 'shift' else node[2:]
+            args = [self._compile(child, slots) for child in children]
+            if op == 'shift':
+                key = ('op', op, tuple(args), int(node[3][1]))
+            else:
+                if op in COMMUTATIVE:
+                    args.sort()
+                key = ('op', op, tuple(args), None)
+            payload = (op, tuple(args), key[3])
+        elif kind == 'indicator':
+            _, indicator_type, suffix, params = node
+            name = indicator_name(indicator_type, params)
+            self.indicators[name] = (indicator_type, dict(params))
+            key = payload = ('column', f'{name}_{suffix}')
+            kind = 'column'
+        else:
+            if kind == 'ref' and node[1] not in self.references:
+                self.references.append(node[1])
+            key = payload = node
+            kind = node[0]
+
+        if key not in slots:
+            slots[key] = len(self.steps)
+            self.steps.append((kind, payload))
+        return slots[key]
+
+    def evaluate(self, columns: Mapping[str, np.ndarray], shape, aliases: Optional[Mapping[str, str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Run the plan over aligned columns.
+
+        Args:
+            columns: Column name -> values (1-D, or 2-D bars x symbols)
+            shape: Shape of the result arrays
+            aliases: Identifier -> column name, e.g. 'sma_short' -> 'sma_short_sma'
+
+        Returns:
+            Dict with boolean 'entry' and 'exit' arrays
+        """
+        aliases = aliases or {}
+        keep = set(self.outputs.values())
+        results = {}
+        for index, (kind, payload) in enumerate(self.steps):
+            if kind == 'num':
+                value = payload[1]
+            elif kind in ('column', 'ref'):
+                column = aliases.get(payload[1], payload[1])
+                if column not in columns:
+                    raise ValueError(f"Unknown name in rule: {payload[1]}")
+                value = np.asarray(columns[column], dtype=np.float64)
+            else:
+                value = self._apply(payload, results)
+            results[index] = value
+            if kind == 'op':
+                for arg in set(payload[1]):
+                    if self._last_use.get(arg) == index and arg not in keep:
+                        del results[arg]
+
+        return {name: np.broadcast_to(np.asarray(results[slot], dtype=bool), shape)
+                for name, slot in self.outputs.items()}
+
+    def _apply(self, payload: Tuple, results: Dict) -> np.ndarray:
+        op, args, extra = payload
+        values = [results[arg] for arg in args]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if op in _BINARY_UFUNCS:
+                return _BINARY_UFUNCS[op](*values)
+            if op == 'not':
+                return np.logical_not(values[0])
+            if op == 'neg':
+                return np.negative(values[0])
+            if op == 'abs':
+                return np.abs(values[0])
+            if op == 'shift':
+                return _shift(values[0], extra)
+            # a crosses above (below) b: above (below) now, at or below (above) on the previous bar
+            a, b = np.asarray(values[0], dtype=np.float64), np.asarray(values[1], dtype=np.float64)
+            a, b = np.broadcast_arrays(a, b)
+            if op == 'cross':
+                return (a > b) & (_shift(a, 1) <= _shift(b, 1))
+            return (a < b) & (_shift(a, 1) >= _shift(b, 1))
+
+    def signals(self, columns: Mapping[str, np.ndarray], shape, aliases: Optional[Mapping[str, str]] = None) -> np.ndarray:
+        """Signal array (1: buy where entry holds, -1: sell where exit holds, exit winning ties)."""
+        rules = self.evaluate(columns, shape, aliases)
+        values = np.zeros(shape, dtype=np.int8)
+        values[rules['entry']] = 1
+        values[rules['exit']] = -1
+        return values
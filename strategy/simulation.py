@@ -0,0 +1,165 @@
+import numpy as np
+from typing import Dict, Optional
+
+
+def _row_index(n: int, ndim: int) -> np.ndarray:
+    """Bar numbers shaped to broadcast against an (n,) or (n, k) array."""
+    return np.arange(n).reshape((n,) + (1,) * (ndim - 1))
+
+
+def long_state(signals: np.ndarray) -> np.ndarray:
+    """
+    Whether each bar ends long: the last buy (1) or sell (-1) signal so
+    far decides, and bar 0 is never traded.
+    """
+    signals = np.asarray(signals)
+    last_signal = np.where((signals == 1) | (signals == -1), _row_index(len(signals), signals.ndim), 0)
+    np.maximum.accumulate(last_signal, axis=0, out=last_signal)
+    return (np.take_along_axis(signals, last_signal, axis=0) == 1) & (last_signal > 0)
+
+
+# Row order of the block returned by simulate_long_only_block
+PORTFOLIO_COLUMNS = ('holdings', 'cash', 'total', 'position')
+
+
+def simulate_long_only(prices: np.ndarray, signals: np.ndarray, initial_capital: float) -> Dict[str, np.ndarray]:
+    """
+    Simulate an all-in, long-only portfolio from a signal array in bulk.
+
+    Mirrors the reference loop in ``StrategyEngine.backtest``: a buy signal
+    (1) invests all cash at the bar's price when flat, a sell signal (-1)
+    liquidates a long position, and bar 0 is never traded. Works on 1-D
+    arrays or on 2-D (bars x symbols) arrays, one independent sleeve per
+    column.
+
+    Args:
+        prices: Fill prices, bars along the first axis
+        signals: Signals aligned with prices (1: buy, -1: sell, 0: hold)
+        initial_capital: Starting cash per sleeve, a scalar or one value per column
+
+    Returns:
+        Dict of arrays shaped like prices: position, holdings, cash, total
+    """
+    block = simulate_long_only_block(prices, signals, initial_capital)
+    return dict(zip(PORTFOLIO_COLUMNS, block))
+
+
+def simulate_long_only_block(prices: np.ndarray, signals: np.ndarray, initial_capital: float,
+                             state: Optional[Dict] = None) -> np.ndarray:
+    """
+    simulate_long_only, returning one contiguous (4,) + prices.shape block
+    with rows in PORTFOLIO_COLUMNS order, so a portfolio frame can wrap it
+    without copying.
+
+    Pass the same state dict for consecutive chunks of one series: it
+    carries the compounded growth, whether the portfolio is long and the
+    open position's entry price, so later chunks continue exactly where the
+    previous one ended (their first bar can trade) and the chunks together
+    give the same values as one call over the whole series.
+    """
+    prices = np.asarray(prices, dtype=float)
+    signals = np.asarray(signals)
+    n = len(prices)
+    block = np.zeros((len(PORTFOLIO_COLUMNS),) + prices.shape)
+    if n == 0:
+        return block
+
+    resume = state is not None and 'growth' in state
+    if resume:
+        is_long = _carried_long_state(signals, state['long'])
+    else:
+        is_long = long_state(signals)
+    was_long = np.zeros_like(is_long)
+    was_long[1:] = is_long[:-1]
+    if resume:
+        was_long[0] = state['long']
+    entries = is_long & ~was_long
+    exits = was_long & ~is_long
+
+    # Each bar's entry bar; during a long run this is the bar the run began
+    entry_idx = np.where(entries, _row_index(n, prices.ndim), -1 if resume else 0)
+    np.maximum.accumulate(entry_idx, axis=0, out=entry_idx)
+    entry_price = np.take_along_axis(prices, np.maximum(entry_idx, 0), axis=0)
+    if resume:
+        # Runs that began in an earlier chunk keep that chunk's entry price
+        entry_price = np.where(entry_idx < 0, state['entry_price'], entry_price)
+    del entry_idx
+
+    # Cash compounds by exit/entry price ratio at each round trip
+    wealth = np.ones(prices.shape)
+    np.divide(prices, entry_price, out=wealth, where=exits)
+    if resume:
+        # Continue the running product itself, so its rounding matches one pass
+        wealth = np.cumprod(np.concatenate([np.expand_dims(state['growth'], 0), wealth]), axis=0)[1:]
+    else:
+        np.cumprod(wealth, axis=0, out=wealth)
+    if state is not None:
+        state['growth'] = wealth[-1].copy()
+        state['long'] = is_long[-1].copy()
+        state['entry_price'] = entry_price[-1].copy()
+    wealth *= initial_capital
+
+    holdings, cash, total, position = block
+    np.divide(wealth, entry_price, out=position, where=is_long)
+    np.multiply(position, prices, out=holdings, where=is_long)
+    np.copyto(cash, wealth, where=~is_long)
+    np.add(holdings, cash, out=total)
+    return block
+
+
+def _carried_long_state(signals: np.ndarray, was_long) -> np.ndarray:
+    """long_state for a chunk that starts long (was_long) or flat, where bar 0 can trade."""
+    last_signal = np.where((signals == 1) | (signals == -1), _row_index(len(signals), signals.ndim), -1)
+    np.maximum.accumulate(last_signal, axis=0, out=last_signal)
+    is_long = np.take_along_axis(signals, np.maximum(last_signal, 0), axis=0) == 1
+    return np.where(last_signal >= 0, is_long, was_long)
+
+
+def extract_trades(prices: np.ndarray, position: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Extract closed round trips from a simulated position array.
+
+    Entries and exits are the bars where the position turns on and off;
+    trades still open on the last bar are not reported. Works on 1-D or
+    2-D (bars x symbols) arrays.
+
+    Returns:
+        Dict of 1-D arrays, one element per trade, ordered by column then
+        entry bar: column, entry_index, exit_index, entry_price,
+        exit_price, position, pnl, return
+    """
+    prices = np.asarray(prices, dtype=float)
+    position = np.asarray(position, dtype=float)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+        position = position[:, None]
+
+    is_long = position > 0
+    was_long = np.zeros_like(is_long)
+    was_long[1:] = is_long[:-1]
+
+    # np.nonzero on the transpose orders hits by column, then by bar
+    entry_cols, entry_rows = np.nonzero((is_long & ~was_long).T)
+    exit_cols, exit_rows = np.nonzero((was_long & ~is_long).T)
+
+    # Drop the last entry of every column that is still long at the end
+    if len(entry_cols):
+        last_in_column = np.r_[entry_cols[1:] != entry_cols[:-1], True]
+        still_open = last_in_column & is_long[-1][entry_cols]
+        entry_cols, entry_rows = entry_cols[~still_open], entry_rows[~still_open]
+
+    entry_price = prices[entry_rows, entry_cols]
+    exit_price = prices[exit_rows, exit_cols]
+    size = position[entry_rows, entry_cols]
+    pnl = (exit_price - entry_price) * size
+
+    return {
+        'column': entry_cols,
+        'entry_index': entry_rows,
+        'exit_index': exit_rows,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'position': size,
+        'pnl': pnl,
+        'return': exit_price / entry_price - 1
+    }
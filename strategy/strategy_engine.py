@@ -1,75 +1,467 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Mapping, Optional
 import logging
-from ta.trend import SMAIndicator, EMAIndicator
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
+from collections import ChainMap
+from strategy import indicators as ind
+from strategy.rules import RuleSet
+from strategy.simulation import PORTFOLIO_COLUMNS, simulate_long_only, simulate_long_only_block, extract_trades
+from strategy.execution import ExecutionModel, simulate_execution_block
+from data.resample import align_to_base, available_positions, interval_timedelta
+from data.result_store import ResultStore, fingerprint, result_key
+from analysis.instrumentation import stage, timed
+
+# Indicator type -> output column suffixes
+INDICATOR_OUTPUTS = {
+    'sma': ('sma',),
+    'ema': ('ema',),
+    'rsi': ('rsi',),
+    'bollinger': ('bb_high', 'bb_low', 'bb_mid'),
+    'macd': ('macd', 'macd_signal', 'macd_diff'),
+    'roc': ('roc',)
+}
+
+DEFAULT_WINDOWS = {'sma': 14, 'ema': 14, 'rsi': 14, 'bollinger': 20, 'roc': 12}
+
+# Indicators whose values depend on the whole history rather than a trailing window
+RECURSIVE_INDICATORS = ('ema', 'rsi', 'macd')
+
+# The built-in SMA crossover written as rules (main.py's defaults)
+DEFAULT_ENTRY = 'sma_short > sma_long'
+DEFAULT_EXIT = 'sma_short < sma_long'
 
 class StrategyEngine:
-    def __init__(self):
+    def __init__(self, result_store: Optional[ResultStore] = None):
+        """
+        Args:
+            result_store: Persistent store backtest checks for an identical
+                earlier run before computing, and saves new results to
+        """
         self.logger = logging.getLogger(__name__)
         self.indicators = {}
+        self.rules = None
         self.signals = pd.DataFrame()
+        self.result_store = result_store
 
     def add_indicator(self, name: str, indicator_type: str, **params) -> None:
-        """Add a technical indicator to the strategy."""
-        if indicator_type.lower() == 'sma':
-            self.indicators[name] = SMAIndicator(**params)
-        elif indicator_type.lower() == 'ema':
-            self.indicators[name] = EMAIndicator(**params)
-        elif indicator_type.lower() == 'rsi':
-            self.indicators[name] = RSIIndicator(**params)
-        elif indicator_type.lower() == 'bollinger':
-            self.indicators[name] = BollingerBands(**params)
-        else:
+        """
+        Add a technical indicator to the strategy.
+
+        Only the specification is stored; the indicator is bound to the Close
+        column of the data it is calculated on. An explicit ``close`` series
+        is still accepted and used instead. With ``timeframe='4h'`` (say) it
+        is calculated on the 4h bars passed to backtest as ``timeframes``
+        and aligned to the backtest's bars without look-ahead.
+        """
+        indicator_type = indicator_type.lower()
+        if indicator_type not in INDICATOR_OUTPUTS:
             raise ValueError(f"Unsupported indicator type: {indicator_type}")
+        self.indicators[name] = (indicator_type, params)
+
+    def set_rules(self, entry: Optional[str], exit: Optional[str] = None) -> None:
+        """
+        Trade on entry/exit rules instead of the built-in SMA crossover.
+
+        Rules are compiled once (see RuleSet), e.g.
+        ``set_rules('cross(sma(20), sma(50)) & rsi(14) < 70', 'crossunder(sma(20), sma(50))')``.
+        Indicators added with add_indicator can be referenced by name. While
+        rules are set, only the indicators they reference are calculated.
+        Passing None clears the rules.
+        """
+        self.rules = RuleSet(entry, exit) if entry is not None else None
+        if self.rules is not None:
+            self.logger.info(f"Compiled rules into {len(self.rules.steps)} steps using "
+                             f"{len(self.active_indicators())} indicator(s)")
+
+    def active_indicators(self) -> Dict[str, tuple]:
+        """Indicator specifications to calculate: all added ones, or only those the rules use."""
+        if self.rules is None:
+            return self.indicators
+
+        active = {}
+        for name, (indicator_type, params) in self.indicators.items():
+            columns = {f'{name}_{suffix}' for suffix in INDICATOR_OUTPUTS[indicator_type]}
+            if any(reference == name or reference in columns for reference in self.rules.references):
+                active[name] = (indicator_type, params)
+        active.update(self.rules.indicators)
+        return active
+
+    def _aliases(self) -> Dict[str, str]:
+        """Rule identifiers for single-output indicators, e.g. 'sma_short' -> 'sma_short_sma'."""
+        return {name: f'{name}_{INDICATOR_OUTPUTS[indicator_type][0]}'
+                for name, (indicator_type, _) in self.indicators.items()
+                if len(INDICATOR_OUTPUTS[indicator_type]) == 1}
+
+    def compute_indicator_arrays(self, close: np.ndarray, allow_overrides: bool = True,
+                                 state: Optional[Dict] = None, timeframe: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Compute all indicator outputs from a close-price array (1-D, or 2-D bars x symbols).
+
+        Indicators of the same type and parameters that only differ in
+        window are computed together in one batched pass.
+
+        To compute a long series in consecutive chunks, pass the same state
+        dict with every chunk: recursive indicators continue from their
+        carried state and windowed ones are computed over the carried tail
+        of earlier closes, so the outputs match a single pass.
+
+        Only indicators on the given timeframe are computed (by default,
+        those without one).
+        """
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        outputs = {}
+        batches = {}  # (type, other params) -> [(name, window)]
+        for name, (indicator_type, params) in self.active_indicators().items():
+            if params.get('timeframe') != timeframe:
+                continue
+            params = {k: v for k, v in params.items() if k not in ('fillna', 'timeframe')}
+            source = params.pop('close', None)
+            window = params.pop('window', DEFAULT_WINDOWS.get(indicator_type))
+            if source is not None and state is not None:
+                raise ValueError(f"Indicator {name} is bound to its own values and cannot be computed in chunks")
+            if source is not None and allow_overrides:
+                # Bound to its own values, so it cannot share a batch
+                outputs.update(self._compute_batch(np.asarray(source, dtype=np.float64), indicator_type,
+                                                   params, [(name, window)]))
+            else:
+                batches.setdefault((indicator_type, tuple(sorted(params.items()))), []).append((name, window))
+
+        if state is None:
+            for (indicator_type, params), members in batches.items():
+                outputs.update(self._compute_batch(close, indicator_type, dict(params), members))
+            return outputs
+
+        tail = state.get('tail', close[:0])
+        extended = np.concatenate([tail, close])
+        lookback = max([window for (indicator_type, _), members in batches.items()
+                        if indicator_type not in RECURSIVE_INDICATORS for _, window in members], default=0)
+        for (indicator_type, params), members in batches.items():
+            if indicator_type in RECURSIVE_INDICATORS:
+                outputs.update(self._compute_batch(close, indicator_type, dict(params), members,
+                                                   state.setdefault((indicator_type, params), {})))
+            else:
+                batch = self._compute_batch(extended, indicator_type, dict(params), members)
+                outputs.update({column: values[len(tail):] for column, values in batch.items()})
+        # A copy, so the carried tail does not keep the whole chunk alive
+        state['tail'] = extended[max(len(extended) - lookback, 0):].copy()
+        return outputs
+
+    def _compute_batch(self, values: np.ndarray, indicator_type: str, params: Dict,
+                       members: List, state: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+        """Compute one indicator type for several (name, window) members in a single pass."""
+        windows = [window for _, window in members]
+        if indicator_type == 'sma':
+            results = ind.sma_many(values, windows)
+        elif indicator_type == 'ema':
+            results = ind.ema_many(values, windows, state)
+        elif indicator_type == 'rsi':
+            results = ind.rsi_many(values, windows, state)
+        elif indicator_type == 'bollinger':
+            results = ind.bollinger_many(values, windows, **params)
+        elif indicator_type == 'macd':
+            results = {None: ind.macd(values, **params, state=state)}
+        else:
+            results = {window: ind.roc(values, window) for window in set(windows)}
+
+        outputs = {}
+        for name, window in members:
+            result = results[window]
+            if not isinstance(result, tuple):
+                result = (result,)
+            for suffix, output in zip(INDICATOR_OUTPUTS[indicator_type], result):
+                outputs[f'{name}_{suffix}'] = output
+        return outputs
+
+    def compute_timeframe_arrays(self, index: pd.DatetimeIndex,
+                                 timeframes: Optional[Mapping[str, pd.DataFrame]]) -> Dict[str, np.ndarray]:
+        """
+        Compute the indicators added with a timeframe on that timeframe's
+        bars and align them to index, the bars of the finest timeframe.
+
+        A value is only used from the base bar on which its coarser bar has
+        closed (see data.resample.available_positions), so no bar sees a
+        coarser bar that is still forming.
+        """
+        needed = []
+        for _, params in self.active_indicators().values():
+            timeframe = params.get('timeframe')
+            if timeframe is not None and timeframe not in needed:
+                needed.append(timeframe)
+        if not needed:
+            return {}
+        missing = [timeframe for timeframe in needed if timeframe not in (timeframes or {})]
+        if missing:
+            raise ValueError(f"Indicators use timeframes without data: {missing}")
+        if any(interval_timedelta(interval) is None for interval in timeframes):
+            raise ValueError(f"Timeframes must be minutes, hours or 1d: {list(timeframes)}")
+        base_interval = min(timeframes, key=interval_timedelta)
+
+        outputs = {}
+        for timeframe in needed:
+            bars = timeframes[timeframe]
+            arrays = self.compute_indicator_arrays(bars['Close'].to_numpy(dtype=np.float64), timeframe=timeframe)
+            positions = available_positions(bars.index, timeframe, index, base_interval)
+            outputs.update({column: align_to_base(values, positions) for column, values in arrays.items()})
+        return outputs
+
+    @timed()
+    def compute_indicators(self, data: pd.DataFrame,
+                           timeframes: Optional[Mapping[str, pd.DataFrame]] = None) -> pd.DataFrame:
+        """
+        Calculate all indicators into a new frame aligned with data.
+
+        The input frame is left untouched. Outputs share one contiguous
+        block in the dtype of the Close column (float64 unless the data was
+        cleaned to float32); calculations themselves run in float64.
+        Indicators on other timeframes are calculated from timeframes
+        (interval -> bars, including data's own interval).
+        """
+        outputs = self.compute_indicator_arrays(data['Close'].to_numpy(dtype=np.float64))
+        outputs.update(self.compute_timeframe_arrays(data.index, timeframes))
+        dtype = data['Close'].dtype if data['Close'].dtype.kind == 'f' else np.dtype(np.float64)
+        block = np.empty((len(outputs), len(data)), dtype=dtype)
+        for row, values in zip(block, outputs.values()):
+            row[:] = values
+        return pd.DataFrame(block.T, index=data.index, columns=list(outputs), copy=False)
 
     def calculate_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Calculate all indicators for the given data."""
-        for name, indicator in self.indicators.items():
-            if isinstance(indicator, SMAIndicator):
-                data[f'{name}_sma'] = indicator.sma_indicator()
-            elif isinstance(indicator, EMAIndicator):
-                data[f'{name}_ema'] = indicator.ema_indicator()
-            elif isinstance(indicator, RSIIndicator):
-                data[f'{name}_rsi'] = indicator.rsi()
-            elif isinstance(indicator, BollingerBands):
-                data[f'{name}_bb_high'] = indicator.bollinger_hband()
-                data[f'{name}_bb_low'] = indicator.bollinger_lband()
-                data[f'{name}_bb_mid'] = indicator.bollinger_mavg()
+        """Calculate all indicators and add them as columns of data (see compute_indicators)."""
+        indicators = self.compute_indicators(data)
+        if len(indicators.columns):
+            data[list(indicators.columns)] = indicators.to_numpy()
         
         return data
 
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
-        """Generate trading signals based on the indicators."""
-        signals = pd.DataFrame(index=data.index)
-        signals['signal'] = 0  # 0: hold, 1: buy, -1: sell
+    def signal_values(self, columns: Mapping[str, np.ndarray], shape) -> np.ndarray:
+        """Generate a signal array (0: hold, 1: buy, -1: sell) from indicator (and price) columns."""
+        if self.rules is not None:
+            return self.rules.signals(columns, shape, self._aliases())
+
+        values = np.zeros(shape, dtype=np.int8)
 
         # Example: Simple moving average crossover strategy
         if 'sma_short' in self.indicators and 'sma_long' in self.indicators:
-            short_sma = data['sma_short_sma']
-            long_sma = data['sma_long_sma']
-            
-            # Generate signals
-            signals.loc[short_sma > long_sma, 'signal'] = 1
-            signals.loc[short_sma < long_sma, 'signal'] = -1
+            short_sma = np.asarray(columns['sma_short_sma'])
+            long_sma = np.asarray(columns['sma_long_sma'])
+            values[short_sma > long_sma] = 1
+            values[short_sma < long_sma] = -1
+
+        return values
 
+    def generate_signals(self, data: pd.DataFrame, prices: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Generate trading signals based on the indicators (and the price columns of prices, for rules)."""
+        columns = data if prices is None else ChainMap(data, prices)
+        signals = pd.DataFrame(index=data.index)
+        signals['signal'] = self.signal_values(columns, len(data))  # 0: hold, 1: buy, -1: sell
         return signals
 
-    def backtest(self, data: pd.DataFrame, initial_capital: float = 10000.0) -> Dict:
-        """Run a backtest with the current strategy."""
+    def calculate_panel_indicators(self, prices: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Calculate all indicators for every column of a date x symbol close-price panel."""
+        outputs = self.compute_indicator_arrays(prices.to_numpy(dtype=np.float64), allow_overrides=False)
+        return {column: pd.DataFrame(values, index=prices.index, columns=prices.columns)
+                for column, values in outputs.items()}
+
+    def generate_panel_signals(self, indicators: Dict[str, pd.DataFrame], prices: pd.DataFrame) -> pd.DataFrame:
+        """Generate a date x symbol signal matrix from panel indicators."""
+        values = self.signal_values(ChainMap(indicators, {'Close': prices}), prices.shape)
+        return pd.DataFrame(values, index=prices.index, columns=prices.columns)
+
+    @timed()
+    def backtest_portfolio(self, prices: pd.DataFrame, initial_capital: float = 10000.0,
+                           weights: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Run the strategy over a date x symbol close-price panel.
+
+        Capital is split into one sleeve per symbol (equal weights unless
+        given). Each sleeve trades its own symbol's signals all-in/all-out,
+        and all symbols are simulated together in one array pass.
+
+        Args:
+            prices: Close prices, one column per symbol (see DataManager.load_panel)
+            initial_capital: Total starting cash
+            weights: Optional symbol -> weight; normalized to sum to 1
+
+        Returns:
+            Dict with the aggregate portfolio (holdings, cash, total), returns,
+            the signal, holdings and position matrices, and a trades table
+        """
+        indicators = self.calculate_panel_indicators(prices)
+        signals = self.generate_panel_signals(indicators, prices)
+
+        if weights is None:
+            weight_values = np.full(prices.shape[1], 1.0 / prices.shape[1])
+        else:
+            weight_values = np.array([weights.get(symbol, 0.0) for symbol in prices.columns], dtype=float)
+            weight_values /= weight_values.sum()
+
+        price_values = prices.to_numpy(dtype=float)
+        result = simulate_long_only(price_values, signals.to_numpy(), initial_capital * weight_values)
+
+        holdings = pd.DataFrame(result['holdings'], index=prices.index, columns=prices.columns)
+        positions = pd.DataFrame(result['position'], index=prices.index, columns=prices.columns)
+        portfolio = pd.DataFrame({
+            'holdings': result['holdings'].sum(axis=1),
+            'cash': result['cash'].sum(axis=1),
+            'total': result['total'].sum(axis=1)
+        }, index=prices.index)
+
+        trades = extract_trades(price_values, result['position'])
+        trades_table = pd.DataFrame({
+            'symbol': prices.columns[trades['column']],
+            'entry_date': prices.index[trades['entry_index']],
+            'exit_date': prices.index[trades['exit_index']],
+            'entry_price': trades['entry_price'],
+            'exit_price': trades['exit_price'],
+            'position': trades['position'],
+            'pnl': trades['pnl'],
+            'return': trades['return']
+        })
+
+        return {
+            'portfolio': portfolio,
+            'returns': portfolio['total'].pct_change(),
+            'signals': signals,
+            'holdings': holdings,
+            'positions': positions,
+            'trades': trades_table
+        }
+
+    @timed()
+    def backtest(self, data: pd.DataFrame, initial_capital: float = 10000.0, mode: str = 'vectorized',
+                 indicators: Optional[pd.DataFrame] = None, execution: Optional[ExecutionModel] = None,
+                 timeframes: Optional[Mapping[str, pd.DataFrame]] = None) -> Dict:
+        """
+        Run a backtest with the current strategy.
+
+        Args:
+            data: DataFrame with OHLCV data
+            initial_capital: Starting cash
+            mode: 'vectorized' (array simulation) or 'loop' (per-bar reference implementation)
+            indicators: Precomputed indicator columns aligned with data; calculated if omitted
+            execution: Commission, slippage, fill and sizing rules (vectorized mode only);
+                fills are frictionless at the close when omitted
+            timeframes: Interval -> OHLCV bars for indicators added with a
+                timeframe, including data's own (finest) interval; see
+                DataManager.load_timeframes
+
+        Returns:
+            Dict with portfolio, returns, signals and the indicator frame;
+            data itself is not modified. With an execution model, also a
+            trades table with fill prices and fees.
+        """
+        key = None
+        if self.result_store is not None:
+            key = self.backtest_key(data, initial_capital, mode, indicators, execution, timeframes)
+            stored = self.result_store.get(key)
+            if stored is not None:
+                return stored
+
         # Calculate indicators
-        data = self.calculate_indicators(data)
+        if indicators is None:
+            indicators = self.compute_indicators(data, timeframes)
         
         # Generate signals
-        signals = self.generate_signals(data)
+        with stage('signals', rows=len(data)):
+            signals = self.generate_signals(indicators, prices=data)
+        
+        trades = None
+        with stage('simulate', rows=len(data)):
+            if execution is not None:
+                if mode != 'vectorized':
+                    raise ValueError("Execution models are only supported in vectorized mode")
+                portfolio, trades = self._simulate_execution(data, signals, initial_capital, execution)
+            elif mode == 'vectorized':
+                portfolio = self._simulate_vectorized(data, signals, initial_capital)
+            elif mode == 'loop':
+                portfolio = self._simulate_loop(data, signals, initial_capital)
+            else:
+                raise ValueError(f"Unsupported backtest mode: {mode}")
         
-        # Initialize portfolio
+        results = {
+            'portfolio': portfolio,
+            'returns': portfolio['total'].pct_change(),
+            'signals': signals,
+            'indicators': indicators
+        }
+        if trades is not None:
+            results['trades'] = trades
+        if key is not None:
+            self.result_store.put(key, results, kind='backtest', description={
+                'start': str(data.index[0]) if len(data) else None,
+                'end': str(data.index[-1]) if len(data) else None,
+                'rows': len(data),
+                'initial_capital': initial_capital,
+                'mode': mode,
+                'execution': None if execution is None else ', '.join(f"{name}={value}" for name, value
+                                                                      in vars(execution).items()),
+                'indicators': ', '.join(self.active_indicators()),
+                'rules': None if self.rules is None else f"{self.rules.entry} / {self.rules.exit}",
+                'final_value': float(portfolio['total'].iloc[-1]) if len(portfolio) else None
+            })
+        return results
+
+    def backtest_key(self, data: pd.DataFrame, initial_capital: float = 10000.0, mode: str = 'vectorized',
+                     indicators: Optional[pd.DataFrame] = None, execution: Optional[ExecutionModel] = None,
+                     timeframes: Optional[Mapping[str, pd.DataFrame]] = None) -> str:
+        """Result store key of a backtest: a hash of the data, indicator specs, rules, capital and settings."""
+        specs = {}
+        for name, (indicator_type, params) in self.active_indicators().items():
+            specs[name] = [indicator_type, {param: fingerprint(value) if param == 'close' else value
+                                            for param, value in params.items()}]
+        return result_key({
+            'kind': 'backtest',
+            'data': fingerprint(data),
+            'indicators': specs,
+            'rules': None if self.rules is None else [self.rules.entry, self.rules.exit],
+            'initial_capital': float(initial_capital),
+            'mode': mode,
+            'precomputed': None if indicators is None else fingerprint(indicators),
+            'execution': None if execution is None else vars(execution),
+            'timeframes': {interval: fingerprint(bars) for interval, bars in (timeframes or {}).items()}
+        })
+
+    def _simulate_vectorized(self, data: pd.DataFrame, signals: pd.DataFrame, initial_capital: float) -> pd.DataFrame:
+        """Simulate the portfolio on NumPy arrays in a single pass."""
+        block = simulate_long_only_block(
+            data['Close'].to_numpy(dtype=float),
+            signals['signal'].to_numpy(),
+            initial_capital
+        )
+        # Wrap the simulation's block as the frame's single block, without a copy
+        return pd.DataFrame(block.T, index=data.index, columns=list(PORTFOLIO_COLUMNS), copy=False)
+
+    def _simulate_execution(self, data: pd.DataFrame, signals: pd.DataFrame, initial_capital: float,
+                            execution: ExecutionModel):
+        """Simulate the portfolio under an execution model; returns the portfolio and a trades table."""
+        result = simulate_execution_block(
+            data['Close'].to_numpy(dtype=float),
+            data['Open'].to_numpy(dtype=float) if 'Open' in data else None,
+            signals['signal'].to_numpy(),
+            initial_capital,
+            execution
+        )
+        portfolio = pd.DataFrame(result['block'].T, index=data.index, columns=list(PORTFOLIO_COLUMNS), copy=False)
+
+        trades = result['trades']
+        trades_table = pd.DataFrame({
+            'entry_date': data.index[trades['entry_index']],
+            'exit_date': data.index[trades['exit_index']],
+            'entry_price': trades['entry_price'],
+            'exit_price': trades['exit_price'],
+            'position': trades['position'],
+            'pnl': trades['pnl'],
+            'return': trades['return'],
+            'fees': trades['fees']
+        })
+        return portfolio, trades_table
+
+    def _simulate_loop(self, data: pd.DataFrame, signals: pd.DataFrame, initial_capital: float) -> pd.DataFrame:
+        """Simulate the portfolio bar by bar (reference implementation)."""
         portfolio = pd.DataFrame(index=data.index)
         portfolio['holdings'] = 0.0
         portfolio['cash'] = initial_capital
         portfolio['total'] = initial_capital
+        portfolio['position'] = 0.0
         
         position = 0
         for i in range(1, len(data)):
@@ -89,9 +481,6 @@ class StrategyEngine:
                 portfolio.loc[current_date, 'cash'] = portfolio['cash'].iloc[i-1]
             
             portfolio.loc[current_date, 'total'] = portfolio.loc[current_date, 'holdings'] + portfolio.loc[current_date, 'cash']
+            portfolio.loc[current_date, 'position'] = position
         
-        return {
-            'portfolio': portfolio,
-            'returns': portfolio['total'].pct_change(),
-            'signals': signals
-        } 
\ No newline at end of file
+        return portfolio
@@ -0,0 +1,198 @@
+import math
+import logging
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+
+class RollingSMA:
+    """Simple moving average updated in amortized O(1) per value."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values = deque()
+        self._sum = 0.0
+        self._updates = 0
+
+    def update(self, value: float) -> float:
+        self._values.append(value)
+        self._sum += value
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+        # Re-sum once per window so rounding error cannot build up on long feeds
+        self._updates += 1
+        if self._updates % self.window == 0:
+            self._sum = math.fsum(self._values)
+        return self._sum / self.window if len(self._values) == self.window else math.nan
+
+
+class RollingEMA:
+    """Exponential moving average (span=window, adjust=False), NaN until window values are seen."""
+
+    def __init__(self, window: int = 14, alpha: Optional[float] = None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.count = 0
+        self.value = math.nan
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        self.value = value if self.count == 1 else self.alpha * value + (1 - self.alpha) * self.value
+        return self.value if self.count >= self.window else math.nan
+
+
+class RollingRSI:
+    """Relative Strength Index with Wilder smoothing, matching ta.momentum.RSIIndicator."""
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self._up = RollingEMA(window, alpha=1.0 / window)
+        self._down = RollingEMA(window, alpha=1.0 / window)
+        self._previous = None
+
+    def update(self, value: float) -> float:
+        diff = 0.0 if self._previous is None else value - self._previous
+        self._previous = value
+        up = self._up.update(max(diff, 0.0))
+        down = self._down.update(max(-diff, 0.0))
+        if math.isnan(down):
+            return math.nan
+        return 100.0 if down == 0 else 100.0 - 100.0 / (1.0 + up / down)
+
+
+class RollingBollinger:
+    """Bollinger Bands (population std) updated in amortized O(1) per value."""
+
+    def __init__(self, window: int = 20, window_dev: float = 2):
+        self.window = window
+        self.window_dev = window_dev
+        self._values = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._updates = 0
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        """Return (high, low, mid) bands."""
+        self._values.append(value)
+        self._sum += value
+        self._sum_sq += value * value
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+        self._updates += 1
+        if self._updates % self.window == 0:
+            self._sum = math.fsum(self._values)
+            self._sum_sq = math.fsum(v * v for v in self._values)
+        if len(self._values) < self.window:
+            return math.nan, math.nan, math.nan
+        mid = self._sum / self.window
+        std = math.sqrt(max(self._sum_sq / self.window - mid * mid, 0.0))
+        return mid + self.window_dev * std, mid - self.window_dev * std, mid
+
+
+ROLLING_INDICATORS = {
+    'sma': RollingSMA,
+    'ema': RollingEMA,
+    'rsi': RollingRSI,
+    'bollinger': RollingBollinger
+}
+
+
+class StreamingEngine:
+    def __init__(self, initial_capital: float = 10000.0):
+        """
+        Incremental, bar-by-bar version of StrategyEngine.
+
+        Indicators keep rolling state and the portfolio is updated in place,
+        so every bar costs O(1) regardless of how much history came before.
+        Signals and fills follow StrategyEngine.backtest.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.indicator_specs = {}
+        self.indicators = {}
+        self.callbacks = []
+        self.initial_capital = initial_capital
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear portfolio state and restart all indicators."""
+        self.indicators = {name: ROLLING_INDICATORS[indicator_type](**params)
+                           for name, (indicator_type, params) in self.indicator_specs.items()}
+        self.bars_seen = 0
+        self.position = 0.0
+        self.cash = self.initial_capital
+
+    def add_indicator(self, name: str, indicator_type: str, **params) -> None:
+        """Add a technical indicator; parameters match StrategyEngine.add_indicator without close."""
+        indicator_type = indicator_type.lower()
+        if indicator_type not in ROLLING_INDICATORS:
+            raise ValueError(f"Unsupported indicator type: {indicator_type}")
+        params = {k: v for k, v in params.items() if k not in ('close', 'fillna')}
+        self.indicator_specs[name] = (indicator_type, params)
+        self.indicators[name] = ROLLING_INDICATORS[indicator_type](**params)
+
+    def add_callback(self, callback: Callable[[Dict], None]) -> None:
+        """Register a callable invoked with every emitted row."""
+        self.callbacks.append(callback)
+
+    def update(self, timestamp, bar: Mapping) -> Dict:
+        """
+        Consume one bar and return the updated row.
+
+        Args:
+            timestamp: Bar timestamp
+            bar: Mapping with at least a 'Close' price
+
+        Returns:
+            Dict with date, close, indicator values, signal, holdings, cash and total
+        """
+        price = float(bar['Close'])
+        row = {'date': timestamp, 'close': price}
+
+        for name, indicator in self.indicators.items():
+            value = indicator.update(price)
+            if isinstance(indicator, RollingSMA):
+                row[f'{name}_sma'] = value
+            elif isinstance(indicator, RollingEMA):
+                row[f'{name}_ema'] = value
+            elif isinstance(indicator, RollingRSI):
+                row[f'{name}_rsi'] = value
+            elif isinstance(indicator, RollingBollinger):
+                row[f'{name}_bb_high'], row[f'{name}_bb_low'], row[f'{name}_bb_mid'] = value
+
+        row['signal'] = self._signal(row)
+
+        # Bar 0 is never traded, as in StrategyEngine.backtest
+        if self.bars_seen > 0:
+            if row['signal'] == 1 and self.position <= 0:
+                self.position = self.cash / price
+                self.cash = 0.0
+            elif row['signal'] == -1 and self.position > 0:
+                self.cash = self.position * price
+                self.position = 0.0
+        self.bars_seen += 1
+
+        row['holdings'] = self.position * price
+        row['cash'] = self.cash
+        row['total'] = row['holdings'] + row['cash']
+
+        for callback in self.callbacks:
+            callback(row)
+        return row
+
+    def _signal(self, row: Dict) -> int:
+        """Generate the trading signal for the current bar (0: hold, 1: buy, -1: sell)."""
+        # Example: Simple moving average crossover strategy
+        if 'sma_short' in self.indicators and 'sma_long' in self.indicators:
+            short_sma = row['sma_short_sma']
+            long_sma = row['sma_long_sma']
+            if short_sma > long_sma:
+                return 1
+            if short_sma < long_sma:
+                return -1
+        return 0
+
+    def run(self, bars: Iterable[Tuple[object, Mapping]]) -> Iterator[Dict]:
+        """Consume (timestamp, bar) pairs, e.g. DataFrame.iterrows(), yielding one row per bar."""
+        for timestamp, bar in bars:
+            yield self.update(timestamp, bar)
@@ -0,0 +1,90 @@
+import time
+
+import pandas as pd
+import pytest
+
+from data import bulk_downloader
+from data.bulk_downloader import BulkDownloader, RateLimiter
+from data.data_manager import DataManager
+from data.sources import SyntheticSource
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping."""
+    delays = []
+    monkeypatch.setattr(bulk_downloader.time, 'sleep', delays.append)
+    return delays
+
+
+def test_retries_transient_failures_with_backoff(sleeps):
+    source = SyntheticSource(failures={'A': 2})
+    downloader = BulkDownloader(source, max_retries=3, backoff=0.5)
+    results, errors = downloader.download([('A', '2020-01-01', '2020-02-01', '1d')])
+
+    assert errors == {}
+    assert len(results[('A', '2020-01-01', '2020-02-01', '1d')]) > 0
+    assert len(source.calls) == 3
+    # Exponential backoff with up to 100% jitter: 0.5 * 2 ** attempt * [1, 2)
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] < 1.0
+    assert 1.0 <= sleeps[1] < 2.0
+
+
+def test_gives_up_after_max_retries(sleeps):
+    source = SyntheticSource(failures={'A': 10})
+    results, errors = BulkDownloader(source, max_retries=2, backoff=0.1).download(
+        [('A', '2020-01-01', '2020-02-01', '1d'), ('B', '2020-01-01', '2020-02-01', '1d')])
+
+    assert list(errors) == [('A', '2020-01-01', '2020-02-01', '1d')]
+    assert 'Simulated fetch failure' in errors[('A', '2020-01-01', '2020-02-01', '1d')]
+    assert list(results) == [('B', '2020-01-01', '2020-02-01', '1d')]
+    assert sum(1 for call in source.calls if call[0] == 'A') == 3
+
+
+def test_rate_limiter_spaces_call_starts():
+    limiter = RateLimiter(rate=50)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+    # The first call starts immediately, the other five 1/50 s apart
+    assert time.monotonic() - started >= 5 / 50 * 0.95
+    unlimited = RateLimiter()
+    started = time.monotonic()
+    for _ in range(100):
+        unlimited.wait()
+    assert time.monotonic() - started < 0.05
+
+
+def test_load_many_fetches_only_missing_edges(tmp_path):
+    source = SyntheticSource()
+    manager = DataManager(cache_dir=str(tmp_path))
+    manager.register_source('synthetic', source)
+    manager.load_many(['A', 'B'], '2020-03-01', '2020-06-01', source='synthetic')
+    source.calls.clear()
+
+    result = manager.load_many(['A', 'B'], '2020-01-01', '2020-09-01', source='synthetic')
+
+    assert sorted(source.calls) == [
+        ('A', '2020-01-01', '2020-03-01', '1d'), ('A', '2020-06-01', '2020-09-01', '1d'),
+        ('B', '2020-01-01', '2020-03-01', '1d'), ('B', '2020-06-01', '2020-09-01', '1d')]
+    assert result['errors'] == {}
+    expected = SyntheticSource()('A', '2020-01-01', '2020-09-01', '1d')
+    expected = expected[expected.index < pd.Timestamp('2020-09-01')]
+    pd.testing.assert_frame_equal(result['data']['A'], expected, check_freq=False, check_names=False)
+
+
+def test_load_many_reports_every_failed_range(tmp_path, sleeps):
+    source = SyntheticSource()
+    manager = DataManager(cache_dir=str(tmp_path))
+    manager.register_source('synthetic', source)
+    manager.load_many(['BAD', 'GOOD'], '2020-03-01', '2020-06-01', source='synthetic')
+    source.failures['BAD'] = 100
+
+    result = manager.load_many(['BAD', 'GOOD'], '2020-01-01', '2020-09-01', source='synthetic', max_retries=1)
+
+    assert list(result['data']) == ['GOOD']
+    message = result['errors']['BAD']
+    assert '2020-01-01..2020-03-01' in message and '2020-06-01..2020-09-01' in message
+    # The failed symbol's cache is left as it was
+    assert manager.store.coverage('BAD', '1d') == ('2020-03-01', '2020-06-01')
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.performance_analyzer import PerformanceAnalyzer
+from data.columnar_store import ColumnarStore
+from data.data_manager import DataManager
+from data.sources import generate_ohlcv
+from strategy.chunked import ChunkedBacktester
+from strategy.strategy_engine import StrategyEngine
+
+START, END = '2000-01-01', '2000-01-03'
+
+
+@pytest.fixture(scope='module')
+def data_manager(tmp_path_factory):
+    bars = generate_ohlcv(2000, seed=1, start=START, freq='min')
+    manager = DataManager(cache_dir=str(tmp_path_factory.mktemp('cache')))
+    manager.register_source('synthetic', lambda symbol, start, end, interval:
+                            bars[(bars.index >= start) & (bars.index < end)])
+    return manager
+
+
+def _engine() -> StrategyEngine:
+    engine = StrategyEngine()
+    engine.add_indicator('sma_short', 'sma', window=10)
+    engine.add_indicator('sma_long', 'sma', window=30)
+    # cross and shift look back across chunk boundaries; ema and rsi carry recursive state
+    engine.set_rules('cross(sma_short, sma_long) & rsi(14) < 70 | ema(5) > shift(Close, 3) * 1.002',
+                     'crossunder(shift(sma_short, 2), sma_long)')
+    return engine
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 50, 333, 5000])
+def test_chunked_matches_in_memory(data_manager, tmp_path, chunk_rows):
+    data = data_manager.clean_data(data_manager.load_data('synthetic', 'SYN', START, END, '1m'))
+    expected = _engine().backtest(data)
+    report = PerformanceAnalyzer().generate_report(expected['portfolio'], expected['signals'])
+
+    result = ChunkedBacktester(_engine(), data_manager, chunk_rows).run(
+        'SYN', START, END, '1m', 'synthetic', output_dir=str(tmp_path))
+
+    portfolio = ColumnarStore(str(tmp_path)).read('SYN', '1m')
+    assert result['rows'] == len(data)
+    assert (portfolio.index == data.index).all()
+    assert (portfolio['signal'].to_numpy() == expected['signals']['signal'].to_numpy()).all()
+    position = expected['portfolio']['position'].to_numpy()
+    # Positions are carried across at least one chunk boundary
+    if chunk_rows < len(data):
+        boundaries = np.arange(chunk_rows, len(data), chunk_rows)
+        assert (position[boundaries - 1] > 0).any()
+    for col in ('holdings', 'cash', 'total', 'position'):
+        np.testing.assert_array_equal(portfolio[col].to_numpy(), expected['portfolio'][col].to_numpy())
+
+    trades = pd.read_csv(tmp_path / 'SYN_1m_trades.csv', parse_dates=['entry_date', 'exit_date'])
+    expected_trades = report['trade_analysis']['trades']
+    assert len(trades) == len(expected_trades) > 0
+    assert (trades['entry_date'].to_numpy() == expected_trades['entry_date'].to_numpy()).all()
+    np.testing.assert_allclose(trades['pnl'], expected_trades['pnl'], rtol=1e-9)
+
+    for name, value in report['performance_metrics'].items():
+        # Sums over chunks differ from one sum over the series only in the last bits
+        assert result['performance_metrics'][name] == pytest.approx(value, rel=1e-12), name
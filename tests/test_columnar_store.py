@@ -0,0 +1,51 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data.columnar_store import ColumnarStore
+
+
+def _frame(index: pd.DatetimeIndex) -> pd.DataFrame:
+    days = (index - pd.Timestamp('2020-01-01')).days.to_numpy(dtype=float)
+    return pd.DataFrame({'Close': days, 'Volume': days * 10}, index=index)
+
+
+def test_concurrent_writers_and_readers(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    index = pd.date_range('2020-01-01', periods=300, freq='D')
+    data = _frame(index)
+    store.write('X', '1d', data.iloc[100:200], '2020-04-10', '2020-07-19')
+    errors = []
+
+    def write(lo: int):
+        try:
+            store.write('X', '1d', data.iloc[lo:lo + 120], str(index[lo].date()), str(index[lo + 120].date()))
+        except Exception as error:
+            errors.append(error)
+
+    def read():
+        for _ in range(50):
+            try:
+                stored = store.read('X', '1d')
+                # Every row's columns belong to its own timestamp
+                expected = (stored.index - index[0]).days.to_numpy(dtype=float)
+                assert (stored['Close'].to_numpy() == expected).all()
+                assert (stored['Volume'].to_numpy() == expected * 10).all()
+            except Exception as error:
+                errors.append(error)
+
+    threads = ([threading.Thread(target=write, args=(lo,)) for lo in range(0, 180, 20)] +
+               [threading.Thread(target=read) for _ in range(3)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.coverage('X', '1d') == ('2020-01-01', str(index[280].date()))
+    assert len(store.read('X', '1d')) == 280
+    # Only the current and the previous version of the arrays are left
+    files = [name for name in os.listdir(store.dataset_dir('X', '1d')) if name.endswith('.npy')]
+    assert len(files) == 2 * 3
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from data.data_manager import DataManager
+from data.sources import generate_ohlcv
+
+FULL = generate_ohlcv(400, seed=3, start='2020-01-01', freq='D')
+
+
+def _between(start_date: str, end_date: str) -> pd.DataFrame:
+    return FULL[(FULL.index >= start_date) & (FULL.index < end_date)]
+
+
+def _manager(tmp_path):
+    manager = DataManager(cache_dir=str(tmp_path))
+    calls = []
+
+    def fetch(symbol, start_date, end_date, interval):
+        calls.append((start_date, end_date))
+        return _between(start_date, end_date)
+
+    manager.register_source('fixture', fetch)
+    return manager, calls
+
+
+@pytest.mark.parametrize('start_date, end_date, fetched', [
+    ('2020-01-15', '2020-04-10', [('2020-01-15', '2020-03-01')]),
+    ('2020-03-01', '2020-07-01', [('2020-05-01', '2020-07-01')]),
+    ('2020-01-15', '2020-07-01', [('2020-01-15', '2020-03-01'), ('2020-05-01', '2020-07-01')]),
+])
+def test_edge_ranges_merge_into_cached_range(tmp_path, start_date, end_date, fetched):
+    manager, calls = _manager(tmp_path)
+    manager.load_data('fixture', 'X', '2020-03-01', '2020-05-01')
+    calls.clear()
+
+    data = manager.load_data('fixture', 'X', start_date, end_date)
+
+    assert calls == fetched
+    assert manager.store.coverage('X', '1d') == (min(start_date, '2020-03-01'), max(end_date, '2020-05-01'))
+    expected = _between(start_date, end_date)
+    pd.testing.assert_frame_equal(data, expected, check_freq=False, check_index_type=False)
+    # The merged cache has no duplicated or unordered bars
+    stored = manager.store.read('X', '1d')
+    assert stored.index.is_unique and stored.index.is_monotonic_increasing
+    # A repeated request is served from the cache alone
+    calls.clear()
+    manager.load_data('fixture', 'X', start_date, end_date)
+    assert calls == []
+
+
+def test_legacy_csv_cache_is_imported(tmp_path):
+    _between('2020-01-01', '2020-02-01').to_csv(tmp_path / 'X_2020-01-01_2020-02-01_1d.csv')
+    _between('2020-02-01', '2020-03-01').to_csv(tmp_path / 'X_2020-02-01_2020-03-01_1d.csv')
+    # Not contiguous with the files above: left for the source to fill
+    _between('2020-04-01', '2020-05-01').to_csv(tmp_path / 'X_2020-04-01_2020-05-01_1d.csv')
+    manager, calls = _manager(tmp_path)
+
+    data = manager.load_data('fixture', 'X', '2020-01-10', '2020-02-20')
+
+    assert calls == []
+    assert manager.store.coverage('X', '1d') == ('2020-01-01', '2020-03-01')
+    pd.testing.assert_frame_equal(data, _between('2020-01-10', '2020-02-20'),
+                                  check_freq=False, check_index_type=False, check_names=False)
+
+
+def test_legacy_csv_cache_keeps_its_timezone(tmp_path):
+    # Offsets change with daylight saving, as in yfinance's exchange-local dates
+    legacy = _between('2020-02-01', '2020-05-01').tz_localize('America/New_York')
+    legacy.to_csv(tmp_path / 'X_2020-02-01_2020-05-01_1d.csv')
+    manager, calls = _manager(tmp_path)
+
+    data = manager.load_data('fixture', 'X', '2020-02-01', '2020-05-01')
+
+    assert calls == []
+    assert str(data.index.tz) == 'America/New_York'
+    assert data.index.astype(str).tolist() == legacy.index.astype(str).tolist()
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from analysis.performance_analyzer import PerformanceAnalyzer
+from strategy.execution import ExecutionModel
+from strategy.strategy_engine import StrategyEngine
+
+
+def _data(n: int = 50):
+    close = 100 + np.sin(np.arange(n) / 3.0) * 5
+    index = pd.date_range('2024-01-01', periods=n, freq='D')
+    return pd.DataFrame({'Open': close - 0.5, 'High': close + 1, 'Low': close - 1,
+                         'Close': close, 'Volume': 1000.0}, index=index)
+
+
+def test_no_entries_stays_in_cash():
+    engine = StrategyEngine()
+    engine.set_rules('Close > 1e9')
+    for fill in ('close', 'next_open'):
+        result = engine.backtest(_data(), initial_capital=5000.0, execution=ExecutionModel(fill=fill))
+        portfolio = result['portfolio']
+        assert (portfolio['cash'] == 5000.0).all()
+        assert (portfolio['position'] == 0).all()
+        assert len(result['trades']) == 0
+
+
+def test_analyzed_trades_net_both_legs():
+    engine = StrategyEngine()
+    engine.set_rules('Close > shift(Close, 1)')
+    model = ExecutionModel(commission=2.0, commission_rate=0.001, slippage_bps=5, fill='next_open')
+    result = engine.backtest(_data(), initial_capital=5000.0, execution=model)
+    booked = result['trades']
+    trades = PerformanceAnalyzer().analyze_trades(result['portfolio'])['trades']
+
+    assert len(trades) == len(booked) > 0
+    np.testing.assert_allclose(trades['pnl'], booked['pnl'])
+    np.testing.assert_allclose(trades['pnl'], (trades['exit_price'] - trades['entry_price']) * trades['position'])
+    # Costs are charged on both legs: net entry above the buy fill, net exit below the sell fill
+    assert (trades['entry_price'].to_numpy() > booked['entry_price'].to_numpy()).all()
+    assert (trades['exit_price'].to_numpy() < booked['exit_price'].to_numpy()).all()
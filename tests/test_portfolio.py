@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from data.data_manager import DataManager
+from data.sources import SyntheticSource
+from strategy.strategy_engine import StrategyEngine
+
+
+def _engine() -> StrategyEngine:
+    engine = StrategyEngine()
+    engine.add_indicator('sma_short', 'sma', window=5)
+    engine.add_indicator('sma_long', 'sma', window=20)
+    return engine
+
+
+def test_portfolio_sleeves_match_single_symbol_backtests():
+    source = SyntheticSource()
+    frames = {symbol: source(symbol, '2020-01-01', '2021-01-01', '1d') for symbol in ('A', 'B', 'C')}
+    prices = pd.DataFrame({symbol: frame['Close'] for symbol, frame in frames.items()})
+    weights = {'A': 0.5, 'B': 0.3, 'C': 0.2}
+
+    result = _engine().backtest_portfolio(prices, initial_capital=10000.0, weights=weights)
+
+    total = 0
+    for symbol, frame in frames.items():
+        single = _engine().backtest(frame, initial_capital=10000.0 * weights[symbol])['portfolio']
+        np.testing.assert_allclose(result['holdings'][symbol], single['holdings'], rtol=1e-12)
+        np.testing.assert_allclose(result['positions'][symbol], single['position'], rtol=1e-12)
+        total = total + single['total']
+    np.testing.assert_allclose(result['portfolio']['total'], total, rtol=1e-12)
+    assert set(result['trades']['symbol']) == {'A', 'B', 'C'}
+
+
+def test_panel_aligns_different_calendars(tmp_path):
+    index = pd.date_range('2021-01-04', periods=10, freq='B')
+    calendars = {
+        'A': index,
+        # Starts later, misses a day and also trades on a Saturday
+        'B': index[2:].delete(3).append(pd.DatetimeIndex(['2021-01-09'])).sort_values(),
+    }
+
+    def fetch(symbol, start_date, end_date, interval):
+        dates = calendars[symbol]
+        close = np.arange(1, len(dates) + 1, dtype=float) * (1 if symbol == 'A' else 100)
+        return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1.0},
+                            index=dates)
+
+    manager = DataManager(cache_dir=str(tmp_path))
+    manager.register_source('calendar', fetch)
+    panel = manager.load_panel(['A', 'B'], '2021-01-01', '2021-02-01', source='calendar')
+
+    assert panel.index.equals(index.union(calendars['B']))
+    assert list(panel.columns) == ['A', 'B']
+    # Before B's first bar: NaN; B's missing weekday: previous close carried forward
+    assert panel.loc[:'2021-01-05', 'B'].isna().all()
+    assert panel.loc['2021-01-11', 'B'] == panel.loc['2021-01-09', 'B']
+    # A has no Saturday bar and carries Friday's close
+    assert panel.loc['2021-01-09', 'A'] == panel.loc['2021-01-08', 'A']
+    assert panel.notna().sum().tolist() == [len(panel), len(panel) - 2]
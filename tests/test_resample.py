@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from data.resample import available_positions, resample_ohlcv
+
+
+def _bars(start: str, end: str, freq: str, tz: str = 'America/New_York') -> pd.DataFrame:
+    index = pd.date_range(start, end, freq=freq, tz=tz, inclusive='left')
+    values = np.arange(len(index), dtype=float)
+    return pd.DataFrame({'Open': values, 'High': values + 1, 'Low': values - 1,
+                         'Close': values, 'Volume': 1.0}, index=index)
+
+
+def test_bins_follow_wall_clock_across_dst():
+    # Fall-back on 2022-11-06 and spring-forward on 2023-03-12 (New York)
+    for start, end in [('2022-10-30', '2022-11-13'), ('2023-03-05', '2023-03-19')]:
+        data = _bars(start, end, 'h')
+        daily = resample_ohlcv(data, '1d')
+        assert (daily.index.hour == 0).all()
+        assert len(daily) == 14
+        # Every bar falls in the daily bin of its own local date
+        assert (daily['Volume'].to_numpy() == data.groupby(data.index.date)['Volume'].sum().to_numpy()).all()
+        assert set(resample_ohlcv(data, '4h').index.hour) == {0, 4, 8, 12, 16, 20}
+
+
+def test_no_look_ahead_across_dst():
+    for start, end in [('2022-11-05', '2022-11-08'), ('2023-03-11', '2023-03-14')]:
+        base = _bars(start, end, '15min')
+        for interval in ('1h', '4h', '1d'):
+            bars = resample_ohlcv(base, interval)
+            positions = available_positions(bars.index, interval, base.index, '15m')
+            # Close of each base bar's latest available bin, rebuilt from its members
+            bins = bars.index.searchsorted(base.index, side='right') - 1
+            last_member = pd.Series(np.arange(len(base))).groupby(bins).max().to_numpy()
+            available = positions >= 0
+            assert (last_member[positions[available]] <= np.flatnonzero(available)).all()
+            # ...and the bin after it has not closed yet
+            following = positions + 1
+            has_next = available & (following < len(bars))
+            assert (last_member[following[has_next]] > np.flatnonzero(has_next)).all()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from data.sources import generate_ohlcv
+from strategy.rules import RuleSet
+from strategy.strategy_engine import DEFAULT_ENTRY, DEFAULT_EXIT, StrategyEngine
+
+
+def _columns(n: int = 30):
+    close = np.linspace(100.0, 130.0, n)
+    return {'Open': close - 1.0, 'Close': close, 'sma_5_sma': close - 2.0}
+
+
+def test_repeated_operand():
+    columns = _columns()
+    entry = RuleSet('Close + Close > 220').evaluate(columns, (30,))['entry']
+    np.testing.assert_array_equal(entry, columns['Close'] * 2 > 220)
+
+
+def test_squared_subexpression():
+    columns = _columns()
+    rules = RuleSet('(Close - Open) * (Close - Open) > 0.5', 'sma(5) * sma(5) < 0')
+    # The shared difference is one step, used twice by the product
+    assert sum(1 for kind, payload in rules.steps if kind == 'op' and payload[0] == '-') == 1
+    result = rules.evaluate(columns, (30,))
+    assert result['entry'].all()
+    assert not result['exit'].any()
+
+
+def test_default_rules_match_builtin_crossover():
+    data = generate_ohlcv(500, seed=4)
+    results = []
+    for rules in (None, (DEFAULT_ENTRY, DEFAULT_EXIT)):
+        engine = StrategyEngine()
+        engine.add_indicator('sma_short', 'sma', window=20)
+        engine.add_indicator('sma_long', 'sma', window=50)
+        if rules is not None:
+            engine.set_rules(*rules)
+        results.append(engine.backtest(data, initial_capital=10000.0))
+    np.testing.assert_array_equal(results[0]['signals']['signal'], results[1]['signals']['signal'])
+    np.testing.assert_array_equal(results[0]['portfolio']['total'], results[1]['portfolio']['total'])
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy.strategy_engine import StrategyEngine
+
+
+def _data(n: int = 120) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    index = pd.date_range('2022-01-03', periods=n, freq='B')
+    bars = np.arange(n)
+    return pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                         'Volume': 1000.0,
+                         # Helper columns the rules below refer to
+                         'bar': bars.astype(float), 'odd': (bars % 2).astype(float)}, index=index)
+
+
+@pytest.mark.parametrize('entry, exit', [
+    ('Close > 1e9', None),                    # no trades
+    ('Close > 0', None),                      # all-in from the first tradable bar
+    ('odd > 0.5', 'odd < 0.5'),               # a round trip every two bars
+    ('bar >= 10 & bar < 30', 'bar >= 30'),    # one closed trade
+    ('bar >= 100', 'bar < 0'),                # a position still open on the last bar
+])
+def test_vectorized_matches_loop(entry, exit):
+    data = _data()
+    engine = StrategyEngine()
+    engine.set_rules(entry, exit)
+    vectorized = engine.backtest(data, initial_capital=5000.0, mode='vectorized')['portfolio']
+    loop = engine.backtest(data, initial_capital=5000.0, mode='loop')['portfolio']
+    pd.testing.assert_frame_equal(vectorized[loop.columns], loop, check_exact=False, rtol=1e-9, atol=1e-6)
+
+
+def test_open_position_is_held_to_the_end():
+    engine = StrategyEngine()
+    engine.set_rules('bar >= 100', 'bar < 0')
+    portfolio = engine.backtest(_data(), mode='vectorized')['portfolio']
+    assert (portfolio['position'].iloc[100:] > 0).all()
+    assert (portfolio['position'].iloc[:100] == 0).all()
+
+
+def test_default_crossover_matches_loop():
+    data = _data(300)
+    engine = StrategyEngine()
+    engine.add_indicator('sma_short', 'sma', window=5)
+    engine.add_indicator('sma_long', 'sma', window=20)
+    vectorized = engine.backtest(data, mode='vectorized')['portfolio']
+    loop = engine.backtest(data, mode='loop')['portfolio']
+    assert (loop['position'].diff().fillna(0) != 0).sum() > 4
+    pd.testing.assert_frame_equal(vectorized[loop.columns], loop, check_exact=False, rtol=1e-9, atol=1e-6)
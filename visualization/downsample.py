@@ -0,0 +1,53 @@
+from typing import Optional
+
+import numpy as np
+
+
+def lttb_indices(y, n_out: int, x=None) -> np.ndarray:
+    """
+    Pick n_out points that preserve the visual shape of a series.
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept and
+    the rest are split into n_out - 2 buckets; from each bucket the point
+    forming the largest triangle with the previously selected point and the
+    mean of the next bucket is kept. NaNs are treated as 0 for selection.
+
+    Args:
+        y: Series values
+        n_out: Number of points to keep
+        x: Optional x positions (defaults to the bar number)
+
+    Returns:
+        Sorted integer indices into y
+    """
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # n_out - 1 edges split bars 1..n-2 into n_out - 2 non-empty buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_indices(y, n_out: int, keep: Optional[np.ndarray] = None) -> np.ndarray:
+    """LTTB indices for y, plus any indices in keep (e.g. bars where a trade happens)."""
+    indices = lttb_indices(y, n_out)
+    if keep is not None and len(keep):
+        indices = np.union1d(indices, keep)
+    return indices
@@ -1,115 +1,354 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
-from typing import Dict, List
+import io
 import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from strategy.simulation import long_state
+from visualization.downsample import downsample_indices
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# Chart output formats supported by the headless renderer
+OUTPUT_FORMATS = ('png', 'svg')
+
+# Charts render_batch can draw, by Plotter method suffix
+BATCH_CHARTS = ('equity_curve', 'drawdowns', 'trades', 'performance_metrics')
+
+# Plotter used by batch worker processes, created once per process
+_worker_plotter = None
+
+# Whether the chart style has been applied in this process
+_style_applied = False
+
+
+def _apply_style() -> None:
+    """Import matplotlib and apply the chart style, once per process."""
+    global _style_applied
+    if not _style_applied:
+        from matplotlib import style
+        # Use a built-in style instead of seaborn
+        style.use('ggplot')
+        _style_applied = True
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', text.lower()).strip('_')
+
 
 class Plotter:
-    def __init__(self):
+    def __init__(self, headless: bool = False, output_dir: Optional[str] = None, fmt: str = 'png',
+                 dpi: int = 100, max_points: Optional[int] = 2000):
+        """
+        Args:
+            headless: Render with the Agg backend instead of opening windows;
+                implied when output_dir is set
+            output_dir: Directory charts are written to; headless charts are
+                returned as bytes when omitted
+            fmt: Output format for headless charts ('png' or 'svg')
+            dpi: Resolution of headless charts
+            max_points: Series longer than this are LTTB-downsampled before
+                drawing (None draws every bar)
+        """
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported chart format: {fmt}")
         self.logger = logging.getLogger(__name__)
-        # Use a built-in style instead of seaborn
-        plt.style.use('ggplot')
+        self.headless = headless or output_dir is not None
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.dpi = dpi
+        self.max_points = max_points
+        self._figures = {}  # figsize -> Figure, reused across headless renders
+        self._layouts = {}  # figure size and axis scales -> fitted subplot margins
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def _figure(self, figsize: tuple, nrows: int = 1):
+        """A cleared figure and its axes; headless figures are reused per size."""
+        # matplotlib is only imported once something is drawn
+        _apply_style()
+        if not self.headless:
+            import matplotlib.pyplot as plt
+            fig, axes = plt.subplots(nrows, 1, figsize=figsize, squeeze=False)
+            return fig, axes[:, 0]
+
+        fig = self._figures.get(figsize)
+        if fig is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            self._figures[figsize] = fig
+        else:
+            fig.clear()
+        return fig, fig.subplots(nrows, 1, squeeze=False)[:, 0]
+
+    def _finish(self, fig: 'Figure', kind: str, title: str, filename: Optional[str]) -> Union[str, bytes, None]:
+        """
+        Show the figure, or render it headless. kind names the chart type
+        (its plot method), whose labels decide the layout's margins.
+
+        Returns:
+            The written path with output_dir, the encoded chart when headless
+            without output_dir, None when shown interactively
+        """
+        if not self.headless:
+            import matplotlib.pyplot as plt
+            fig.tight_layout()
+            plt.show()
+            return None
+
+        self._apply_layout(fig, kind)
 
-    def plot_equity_curve(self, portfolio: pd.DataFrame, title: str = "Equity Curve") -> None:
+        if self.output_dir is None:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=self.fmt, dpi=self.dpi)
+            return buffer.getvalue()
+        path = os.path.join(self.output_dir, filename or f"{_slug(title)}.{self.fmt}")
+        fig.savefig(path, format=self.fmt, dpi=self.dpi)
+        return path
+
+    def _apply_layout(self, fig: 'Figure', kind: str) -> None:
+        """
+        Tight layout, computed once per chart kind and axis scale, then replayed.
+
+        tight_layout measures every label, and leaving it attached makes
+        savefig draw the figure twice; charts of the same kind and value
+        magnitudes share margins, so later renders reuse the fitted ones.
+        """
+        scales = []
+        for ax in fig.axes:
+            top = max(abs(limit) for limit in ax.get_ylim())
+            scales.append(int(np.floor(np.log10(top))) if top > 0 and np.isfinite(top) else 0)
+        key = (kind, tuple(fig.get_size_inches()), fig.get_suptitle() != '', tuple(scales))
+        params = self._layouts.get(key)
+        if params is None:
+            fig.tight_layout()
+            fig.set_layout_engine('none')
+            subplotpars = fig.subplotpars
+            params = self._layouts[key] = {name: getattr(subplotpars, name)
+                                           for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')}
+        else:
+            fig.subplots_adjust(**params)
+
+    def _thin(self, values: pd.Series, keep: Optional[np.ndarray] = None) -> np.ndarray:
+        """Bar positions to draw for a series, always including keep."""
+        values = values.to_numpy(dtype=np.float64)
+        if self.max_points is None or len(values) <= self.max_points:
+            return np.arange(len(values))
+        return downsample_indices(values, self.max_points, keep)
+
+    def plot_equity_curve(self, portfolio: pd.DataFrame, title: str = "Equity Curve",
+                          filename: Optional[str] = None) -> Union[str, bytes, None]:
         """Plot the equity curve."""
-        plt.figure(figsize=(12, 6))
-        plt.plot(portfolio.index, portfolio['total'], label='Portfolio Value', linewidth=2)
-        plt.title(title, fontsize=14, pad=20)
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Portfolio Value ($)', fontsize=12)
-        plt.legend(fontsize=10)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
-
-    def plot_drawdowns(self, drawdowns: pd.Series, title: str = "Drawdowns") -> None:
+        fig, (ax,) = self._figure((12, 6))
+        rows = self._thin(portfolio['total'])
+        ax.plot(portfolio.index[rows], portfolio['total'].to_numpy()[rows], label='Portfolio Value', linewidth=2)
+        ax.set_title(title, fontsize=14, pad=20)
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Portfolio Value ($)', fontsize=12)
+        ax.legend(fontsize=10)
+        ax.grid(True, alpha=0.3)
+        return self._finish(fig, 'plot_equity_curve', title, filename)
+
+    def plot_drawdowns(self, drawdowns: pd.Series, title: str = "Drawdowns",
+                       filename: Optional[str] = None) -> Union[str, bytes, None]:
         """Plot the drawdown curve."""
-        plt.figure(figsize=(12, 6))
-        plt.fill_between(drawdowns.index, drawdowns.values, 0, color='red', alpha=0.3)
-        plt.plot(drawdowns.index, drawdowns.values, color='red', linewidth=2)
-        plt.title(title, fontsize=14, pad=20)
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Drawdown (%)', fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
-
-    def plot_trades(self, data: pd.DataFrame, signals: pd.DataFrame, title: str = "Trades") -> None:
+        fig, (ax,) = self._figure((12, 6))
+        rows = self._thin(drawdowns)
+        dates, values = drawdowns.index[rows], drawdowns.to_numpy()[rows]
+        ax.fill_between(dates, values, 0, color='red', alpha=0.3)
+        ax.plot(dates, values, color='red', linewidth=2)
+        ax.set_title(title, fontsize=14, pad=20)
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Drawdown (%)', fontsize=12)
+        ax.grid(True, alpha=0.3)
+        return self._finish(fig, 'plot_drawdowns', title, filename)
+
+    def plot_trades(self, data: pd.DataFrame, signals: pd.DataFrame, title: str = "Trades",
+                    filename: Optional[str] = None) -> Union[str, bytes, None]:
         """Plot the price chart with buy/sell signals."""
-        plt.figure(figsize=(12, 6))
-        plt.plot(data.index, data['Close'], label='Price', alpha=0.7, linewidth=2)
-        
-        # Plot buy signals
-        buy_signals = signals[signals['signal'] == 1]
-        plt.scatter(buy_signals.index, data.loc[buy_signals.index, 'Close'], 
-                   marker='^', color='green', label='Buy', s=100)
-        
-        # Plot sell signals
-        sell_signals = signals[signals['signal'] == -1]
-        plt.scatter(sell_signals.index, data.loc[sell_signals.index, 'Close'], 
-                   marker='v', color='red', label='Sell', s=100)
-        
-        plt.title(title, fontsize=14, pad=20)
-        plt.xlabel('Date', fontsize=12)
-        plt.ylabel('Price ($)', fontsize=12)
-        plt.legend(fontsize=10)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show()
-
-    def plot_indicators(self, data: pd.DataFrame, indicators: List[str], title: str = "Technical Indicators") -> None:
+        fig, (ax,) = self._figure((12, 6))
+        close = data['Close'].to_numpy()
+        long = long_state(signals['signal'].reindex(data.index).to_numpy())
+        # Only bars where the position changes are trades; repeated signals are not
+        changes = np.flatnonzero(np.diff(long.astype(np.int8))) + 1
+        buys = changes[long[changes]]
+        sells = changes[~long[changes]]
+
+        # Trade bars are always drawn, so markers sit on the price line
+        rows = self._thin(data['Close'], keep=changes)
+        ax.plot(data.index[rows], close[rows], label='Price', alpha=0.7, linewidth=2)
+        ax.scatter(data.index[buys], close[buys], marker='^', color='green', label='Buy', s=100)
+        ax.scatter(data.index[sells], close[sells], marker='v', color='red', label='Sell', s=100)
+
+        ax.set_title(title, fontsize=14, pad=20)
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Price ($)', fontsize=12)
+        ax.legend(fontsize=10)
+        ax.grid(True, alpha=0.3)
+        return self._finish(fig, 'plot_trades', title, filename)
+
+    def plot_indicators(self, data: pd.DataFrame, indicators: List[str], title: str = "Technical Indicators",
+                        filename: Optional[str] = None) -> Union[str, bytes, None]:
         """Plot technical indicators."""
-        fig, axes = plt.subplots(len(indicators) + 1, 1, figsize=(12, 6 * (len(indicators) + 1)))
-        
+        fig, axes = self._figure((12, 6 * (len(indicators) + 1)), nrows=len(indicators) + 1)
+
+        # All panels share the bars picked from the price series
+        rows = self._thin(data['Close'])
+        dates = data.index[rows]
+
+        def series(column: str) -> np.ndarray:
+            return data[column].to_numpy()[rows]
+
         # Plot price
-        axes[0].plot(data.index, data['Close'], label='Price', linewidth=2)
+        axes[0].plot(dates, series('Close'), label='Price', linewidth=2)
         axes[0].set_title('Price', fontsize=12)
         axes[0].grid(True, alpha=0.3)
         axes[0].legend(fontsize=10)
-        
+
         # Plot indicators
         for i, indicator in enumerate(indicators, 1):
             if indicator.endswith('_sma'):
-                axes[i].plot(data.index, data[indicator], label=indicator, linewidth=2)
+                axes[i].plot(dates, series(indicator), label=indicator, linewidth=2)
             elif indicator.endswith('_rsi'):
-                axes[i].plot(data.index, data[indicator], label=indicator, linewidth=2)
+                axes[i].plot(dates, series(indicator), label=indicator, linewidth=2)
                 axes[i].axhline(y=70, color='r', linestyle='--', alpha=0.5)
                 axes[i].axhline(y=30, color='g', linestyle='--', alpha=0.5)
             elif indicator.endswith('_bb_high'):
-                axes[i].plot(data.index, data[indicator], label='Upper Band', linewidth=2)
-                axes[i].plot(data.index, data[indicator.replace('_high', '_low')], label='Lower Band', linewidth=2)
-                axes[i].plot(data.index, data[indicator.replace('_high', '_mid')], label='Middle Band', linewidth=2)
-            
+                axes[i].plot(dates, series(indicator), label='Upper Band', linewidth=2)
+                axes[i].plot(dates, series(indicator.replace('_high', '_low')), label='Lower Band', linewidth=2)
+                axes[i].plot(dates, series(indicator.replace('_high', '_mid')), label='Middle Band', linewidth=2)
+
             axes[i].set_title(indicator, fontsize=12)
             axes[i].grid(True, alpha=0.3)
             axes[i].legend(fontsize=10)
-        
-        plt.suptitle(title, fontsize=14, y=1.02)
-        plt.tight_layout()
-        plt.show()
 
-    def plot_performance_metrics(self, metrics: Dict, title: str = "Performance Metrics") -> None:
+        fig.suptitle(title, fontsize=14, y=1.02)
+        return self._finish(fig, 'plot_indicators', title, filename)
+
+    def plot_performance_metrics(self, metrics: Dict, title: str = "Performance Metrics",
+                                 filename: Optional[str] = None) -> Union[str, bytes, None]:
         """Plot key performance metrics."""
-        plt.figure(figsize=(10, 6))
-        
+        fig, (ax,) = self._figure((10, 6))
+
         # Select metrics to plot
         metric_names = ['total_return', 'annualized_return', 'sharpe_ratio', 'max_drawdown']
         values = [metrics[name] for name in metric_names]
-        
+
         # Format metric names for display
         display_names = ['Total Return', 'Annualized Return', 'Sharpe Ratio', 'Max Drawdown']
-        
-        bars = plt.bar(display_names, values)
-        
+
+        bars = ax.bar(display_names, values)
+
         # Add value labels on top of bars
         for bar in bars:
             height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height,
+            ax.text(bar.get_x() + bar.get_width()/2., height,
                     f'{height:.2%}' if height < 1 else f'{height:.2f}',
                     ha='center', va='bottom')
-        
-        plt.title(title, fontsize=14, pad=20)
-        plt.xticks(rotation=45, ha='right')
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.show() 
\ No newline at end of file
+
+        ax.set_title(title, fontsize=14, pad=20)
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+        ax.grid(True, alpha=0.3)
+        return self._finish(fig, 'plot_performance_metrics', title, filename)
+
+    def render_charts(self, name: str, inputs: Dict, charts: Sequence[str] = BATCH_CHARTS) -> Dict[str, Union[str, bytes]]:
+        """
+        Render the charts of one backtest whose inputs are present.
+
+        Args:
+            name: Prefix for titles and file names (e.g. the symbol)
+            inputs: Any of 'data', 'portfolio', 'signals', 'drawdowns', 'performance_metrics'
+            charts: Charts to draw, from BATCH_CHARTS
+
+        Returns:
+            Dict of chart name -> written path (or encoded chart without output_dir)
+        """
+        rendered = {}
+        for chart in charts:
+            filename = f"{_slug(name)}_{chart}.{self.fmt}"
+            title = f"{name} {chart.replace('_', ' ').title()}"
+            if chart == 'equity_curve' and 'portfolio' in inputs:
+                rendered[chart] = self.plot_equity_curve(inputs['portfolio'], title, filename)
+            elif chart == 'drawdowns' and 'drawdowns' in inputs:
+                rendered[chart] = self.plot_drawdowns(inputs['drawdowns'], title, filename)
+            elif chart == 'trades' and 'data' in inputs and 'signals' in inputs:
+                rendered[chart] = self.plot_trades(inputs['data'], inputs['signals'], title, filename)
+            elif chart == 'performance_metrics' and 'performance_metrics' in inputs:
+                rendered[chart] = self.plot_performance_metrics(inputs['performance_metrics'], title, filename)
+        return rendered
+
+
+def chart_inputs(data: Optional[pd.DataFrame] = None, backtest_results: Optional[Dict] = None,
+                 performance_report: Optional[Dict] = None) -> Dict:
+    """
+    Collect just the columns batch charts draw, so sending a backtest to a
+    worker process pickles a few series rather than full frames.
+    """
+    inputs = {}
+    if data is not None:
+        inputs['data'] = data[['Close']]
+    if backtest_results is not None:
+        inputs['portfolio'] = backtest_results['portfolio'][['total']]
+        inputs['signals'] = backtest_results['signals'][['signal']]
+    if performance_report is not None:
+        inputs['drawdowns'] = performance_report['drawdowns']
+        inputs['performance_metrics'] = performance_report['performance_metrics']
+    return inputs
+
+
+def _init_worker(output_dir: Optional[str], fmt: str, dpi: int, max_points: Optional[int]) -> None:
+    global _worker_plotter
+    _worker_plotter = Plotter(headless=True, output_dir=output_dir, fmt=fmt, dpi=dpi, max_points=max_points)
+
+
+def _render_in_worker(name: str, inputs: Dict, charts: Sequence[str]) -> Dict[str, Union[str, bytes]]:
+    return _worker_plotter.render_charts(name, inputs, charts)
+
+
+def render_batch(backtests: Dict[str, Dict], output_dir: Optional[str] = None, charts: Sequence[str] = BATCH_CHARTS,
+                 fmt: str = 'png', dpi: int = 100, max_points: Optional[int] = 2000,
+                 max_workers: Optional[int] = None) -> Dict[str, Dict[str, Union[str, bytes]]]:
+    """
+    Render charts for many backtests headless, across worker processes.
+
+    Each worker keeps one Plotter, so figures are created once per size and
+    reused for every backtest it draws.
+
+    Args:
+        backtests: Name (e.g. symbol) -> chart inputs, see chart_inputs
+        output_dir: Directory charts are written to; charts are returned as bytes when omitted
+        charts: Charts to draw per backtest, from BATCH_CHARTS
+        fmt: 'png' or 'svg'
+        dpi: Resolution
+        max_points: Downsampling budget per series
+        max_workers: Worker processes (defaults to the CPU count, 1 renders in-process)
+
+    Returns:
+        Dict of name -> chart name -> written path (or encoded chart)
+    """
+    logger = logging.getLogger(__name__)
+    max_workers = max_workers or os.cpu_count() or 1
+    names = list(backtests)
+    logger.info(f"Rendering charts for {len(names)} backtest(s) on {max_workers} worker(s)")
+
+    if max_workers == 1 or len(names) <= 1:
+        plotter = Plotter(headless=True, output_dir=output_dir, fmt=fmt, dpi=dpi, max_points=max_points)
+        return {name: plotter.render_charts(name, backtests[name], charts) for name in names}
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    chunksize = max(1, len(names) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(output_dir, fmt, dpi, max_points)) as executor:
+        rendered = executor.map(_render_in_worker, names, [backtests[name] for name in names],
+                                [charts] * len(names), chunksize=chunksize)
+        return dict(zip(names, rendered))